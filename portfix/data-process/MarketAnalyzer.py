@@ -1,228 +1,242 @@
-import requests
 import pandas as pd
 import numpy as np
-from typing import Dict, List
-import talib  # 需要先安装: pip install talib-binary
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Union
 import time
+import logging
+from http_transport import DEFAULT_POOL_MAXSIZE, HttpTransport, browser_headers, get_default_transport
+from kline_decode import decode_merkle_klines
+from kline_pages import DEFAULT_PAGE_BARS, fetch_range
+from kline_store import KlineStore, klines_to_frame, get_default_store, timeframe_to_ms
+from resample import resample_klines
+from singleflight import SingleFlight, get_default_flight
+from symbol_universe import DEFAULT_TICK_BUDGET, SymbolUniverse, get_default_universe
+from streaming_indicators import StreamingIndicatorEngine
+from batch_indicators import (INDICATOR_FIELDS, BatchIndicators, compute_batch_indicators,
+                              compute_indicator_matrix, stack_ohlc)
+from indicator_graph import IndicatorGraph, get_default_graph
+from trend_signals import SIGNAL_INPUTS, TrendSignals, compute_trend_signals
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SYMBOLS = ["BTC_USD", "ETH_USD", "APT_USD", "SUI_USD", "TRUMP_USD"]
+
+# 同一主机上允许同时进行的请求数
+DEFAULT_MAX_CONCURRENCY = DEFAULT_POOL_MAXSIZE
+
 
 class MarketAnalyzer:
-    def __init__(self):
-        self.headers = {
-            'accept': '*/*',
-            'accept-language': 'zh-CN,zh;q=0.9,en;q=0.8',
-            'dnt': '1',
-            'origin': 'https://app.merkle.trade',
-            'priority': 'u=1, i',
-            'referer': 'https://app.merkle.trade/',
-            'sec-ch-ua': '"Not(A:Brand";v="99", "Google Chrome";v="133", "Chromium";v="133"',
-            'sec-ch-ua-mobile': '?0',
-            'sec-ch-ua-platform': '"macOS"',
-            'sec-fetch-dest': 'empty',
-            'sec-fetch-mode': 'cors',
-            'sec-fetch-site': 'same-site',
-            'user-agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/133.0.0.0 Safari/537.36',
-        }
+    def __init__(self, transport: Optional[HttpTransport] = None, store: Optional[KlineStore] = None,
+                 graph: Optional[IndicatorGraph] = None, flight: Optional[SingleFlight] = None):
+        # 共享的HTTP连接池、超时重试和限流
+        self.transport = transport or get_default_transport()
+        # 合并并发的相同请求，结果在短TTL内复用
+        self.flight = flight or get_default_flight()
+        # 指标依赖图，talib需要先安装: pip install TA-Lib
+        self.graph = graph or get_default_graph()
+        # 本地K线库，设置后只增量请求新K线
+        self.store = store
+        # 每个交易对的流式指标引擎
+        self.engines: Dict[str, StreamingIndicatorEngine] = {}
+        self.headers = browser_headers('https://app.merkle.trade')
 
-    def fetch_kline_data(self, symbol: str, from_time: int, to_time: int, unit: int = 1800000) -> pd.DataFrame:
-        """获取K线数据并转换为DataFrame格式"""
+    def fetch_klines(self, symbol: str, from_time: int, to_time: int, unit: int = 1800000) -> np.ndarray:
+        """获取K线数据，直接解析为KLINE_DTYPE结构化数组（int64时间戳、float64价格）"""
         params = {
             'from': from_time,
             'to': to_time,
             'unit': unit,
         }
         
-        response = requests.get(
+        response = self.transport.get(
             f'https://api.merkle.trade/v1/chart/{symbol}', 
             params=params, 
             headers=self.headers
         )
-        data = response.json()
-        # print(data)
-        # 将数据转换为DataFrame
-        df = pd.DataFrame(data["items"])
-        # print(df)
-        df['timestamp'] = pd.to_datetime(df['ts'], unit='ms')
-        return df
-
-    def calculate_technical_indicators(self, df: pd.DataFrame) -> pd.DataFrame:
-        """计算更多技术指标"""
-        close_prices = df['close'].astype(float)
-        high_prices = df['high'].astype(float)
-        low_prices = df['low'].astype(float)
-        
-        # 移动平均线族
-        ma5 = talib.SMA(close_prices, timeperiod=5)
-        ma10 = talib.SMA(close_prices, timeperiod=10)
-        ma20 = talib.SMA(close_prices, timeperiod=20)
-        ma60 = talib.SMA(close_prices, timeperiod=60)
-        
-        # 指数移动平均线
-        ema12 = talib.EMA(close_prices, timeperiod=12)
-        ema26 = talib.EMA(close_prices, timeperiod=26)
-        
-        # RSI族
-        rsi6 = talib.RSI(close_prices, timeperiod=6)
-        rsi12 = talib.RSI(close_prices, timeperiod=12)
-        rsi24 = talib.RSI(close_prices, timeperiod=24)
-        
-        # 布林带
-        upper, middle, lower = talib.BBANDS(
-            close_prices, timeperiod=20, 
-            nbdevup=2, nbdevdn=2, matype=0
-        )
-        
-        # MACD
-        macd, macd_signal, macd_hist = talib.MACD(
-            close_prices, 
-            fastperiod=12, 
-            slowperiod=26, 
-            signalperiod=9
-        )
-        
-        # KDJ
-        k, d = talib.STOCH(
-            high_prices, low_prices, close_prices,
-            fastk_period=9, slowk_period=3, slowk_matype=0,
-            slowd_period=3, slowd_matype=0
-        )
-        j = 3 * k - 2 * d
-        
-        # 新增 SAR (抛物线指标)
-        sar = talib.SAR(high_prices, low_prices, acceleration=0.02, maximum=0.2)
-        
-        # 新增 DMI (动向指标)
-        plus_di = talib.PLUS_DI(high_prices, low_prices, close_prices, timeperiod=14)
-        minus_di = talib.MINUS_DI(high_prices, low_prices, close_prices, timeperiod=14)
-        adx = talib.ADX(high_prices, low_prices, close_prices, timeperiod=14)
-        
-        # ROC (变动率指标)
-        roc = talib.ROC(close_prices, timeperiod=10)
-        
-        # 新增 TEMA (三重指数移动平均线)
-        tema = talib.TEMA(close_prices, timeperiod=20)
-        
-        # 新增 MOM (动量指标)
-        mom = talib.MOM(close_prices, timeperiod=10)
-        
-        # 其他现有指标
-        atr = talib.ATR(high_prices, low_prices, close_prices, timeperiod=14)
-        cci = talib.CCI(high_prices, low_prices, close_prices, timeperiod=14)
-        trix = talib.TRIX(close_prices, timeperiod=30)
-        willr = talib.WILLR(high_prices, low_prices, close_prices, timeperiod=14)
-
-        return pd.DataFrame({
-            # MA族
-            'ma5': ma5,
-            'ma10': ma10,
-            'ma20': ma20,
-            'ma60': ma60,
-            'ema12': ema12,
-            'ema26': ema26,
-            # RSI族
-            'rsi6': rsi6,
-            'rsi12': rsi12,
-            'rsi24': rsi24,
-            # 布林带
-            'bb_upper': upper,
-            'bb_middle': middle,
-            'bb_lower': lower,
-            # MACD
-            'macd': macd,
-            'macd_signal': macd_signal,
-            'macd_hist': macd_hist,
-            # KDJ
-            'k': k,
-            'd': d,
-            'j': j,
-            # 其他指标
-            'atr': atr,
-            'cci': cci,
-            'adx': adx,
-            'trix': trix,
-            'willr': willr,
-            # 新增指标
-            'sar': sar,
-            'plus_di': plus_di,
-            'minus_di': minus_di,
-            'roc': roc,
-            'tema': tema,
-            'mom': mom
-        })
+        # 增量请求时可能没有新K线，返回空数组
+        return decode_merkle_klines(response.content)
+
+    def fetch_kline_data(self, symbol: str, from_time: int, to_time: int, unit: int = 1800000) -> pd.DataFrame:
+        """获取K线数据并转换为DataFrame格式"""
+        return klines_to_frame(self.fetch_klines(symbol, from_time, to_time, unit))
+
+    def fetch_klines_cached(self, symbol: str, from_time: int, to_time: int, unit: int = 1800000) -> np.ndarray:
+        """增量获取K线：只请求本地最后一根K线及之后的数据，合并入库后返回所需窗口"""
+        # 同一交易对、周期和窗口的并发请求共用一次获取；窗口终点按K线对齐，TTL内视为同一窗口
+        key = ('merkle', symbol, unit, from_time, to_time // unit)
+        klines = self.flight.do(key, lambda: self._fetch_klines_cached(symbol, from_time, to_time, unit))
+        return klines.copy()
+
+    def _fetch_klines_cached(self, symbol: str, from_time: int, to_time: int, unit: int) -> np.ndarray:
+        if self.store is None:
+            return self._fetch_range(symbol, from_time, to_time, unit)
+
+        last_ts = self.store.last_ts('merkle', symbol, unit)
+        if last_ts is None or last_ts < from_time:
+            # 本地没有与窗口相接的数据，整个窗口分页获取
+            self._fetch_range_into_store(symbol, from_time, to_time, unit)
+        else:
+            # 窗口起点早于本地最早的K线时（之前的调用窗口更短），分页补齐开头缺失的部分
+            fetched_from = self.store.fetched_from('merkle', symbol, unit)
+            if fetched_from > -(-from_time // unit) * unit:
+                first_ts = self.store.first_ts('merkle', symbol, unit)
+                self._fetch_range_into_store(symbol, from_time, first_ts - 1, unit)
+            # 最后一根K线可能尚未收盘，从它开始重新获取以覆盖旧值
+            klines = self.fetch_klines(symbol, last_ts, to_time, unit)
+            if len(klines):
+                self.store.merge('merkle', symbol, unit, klines)
+        return self.store.window('merkle', symbol, unit, from_time, to_time)
+
+    def _fetch_range(self, symbol: str, from_time: int, to_time: int, unit: int) -> np.ndarray:
+        """获取[from_time, to_time]的K线；超过一页时按页并发获取并补齐缺口"""
+        if to_time - from_time < DEFAULT_PAGE_BARS * unit:
+            return self.fetch_klines(symbol, from_time, to_time, unit)
+        klines, gaps = fetch_range(self.fetch_klines, symbol, from_time, to_time, unit)
+        if gaps:
+            logger.info(f"{symbol}: {len(gaps)} gaps left in {from_time}-{to_time}")
+        return klines
+
+    def _fetch_range_into_store(self, symbol: str, from_time: int, to_time: int, unit: int):
+        """按页获取[from_time, to_time]并合并入库；记下已请求的起点，交易所本就没有的早期K线不再重复请求"""
+        klines, gaps = fetch_range(self.fetch_klines, symbol, from_time, to_time, unit)
+        if gaps:
+            logger.info(f"{symbol}: {len(gaps)} gaps left in {from_time}-{to_time}")
+        if len(klines):
+            self.store.merge('merkle', symbol, unit, klines)
+        self.store.mark_fetched_from('merkle', symbol, unit, from_time)
+
+    def fetch_kline_data_cached(self, symbol: str, from_time: int, to_time: int, unit: int = 1800000) -> pd.DataFrame:
+        """增量获取K线并转换为DataFrame格式"""
+        return klines_to_frame(self.fetch_klines_cached(symbol, from_time, to_time, unit))
+
+    def fetch_klines_concurrently(self, symbols: List[str], from_time: int, to_time: int,
+                                  unit: int = 1800000,
+                                  max_concurrency: int = DEFAULT_MAX_CONCURRENCY) -> Dict[str, np.ndarray]:
+        """并发获取多个交易对的K线数据，耗时约等于一次请求的往返时间"""
+        workers = max(1, min(max_concurrency, len(symbols)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            klines = executor.map(
+                lambda symbol: self.fetch_klines_cached(symbol, from_time, to_time, unit), symbols
+            )
+            return dict(zip(symbols, klines))
+
+    def fetch_kline_data_concurrently(self, symbols: List[str], from_time: int, to_time: int,
+                                      unit: int = 1800000,
+                                      max_concurrency: int = DEFAULT_MAX_CONCURRENCY) -> Dict[str, pd.DataFrame]:
+        """并发获取多个交易对的K线数据并转换为DataFrame格式"""
+        klines = self.fetch_klines_concurrently(symbols, from_time, to_time, unit, max_concurrency)
+        return {symbol: klines_to_frame(rows) for symbol, rows in klines.items()}
+
+    def calculate_technical_indicators(self, df: pd.DataFrame, names: Optional[List[str]] = None) -> pd.DataFrame:
+        """计算更多技术指标；names为需要的指标，默认全部。共用的中间结果只计算一次"""
+        values = self.graph.evaluate(df, names or INDICATOR_FIELDS)
+        return pd.DataFrame(values, index=df.index)
+
+    def calculate_technical_indicators_batch(self, frames: Dict[str, pd.DataFrame],
+                                             last_only: bool = True) -> BatchIndicators:
+        """将多个交易对的K线按时间对齐成矩阵，一次向量化计算全部指标"""
+        return compute_batch_indicators(frames, last_only=last_only)
+
+    def update_streaming_indicators(self, symbol: str, df: pd.DataFrame, unit: int = 1800000) -> Dict[str, float]:
+        """用新收盘的K线更新流式指标，首次调用时用历史K线初始化；返回最新指标值"""
+        ts = df['ts'].astype('int64')
+        # 只使用已收盘的K线
+        closed = ts + unit <= int(time.time() * 1000)
+        engine = self.engines.get(symbol)
+        if engine is None:
+            engine = self.engines[symbol] = StreamingIndicatorEngine()
+        elif engine.last_ts is not None:
+            closed &= ts > engine.last_ts
+        return engine.seed(df[closed]).latest()
 
     def analyze_trend(self, df: pd.DataFrame, indicators: pd.DataFrame) -> str:
         """扩展的趋势分析"""
-        current_price = float(df['close'].iloc[-1])
+        latest = {k: indicators[k].iloc[-1] for k in indicators.columns}
+        return self.analyze_trend_latest(float(df['close'].iloc[-1]), latest)
+
+    def analyze_trend_latest(self, current_price: float, latest: Dict[str, float]) -> str:
+        """基于最新一根K线的指标值做趋势分析，输入缺失或尚未算出(NaN)的规则跳过"""
         signals = []
+
+        def ready(*names: str) -> bool:
+            return all(np.isfinite(latest.get(name, np.nan)) for name in names)
         
         # MA分析
-        ma5_current = indicators['ma5'].iloc[-1]
-        ma10_current = indicators['ma10'].iloc[-1]
-        ma20_current = indicators['ma20'].iloc[-1]
-        ma60_current = indicators['ma60'].iloc[-1]
+        ma5_current = latest.get('ma5', np.nan)
+        ma10_current = latest.get('ma10', np.nan)
+        ma20_current = latest.get('ma20', np.nan)
+        ma60_current = latest.get('ma60', np.nan)
         
-        if ma5_current > ma10_current > ma20_current:
-            signals.append("短期、中期均线呈多头排列，上升趋势强劲")
-        elif ma5_current < ma10_current < ma20_current:
-            signals.append("短期、中期均线呈空头排列，下降趋势明显")
+        if ready('ma5', 'ma10', 'ma20'):
+            if ma5_current > ma10_current > ma20_current:
+                signals.append("短期、中期均线呈多头排列，上升趋势强劲")
+            elif ma5_current < ma10_current < ma20_current:
+                signals.append("短期、中期均线呈空头排列，下降趋势明显")
         
         # EMA分析
-        ema12_current = indicators['ema12'].iloc[-1]
-        ema26_current = indicators['ema26'].iloc[-1]
-        if ema12_current > ema26_current:
-            signals.append("EMA金叉形态，可能上涨")
-        else:
-            signals.append("EMA死叉形态，可能下跌")
+        ema12_current = latest.get('ema12', np.nan)
+        ema26_current = latest.get('ema26', np.nan)
+        if ready('ema12', 'ema26'):
+            if ema12_current > ema26_current:
+                signals.append("EMA金叉形态，可能上涨")
+            else:
+                signals.append("EMA死叉形态，可能下跌")
             
         # RSI分析
-        rsi6_current = indicators['rsi6'].iloc[-1]
-        rsi12_current = indicators['rsi12'].iloc[-1]
-        rsi24_current = indicators['rsi24'].iloc[-1]
+        rsi6_current = latest.get('rsi6', np.nan)
+        rsi12_current = latest.get('rsi12', np.nan)
+        rsi24_current = latest.get('rsi24', np.nan)
         
-        if rsi6_current > 80 and rsi12_current > 70:
-            signals.append("RSI双重超买，注意回调风险")
-        elif rsi6_current < 20 and rsi12_current < 30:
-            signals.append("RSI双重超卖，可能存在反弹机会")
+        if ready('rsi6', 'rsi12'):
+            if rsi6_current > 80 and rsi12_current > 70:
+                signals.append("RSI双重超买，注意回调风险")
+            elif rsi6_current < 20 and rsi12_current < 30:
+                signals.append("RSI双重超卖，可能存在反弹机会")
             
         # SAR分析
-        sar_current = indicators['sar'].iloc[-1]
-        if current_price > sar_current:
-            signals.append("SAR显示多头趋势")
-        else:
-            signals.append("SAR显示空头趋势")
+        sar_current = latest.get('sar', np.nan)
+        if ready('sar') and np.isfinite(current_price):
+            if current_price > sar_current:
+                signals.append("SAR显示多头趋势")
+            else:
+                signals.append("SAR显示空头趋势")
             
         # DMI分析
-        plus_di_current = indicators['plus_di'].iloc[-1]
-        minus_di_current = indicators['minus_di'].iloc[-1]
-        if plus_di_current > minus_di_current:
-            signals.append("DMI显示上升趋势")
-        else:
-            signals.append("DMI显示下降趋势")
+        plus_di_current = latest.get('plus_di', np.nan)
+        minus_di_current = latest.get('minus_di', np.nan)
+        if ready('plus_di', 'minus_di'):
+            if plus_di_current > minus_di_current:
+                signals.append("DMI显示上升趋势")
+            else:
+                signals.append("DMI显示下降趋势")
             
         # ROC分析
-        roc_current = indicators['roc'].iloc[-1]
-        if roc_current > 0:
-            signals.append(f"ROC为正({roc_current:.2f})，价格动能向上")
-        else:
-            signals.append(f"ROC为负({roc_current:.2f})，价格动能向下")
+        roc_current = latest.get('roc', np.nan)
+        if ready('roc'):
+            if roc_current > 0:
+                signals.append(f"ROC为正({roc_current:.2f})，价格动能向上")
+            else:
+                signals.append(f"ROC为负({roc_current:.2f})，价格动能向下")
             
         # 动量分析
-        mom_current = indicators['mom'].iloc[-1]
-        if mom_current > 0:
-            signals.append("动量指标为正，上涨动能持续")
-        else:
-            signals.append("动量指标为负，下跌动能持续")
+        mom_current = latest.get('mom', np.nan)
+        if ready('mom'):
+            if mom_current > 0:
+                signals.append("动量指标为正，上涨动能持续")
+            else:
+                signals.append("动量指标为负，下跌动能持续")
             
         # Get current K and D values
-        k_current = indicators['k'].iloc[-1]
-        d_current = indicators['d'].iloc[-1]
-        adx_current = indicators['adx'].iloc[-1]
+        k_current = latest.get('k', np.nan)
+        d_current = latest.get('d', np.nan)
+        adx_current = latest.get('adx', np.nan)
         
         # 趋势强度评估
         trend_strength = 0
         if ma5_current > ma10_current > ma20_current: trend_strength += 1
         if rsi6_current > 50: trend_strength += 1
         if k_current > d_current: trend_strength += 1
-        if indicators['macd_hist'].iloc[-1] > 0: trend_strength += 1
+        if latest.get('macd_hist', np.nan) > 0: trend_strength += 1
         if adx_current > 25: trend_strength += 1
         
         # # 综合评估
@@ -237,41 +251,161 @@ class MarketAnalyzer:
         #     signals.append("偏向看跌")
             
         # # 波动性分析
-        # atr_current = indicators['atr'].iloc[-1]
+        # atr_current = latest['atr']
         # atr_avg = indicators['atr'].mean()
         # if atr_current > atr_avg * 1.5:
         #     signals.append("\n警告: 当前市场波动性较大，建议谨慎操作")
             
         return "\n".join(signals)
 
+    def analyze_trend_series(self, df: pd.DataFrame) -> pd.DataFrame:
+        """对整段历史逐根K线评估analyze_trend的规则，返回信号矩阵及trend_strength，供回测使用"""
+        values = self.graph.evaluate(df, INDICATOR_FIELDS)
+        result = compute_trend_signals(values, df['close'].to_numpy(dtype=float))
+        series = pd.DataFrame(result.signals, columns=result.fields, index=df.index)
+        series['trend_strength'] = result.trend_strength
+        return series
+
+    def analyze_trend_batch(self, frames: Dict[str, pd.DataFrame]) -> TrendSignals:
+        """多个交易对按时间戳并集对齐(缺失K线补NaN)后一次性计算全部历史信号，行顺序与frames一致，形状为(S, T, len(fields))"""
+        stacked = stack_ohlc(frames)
+        values = compute_indicator_matrix(stacked['high'], stacked['low'], stacked['close'])
+        return compute_trend_signals(values, stacked['close'])
+
+    def plan_kline_window(self, names: Optional[List[str]] = None, unit: int = 1800000,
+                          to_time: Optional[int] = None):
+        """根据所需指标的预热长度确定K线窗口，返回(from_time, to_time, bars)"""
+        bars = self.graph.required_bars(names or INDICATOR_FIELDS)
+        to_time = to_time or int(time.time() * 1000)
+        # 窗口包含当前这根K线在内共bars根
+        from_time = (to_time // unit - (bars - 1)) * unit
+        return from_time, to_time, bars
+
     def analyze_market(self,symbol: str):
-        # 获取最近24小时的数据
-        current_time = int(time.time() * 1000)
-        from_time = current_time - (2 * 24 * 60 * 60 * 1000)  # 48小时前
+        # 按指标所需的K线数量确定时间窗口
+        from_time, current_time, _ = self.plan_kline_window()
         
         # 获取数据
-        df = self.fetch_kline_data(symbol, from_time, current_time)
-        
+        klines = self.fetch_klines_cached(symbol, from_time, current_time)
+        return self.analyze_kline_data(klines)
+
+    def analyze_market_timeframes(self, symbol: str, timeframes: List[str] = ('30m', '1h', '4h', '1d'),
+                                  base_unit: int = 1800000) -> Dict[str, Dict]:
+        """只获取一路基础周期K线，在本地合成更高周期后分别计算指标，不再按周期单独请求"""
+        bars = self.graph.required_bars(INDICATOR_FIELDS)
+        to_time = int(time.time() * 1000)
+        # 每个周期的窗口按该周期自身的K线数量确定，基础周期K线只按最早的起点分页获取一次
+        windows = {tf: self.plan_kline_window(unit=timeframe_to_ms(tf), to_time=to_time)[0] for tf in timeframes}
+        klines = self.fetch_klines_cached(symbol, min(windows.values()), to_time, base_unit)
+
+        results = {}
+        for timeframe, from_time in windows.items():
+            window = klines[klines['ts'] >= from_time]
+            resampled = resample_klines(window, base_unit, timeframe, now=to_time)
+            results[timeframe] = self.analyze_kline_data(resampled[-bars:])
+        return results
+
+    def analyze_kline_data(self, df: Union[pd.DataFrame, np.ndarray], snapshot: bool = True):
+        """基于已获取的K线数据（DataFrame或KLINE_DTYPE数组）计算指标并分析走势；snapshot模式只取最新值，不构建指标DataFrame"""
+        if snapshot:
+            return self.analyze_kline_snapshot(df)
+        if isinstance(df, np.ndarray):
+            df = klines_to_frame(df)
+
         # 计算指标
         indicators = self.calculate_technical_indicators(df)
         
-        # Format float values to 2 decimal places
-        formatted_indicators = {k: round(float(v), 2) if pd.notna(v) else v 
-                            for k, v in indicators.iloc[-1].to_dict().items()}
+        # Format float values to 2 decimal places; K线不足时算不出的指标不输出
+        latest = indicators.iloc[-1].to_dict()
+        formatted_indicators = {k: round(float(v), 2) for k, v in latest.items() if pd.notna(v)}
+        missing = [k for k in latest if k not in formatted_indicators]
+        if missing:
+            logger.warning(f"Only {len(df)} klines available, cannot compute: {', '.join(missing)}")
         # 分析走势
         analysis = self.analyze_trend(df, indicators)
         
         formatted_indicators["summary"]="。".join(analysis.split("\n"))
+        # 最新收盘价不做两位小数取整，SHIB等低价币取整后为0
+        formatted_indicators["current_price"] = float(df['close'].iloc[-1])
+        return formatted_indicators
+
+    def analyze_kline_snapshot(self, df: Union[pd.DataFrame, np.ndarray], names: Optional[List[str]] = None) -> Dict:
+        """快照模式：只取各指标最后一个值，直接生成与analyze_kline_data相同格式的结果；names只限定输出的指标"""
+        names = list(names or INDICATOR_FIELDS)
+        # 趋势分析的规则总要读取SIGNAL_INPUTS，无论输出哪些指标都一并计算
+        values = self.graph.evaluate(df, names + [k for k in SIGNAL_INPUTS if k not in names])
+        latest = {k: float(v[-1]) for k, v in values.items()}
+
+        # K线不足时算不出的指标不输出
+        formatted_indicators = {k: round(latest[k], 2) for k in names if latest[k] == latest[k]}
+        missing = [k for k in names if k not in formatted_indicators]
+        if missing:
+            logger.warning(f"Only {len(df)} klines available, cannot compute: {', '.join(missing)}")
+
+        current_price = float(np.asarray(df['close'])[-1])
+        analysis = self.analyze_trend_latest(current_price, latest)
+        formatted_indicators["summary"] = "。".join(analysis.split("\n"))
+        # 最新收盘价不做两位小数取整，SHIB等低价币取整后为0
+        formatted_indicators["current_price"] = current_price
         return formatted_indicators
 
-def get_market_indicators():
+def get_market_indicators(symbols: Optional[List[str]] = None,
+                          max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                          store: Optional[KlineStore] = None):
+    symbols = symbols or DEFAULT_SYMBOLS
+    analyzer = MarketAnalyzer(transport=get_default_transport(max_concurrency),
+                              store=store or get_default_store())
+
+    # 所有交易对的K线一次性并发获取
+    from_time, current_time, _ = analyzer.plan_kline_window()
+    klines = analyzer.fetch_klines_concurrently(
+        symbols, from_time, current_time, max_concurrency=max_concurrency
+    )
+
     total_indicators = []
-    for symbol in ["BTC_USD", "ETH_USD", "APT_USD", "SUI_USD","TRUMP_USD"]:
-        formatted_indicators = MarketAnalyzer().analyze_market(symbol)
+    for symbol in symbols:
+        formatted_indicators = analyzer.analyze_kline_data(klines[symbol])
         formatted_indicators["symbol"] = symbol
         total_indicators.append(formatted_indicators)
     return total_indicators
 
+def get_universe_market_indicators(universe: Optional[SymbolUniverse] = None,
+                                   budget: float = DEFAULT_TICK_BUDGET,
+                                   priority: str = 'liquidity',
+                                   max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                                   store: Optional[KlineStore] = None):
+    """全市场模式：分析交易对列表中所有可交易的交易对，在单次时间预算内按流动性或波动率优先"""
+    universe = universe or get_default_universe()
+    analyzer = MarketAnalyzer(transport=get_default_transport(max_concurrency),
+                              store=store or get_default_store())
+    from_time, current_time, _ = analyzer.plan_kline_window()
+
+    def analyze_symbol(symbol: str) -> Dict:
+        klines = analyzer.fetch_klines_cached(symbol, from_time, current_time)
+        if len(klines) > 1:
+            # 记录已实现波动率（对数收益率标准差），供下一轮按波动率排序
+            universe.observe(symbol, float(np.std(np.diff(np.log(klines['close'])))))
+        formatted_indicators = analyzer.analyze_kline_data(klines)
+        formatted_indicators["symbol"] = symbol
+        return formatted_indicators
+
+    tick = universe.run_tick(analyze_symbol, budget=budget, priority=priority,
+                             max_concurrency=max_concurrency)
+    return list(tick.results.values())
+
+def get_market_indicator_matrix(symbols: Optional[List[str]] = None,
+                                max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                                store: Optional[KlineStore] = None) -> BatchIndicators:
+    """批量模式：并发获取全部交易对的K线，返回每个交易对最新指标组成的结构化数组"""
+    symbols = symbols or DEFAULT_SYMBOLS
+    analyzer = MarketAnalyzer(transport=get_default_transport(max_concurrency),
+                              store=store or get_default_store())
+    from_time, current_time, _ = analyzer.plan_kline_window()
+    frames = analyzer.fetch_kline_data_concurrently(
+        symbols, from_time, current_time, max_concurrency=max_concurrency
+    )
+    return analyzer.calculate_technical_indicators_batch(frames)
+
 if __name__ == "__main__":
     import time
     total_indicators = get_market_indicators()
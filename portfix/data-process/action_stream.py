@@ -0,0 +1,162 @@
+import json
+import logging
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+ActionCallback = Callable[[Dict[str, Any]], None]
+
+
+class ActionStreamParser:
+    """
+    Incremental parser for the ``actions`` array of a JSON response.
+
+    Text is fed in as it arrives; every action object is returned as soon
+    as its closing brace is seen, long before the whole response is
+    complete. Only the structure is tracked while scanning (nesting,
+    strings, escapes); each finished object is decoded once with
+    json.loads. Objects that fail to decode are logged and skipped, the
+    final json.loads of ``text`` still sees them.
+
+    Usage:
+        parser = ActionStreamParser()
+        for chunk in chunks:
+            for action in parser.feed(chunk):
+                handle(action)
+        result = json.loads(parser.text)
+    """
+
+    def __init__(self, key: str = "actions"):
+        self.key = key
+        self._text = ""
+        self._pos = 0
+        # Open containers, "{" or "["
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._current_key: Optional[str] = None
+        # Stack depth of the actions array once it has been opened
+        self._array_depth: Optional[int] = None
+        self._object_start: Optional[int] = None
+        self.emitted = 0
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far."""
+        return self._text
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """
+        Add a piece of the response.
+
+        Returns:
+            Action objects completed by this chunk, in order
+        """
+        if not chunk:
+            return []
+        self._text += chunk
+        text = self._text
+        actions = []
+        stack = self._stack
+        for i in range(self._pos, len(text)):
+            char = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if len(stack) == 1:
+                        self._last_string = text[self._string_start:i]
+                continue
+            if char == '"':
+                self._in_string = True
+                self._string_start = i + 1
+            elif char == ":" and len(stack) == 1:
+                self._current_key = self._last_string
+            elif char == "{" or char == "[":
+                stack.append(char)
+                if char == "[" and len(stack) == 2 and self._current_key == self.key:
+                    self._array_depth = 2
+                elif char == "{" and self._array_depth is not None and len(stack) == self._array_depth + 1:
+                    self._object_start = i
+            elif char == "}" or char == "]":
+                if not stack:
+                    continue
+                if char == "}" and self._object_start is not None and len(stack) == self._array_depth + 1:
+                    action = self._decode(text[self._object_start:i + 1])
+                    if action is not None:
+                        actions.append(action)
+                    self._object_start = None
+                stack.pop()
+                if self._array_depth is not None and len(stack) < self._array_depth:
+                    self._array_depth = None
+                if len(stack) == 1:
+                    self._current_key = None
+        self._pos = len(text)
+        self.emitted += len(actions)
+        return actions
+
+    @staticmethod
+    def _decode(fragment: str) -> Optional[Dict[str, Any]]:
+        try:
+            action = json.loads(fragment)
+        except json.JSONDecodeError as e:
+            logger.warning(f"Skipping malformed streamed action: {e}")
+            return None
+        return action if isinstance(action, dict) else None
+
+
+def _chunk_text(chunk) -> str:
+    # Chat completion chunks; the final usage chunk has no choices
+    if not getattr(chunk, "choices", None):
+        return ""
+    return chunk.choices[0].delta.content or ""
+
+
+def iter_actions(chunks: Iterable[Any], parser: Optional[ActionStreamParser] = None) -> Iterator[Dict[str, Any]]:
+    """Yield action objects from a streamed chat completion as they complete."""
+    parser = parser or ActionStreamParser()
+    for chunk in chunks:
+        yield from parser.feed(_chunk_text(chunk))
+
+
+async def aiter_actions(
+    chunks: AsyncIterable[Any], parser: Optional[ActionStreamParser] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """Async variant of iter_actions for AsyncOpenAI streams."""
+    parser = parser or ActionStreamParser()
+    async for chunk in chunks:
+        for action in parser.feed(_chunk_text(chunk)):
+            yield action
+
+
+def collect_stream(chunks: Iterable[Any], on_action: ActionCallback) -> str:
+    """
+    Pass each completed action of a stream to on_action.
+
+    Returns:
+        The full response text, for the usual json.loads and validation
+    """
+    parser = ActionStreamParser()
+    for action in iter_actions(chunks, parser):
+        on_action(action)
+    return parser.text
+
+
+async def acollect_stream(chunks: AsyncIterable[Any], on_action: ActionCallback) -> str:
+    """Async variant of collect_stream."""
+    parser = ActionStreamParser()
+    async for action in aiter_actions(chunks, parser):
+        on_action(action)
+    return parser.text
+
+
+def emit_actions(result: Dict[str, Any], on_action: Optional[ActionCallback]):
+    """Pass the actions of an already complete result (cached, reused) to on_action."""
+    if on_action is not None:
+        for action in result.get("actions", []):
+            on_action(action)
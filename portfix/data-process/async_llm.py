@@ -0,0 +1,285 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+import weakref
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from openai import AsyncOpenAI
+
+from action_stream import ActionCallback, acollect_stream
+from llm_telemetry import LLMTelemetry, ainstrumented_create
+
+logger = logging.getLogger(__name__)
+
+# Chat completions in flight at once per event loop, across every agent
+DEFAULT_MAX_CONCURRENCY = 8
+# Seconds one agent request may take inside a tick before it is cancelled
+DEFAULT_REQUEST_DEADLINE = 60.0
+
+
+class _LoopState:
+    def __init__(self, max_concurrency: int):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.clients: Dict[Tuple[str, str], Any] = {}
+
+
+class AsyncLLMPool:
+    """
+    Shared AsyncOpenAI clients with a bound on concurrent requests.
+
+    One client, and so one HTTP connection pool, is kept per (base_url,
+    api_key) and event loop; agents pointing at the same endpoint share it
+    instead of each opening their own connections. ``max_concurrency`` caps
+    the requests in flight on a loop across all endpoints.
+
+    Usage:
+        pool = AsyncLLMPool()
+        response = await pool.create(api_key, base_url, model=..., messages=...)
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        client_factory: Callable[..., Any] = AsyncOpenAI,
+        max_retries: int = 2,
+    ):
+        self.max_concurrency = max_concurrency
+        self.client_factory = client_factory
+        self.max_retries = max_retries
+        # Clients and semaphores are bound to the loop they were first used on
+        self._loops: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopState]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _state(self) -> _LoopState:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            state = self._loops.get(loop)
+            if state is None:
+                state = self._loops[loop] = _LoopState(self.max_concurrency)
+            return state
+
+    def client(self, api_key: str, base_url: str):
+        """The shared client for an endpoint on the running loop."""
+        state = self._state()
+        key = (base_url, api_key)
+        client = state.clients.get(key)
+        if client is None:
+            client = state.clients[key] = self.client_factory(
+                api_key=api_key, base_url=base_url, max_retries=self.max_retries
+            )
+        return client
+
+    async def create(
+        self,
+        api_key: str,
+        base_url: str,
+        *,
+        agent: str = "unknown",
+        telemetry: Optional[LLMTelemetry] = None,
+        **request,
+    ):
+        """
+        Run one chat completion through the shared client.
+
+        Args:
+            api_key: API key of the endpoint
+            base_url: Base URL of the endpoint
+            agent: Agent label of the call in telemetry
+            telemetry: Where to record the call; defaults to the shared one
+            **request: Arguments of chat.completions.create
+
+        Returns:
+            The chat completion response
+        """
+        state = self._state()
+        client = self.client(api_key, base_url)
+        async with state.semaphore:
+            return await ainstrumented_create(client, agent, telemetry, **request)
+
+    async def stream(
+        self,
+        api_key: str,
+        base_url: str,
+        on_action: ActionCallback,
+        *,
+        agent: str = "unknown",
+        telemetry: Optional[LLMTelemetry] = None,
+        **request,
+    ) -> str:
+        """
+        Run one streamed chat completion, passing actions to on_action as they complete.
+
+        The concurrency slot is held until the stream is fully read.
+
+        Returns:
+            The full response text
+        """
+        state = self._state()
+        client = self.client(api_key, base_url)
+        async with state.semaphore:
+            chunks = await ainstrumented_create(client, agent, telemetry, stream=True, **request)
+            return await acollect_stream(chunks, on_action)
+
+    async def aclose(self):
+        """Close the clients opened on the running loop."""
+        state = self._state()
+        clients, state.clients = list(state.clients.values()), {}
+        for client in clients:
+            close = getattr(client, "close", None)
+            if close is not None:
+                await close()
+
+
+_pool_lock = threading.Lock()
+_default_pool: Optional[AsyncLLMPool] = None
+
+
+def get_default_pool() -> AsyncLLMPool:
+    """
+    Process-wide pool shared by every agent's async methods.
+
+    A HedgedLLMPool when an API key for any DEFAULT_BACKUP_ENDPOINTS entry is
+    set, so slow requests are hedged on the backup; a plain AsyncLLMPool
+    otherwise.
+    """
+    global _default_pool
+    with _pool_lock:
+        if _default_pool is None:
+            # hedged_llm subclasses AsyncLLMPool, so it can only be imported here
+            from hedged_llm import DEFAULT_BACKUP_ENDPOINTS, HedgedLLMPool
+
+            if any(os.environ.get(endpoint.api_key_env) for endpoint in DEFAULT_BACKUP_ENDPOINTS):
+                _default_pool = HedgedLLMPool()
+            else:
+                _default_pool = AsyncLLMPool()
+        return _default_pool
+
+
+class AgentJob(NamedTuple):
+    """One agent request of a tick."""
+
+    name: str
+    # Called as call(pool=pool); returns the agent's result dict, e.g.
+    # functools.partial(agent.agenerate_trading_actions, market_data)
+    call: Callable[..., Awaitable[Dict[str, Any]]]
+    # Seconds before the request is cancelled; None uses the tick's deadline
+    deadline: Optional[float] = None
+    # Called with no arguments when the request times out, fails or returns
+    # no actions, e.g. partial(rule_based_actions, market_data)
+    fallback: Optional[Callable[[], Dict[str, Any]]] = None
+
+
+class AgentTickResult(NamedTuple):
+    """Outcome of one concurrent pass over the agents."""
+
+    # Result dict by job name; timed out or failed jobs get their fallback's
+    # result, or an error result without one
+    results: Dict[str, Dict[str, Any]]
+    # Jobs cancelled at their deadline
+    timed_out: List[str]
+    # Jobs that raised
+    failed: Dict[str, str]
+    elapsed: float
+
+
+def _error_result(error: str) -> Dict[str, Any]:
+    return {"actions": [], "error": error, "timestamp": datetime.now().isoformat()}
+
+
+async def gather_agents(
+    jobs: List[AgentJob],
+    deadline: float = DEFAULT_REQUEST_DEADLINE,
+    pool: Optional[AsyncLLMPool] = None,
+) -> AgentTickResult:
+    """
+    Run every agent request of a tick concurrently.
+
+    The tick takes as long as its slowest request rather than the sum of
+    them. Each request is cancelled at its own deadline; a cancelled or
+    failed job still gets a result, from its fallback if it has one and in
+    the agents' error shape otherwise, so callers can treat every entry
+    alike.
+
+    Args:
+        jobs: Agent requests to run
+        deadline: Default per-request deadline in seconds
+        pool: Pool the requests go through; defaults to the shared one
+
+    Returns:
+        AgentTickResult with results by job name
+    """
+    pool = pool or get_default_pool()
+    start = time.monotonic()
+
+    async def run(job: AgentJob):
+        return await asyncio.wait_for(job.call(pool=pool), job.deadline or deadline)
+
+    outcomes = await asyncio.gather(*(run(job) for job in jobs), return_exceptions=True)
+
+    results: Dict[str, Dict[str, Any]] = {}
+    timed_out: List[str] = []
+    failed: Dict[str, str] = {}
+    for job, outcome in zip(jobs, outcomes):
+        if isinstance(outcome, asyncio.TimeoutError):
+            limit = job.deadline or deadline
+            logger.warning(f"{job.name}: no response within {limit:.1f}s, request cancelled")
+            timed_out.append(job.name)
+            results[job.name] = _error_result(f"deadline of {limit:.1f}s exceeded")
+        elif isinstance(outcome, BaseException):
+            logger.error(f"{job.name}: {outcome}")
+            failed[job.name] = str(outcome)
+            results[job.name] = _error_result(str(outcome))
+        else:
+            results[job.name] = outcome
+        if job.fallback is not None and not results[job.name].get("actions"):
+            reason = results[job.name].get("error", "no actions returned")
+            logger.warning(f"{job.name}: using fallback ({reason})")
+            results[job.name] = {**job.fallback(), "fallback_reason": reason}
+    return AgentTickResult(results, timed_out, failed, time.monotonic() - start)
+
+
+class AgentTickRunner:
+    """
+    Run agent ticks from synchronous code.
+
+    Ticks execute on a private event loop in a background thread that lives
+    as long as the runner, so the pool's connections stay open between
+    ticks instead of being torn down by a fresh asyncio.run each time.
+
+    Usage:
+        runner = AgentTickRunner()
+        tick = runner.run([
+            AgentJob("trading", partial(trading_agent.agenerate_trading_actions, market_data)),
+            AgentJob("shorting", partial(shorting_analyzer.aanalyze_shorting_opportunities, joule_data)),
+        ])
+    """
+
+    def __init__(
+        self,
+        pool: Optional[AsyncLLMPool] = None,
+        deadline: float = DEFAULT_REQUEST_DEADLINE,
+    ):
+        self.pool = pool or get_default_pool()
+        self.deadline = deadline
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="agent-ticks", daemon=True)
+        self._thread.start()
+
+    def run(self, jobs: List[AgentJob], deadline: Optional[float] = None) -> AgentTickResult:
+        """Run one tick and block until every job finished or hit its deadline."""
+        future = asyncio.run_coroutine_threadsafe(
+            gather_agents(jobs, deadline or self.deadline, self.pool), self._loop
+        )
+        return future.result()
+
+    def close(self):
+        """Close the pool's connections and stop the loop."""
+        if not self._loop.is_running():
+            return
+        asyncio.run_coroutine_threadsafe(self.pool.aclose(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
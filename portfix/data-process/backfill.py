@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Backfill Merkle kline history into a columnar archive.
+
+Splits the range into pages, fetches them concurrently through the shared
+transport, refetches missing bars, then merges the result into
+<archive>/merkle/<symbol>/<unit>.npz (one compressed array per column).
+
+    python backfill.py BTC_USD ETH_USD --start 2025-01-01 --end 2025-06-01 --unit 30m
+    python backfill.py BTC_USD --days 90 --store   # also warm the local kline store
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from MarketAnalyzer import MarketAnalyzer
+from kline_pages import (DEFAULT_PAGE_BARS, DEFAULT_PAGE_CONCURRENCY, DEFAULT_REFILL_PASSES,
+                         dedupe_klines, fetch_range)
+from kline_store import KLINE_DTYPE, get_default_store, timeframe_to_ms
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ARCHIVE_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "output", "archive"
+)
+
+
+def archive_path(root: str, venue: str, symbol: str, unit: int) -> str:
+    return os.path.join(root, venue, symbol, f"{unit}.npz")
+
+
+def read_archive(path: str) -> np.ndarray:
+    """Load a columnar archive back into KLINE_DTYPE rows (empty if missing)."""
+    if not os.path.exists(path):
+        return np.empty(0, dtype=KLINE_DTYPE)
+    with np.load(path) as columns:
+        klines = np.empty(len(columns["ts"]), dtype=KLINE_DTYPE)
+        for field in KLINE_DTYPE.names:
+            klines[field] = columns[field]
+    return klines
+
+
+def write_archive(path: str, klines: np.ndarray) -> np.ndarray:
+    """
+    Merge rows into a columnar archive, new rows winning on equal ts.
+
+    Each column is stored as its own compressed array, so readers can load
+    only the columns they need and repeated values compress well.
+
+    Returns:
+        The merged rows
+    """
+    merged = dedupe_klines([klines.astype(KLINE_DTYPE, copy=False), read_archive(path)])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp.npz"
+    np.savez_compressed(tmp_path, **{field: np.ascontiguousarray(merged[field]) for field in KLINE_DTYPE.names})
+    os.replace(tmp_path, path)
+    return merged
+
+
+def _parse_time(value: str) -> int:
+    if value.isdigit():
+        return int(value)
+    return int(pd.Timestamp(value, tz="UTC").timestamp() * 1000)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("symbols", nargs="+", help="Merkle pairs, e.g. BTC_USD")
+    parser.add_argument("--start", help="Range start, ISO date/time (UTC) or epoch ms")
+    parser.add_argument("--end", help="Range end, ISO date/time (UTC) or epoch ms; default now")
+    parser.add_argument("--days", type=float, help="Range length ending at --end, instead of --start")
+    parser.add_argument("--unit", default="30m", help="Bar size, e.g. 30m, 4h or ms")
+    parser.add_argument("--page-bars", type=int, default=DEFAULT_PAGE_BARS)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_PAGE_CONCURRENCY)
+    parser.add_argument("--refill-passes", type=int, default=DEFAULT_REFILL_PASSES)
+    parser.add_argument("--archive", default=DEFAULT_ARCHIVE_DIR, help="Archive root directory")
+    parser.add_argument("--store", action="store_true", help="Also merge into the local kline store")
+    args = parser.parse_args(argv)
+
+    unit = timeframe_to_ms(args.unit)
+    to_time = _parse_time(args.end) if args.end else int(time.time() * 1000)
+    if args.start:
+        from_time = _parse_time(args.start)
+    elif args.days:
+        from_time = to_time - int(args.days * 24 * 60 * 60 * 1000)
+    else:
+        parser.error("one of --start or --days is required")
+
+    analyzer = MarketAnalyzer()
+    store = get_default_store() if args.store else None
+    for symbol in args.symbols:
+        started = time.perf_counter()
+        klines, gaps = fetch_range(analyzer.fetch_klines, symbol, from_time, to_time, unit,
+                                   args.page_bars, args.concurrency, args.refill_passes)
+        path = archive_path(args.archive, "merkle", symbol, unit)
+        merged = write_archive(path, klines)
+        if store is not None:
+            store.merge("merkle", symbol, unit, klines)
+        missing = sum((b + 1 - a) // unit for a, b in gaps)
+        logger.info(
+            f"{symbol}: {len(klines)} bars in {time.perf_counter() - started:.1f}s, "
+            f"{missing} still missing in {len(gaps)} gaps; archive {path} has {len(merged)} bars"
+        )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        handlers=[logging.StreamHandler(sys.stdout)],
+    )
+    main()
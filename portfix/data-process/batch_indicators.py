@@ -0,0 +1,463 @@
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Same columns, in the same order, as MarketAnalyzer.calculate_technical_indicators
+INDICATOR_FIELDS = [
+    "ma5", "ma10", "ma20", "ma60",
+    "ema12", "ema26",
+    "rsi6", "rsi12", "rsi24",
+    "bb_upper", "bb_middle", "bb_lower",
+    "macd", "macd_signal", "macd_hist",
+    "k", "d", "j",
+    "atr", "cci", "adx", "trix", "willr",
+    "sar", "plus_di", "minus_di", "roc", "tema", "mom",
+]
+
+INDICATOR_DTYPE = np.dtype([(name, "<f8") for name in INDICATOR_FIELDS])
+
+# TA-Lib treats anything inside this band as zero (TA_IS_ZERO)
+EPSILON = 0.00000001
+
+
+class BatchIndicators(NamedTuple):
+    """Indicators for a universe of symbols on a shared time axis."""
+
+    symbols: List[str]
+    # Candle open times in milliseconds, shape (T,)
+    ts: np.ndarray
+    # INDICATOR_DTYPE records, shape (S, T), or (S,) when only the last bar was kept
+    values: np.ndarray
+
+
+def stack_ohlc(
+    frames: Dict[str, pd.DataFrame], length: Optional[int] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Align per-symbol kline frames on the union of their timestamps and stack
+    them into symbols x time matrices.
+
+    A symbol with a shorter history or missing bars gets NaN there instead
+    of cutting every other symbol's history down to the common bars;
+    compute_indicator_matrix computes each symbol from its own bars only.
+
+    Args:
+        frames: Mapping of symbol to kline DataFrame with timestamp/high/low/close
+        length: Keep only the newest ``length`` aligned bars
+
+    Returns:
+        Dict with "symbols", "ts" (T,) and "open"/"high"/"low"/"close" (S, T)
+    """
+    symbols = list(frames)
+    stamps = [
+        frames[symbol]["timestamp"].to_numpy(dtype="datetime64[ms]").astype(np.int64)
+        for symbol in symbols
+    ]
+    union = np.unique(np.concatenate(stamps)) if stamps else np.empty(0, dtype=np.int64)
+    if length is not None:
+        union = union[-length:] if length > 0 else union[:0]
+
+    stacked = {"symbols": symbols, "ts": union}
+    for field in ("open", "high", "low", "close"):
+        stacked[field] = np.full((len(symbols), len(union)), np.nan)
+    for row, (symbol, ts) in enumerate(zip(symbols, stamps)):
+        positions = np.searchsorted(union, ts)
+        inside = positions < len(union)
+        inside[inside] = union[positions[inside]] == ts[inside]
+        df = frames[symbol]
+        for field in ("open", "high", "low", "close"):
+            if field in df:
+                stacked[field][row, positions[inside]] = df[field].to_numpy(dtype=np.float64)[inside]
+    return stacked
+
+
+def _empty(shape) -> np.ndarray:
+    return np.full(shape, np.nan)
+
+
+def _sma(x: np.ndarray, period: int, start: int = 0) -> np.ndarray:
+    out = _empty(x.shape)
+    first = start + period - 1
+    if first >= x.shape[1]:
+        return out
+    csum = np.cumsum(x[:, start:], axis=1)
+    out[:, first] = csum[:, period - 1]
+    out[:, first + 1:] = csum[:, period:] - csum[:, :-period]
+    out[:, first:] /= period
+    return out
+
+
+def _ema(x: np.ndarray, period: int, start: int = 0) -> np.ndarray:
+    """EMA along time seeded with the SMA of x[:, start:start+period], as TA-Lib."""
+    out = _empty(x.shape)
+    first = start + period - 1
+    if first >= x.shape[1]:
+        return out
+    k = 2.0 / (period + 1)
+    columns = x.T
+    result = out.T
+    prev = columns[start:first + 1].sum(axis=0) / period
+    result[first] = prev
+    for t in range(first + 1, len(columns)):
+        prev = (columns[t] - prev) * k + prev
+        result[t] = prev
+    return out
+
+
+def _rolling(x: np.ndarray, period: int, reducer) -> np.ndarray:
+    out = _empty(x.shape)
+    if period <= x.shape[1]:
+        out[:, period - 1:] = reducer(sliding_window_view(x, period, axis=1), axis=-1)
+    return out
+
+
+def _change(x: np.ndarray, period: int, percent: bool) -> np.ndarray:
+    out = _empty(x.shape)
+    if period >= x.shape[1]:
+        return out
+    past = x[:, :-period]
+    if percent:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out[:, period:] = np.where(past != 0, (x[:, period:] / past - 1.0) * 100.0, 0.0)
+    else:
+        out[:, period:] = x[:, period:] - past
+    return out
+
+
+def _true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    tr = _empty(high.shape)
+    prev_close = close[:, :-1]
+    tr[:, 1:] = np.maximum(
+        high[:, 1:] - low[:, 1:],
+        np.maximum(np.abs(prev_close - high[:, 1:]), np.abs(low[:, 1:] - prev_close)),
+    )
+    return tr
+
+
+def _wilder_average(x: np.ndarray, period: int, start: int) -> np.ndarray:
+    """Wilder smoothing seeded with the mean of x[:, start:start+period] (ATR/RSI style)."""
+    out = _empty(x.shape)
+    first = start + period - 1
+    if first >= x.shape[1]:
+        return out
+    columns = x.T
+    result = out.T
+    prev = columns[start:first + 1].sum(axis=0) / period
+    result[first] = prev
+    for t in range(first + 1, len(columns)):
+        prev = (prev * (period - 1) + columns[t]) / period
+        result[t] = prev
+    return out
+
+
+def _rsi(close: np.ndarray, period: int) -> np.ndarray:
+    out = _empty(close.shape)
+    if period >= close.shape[1]:
+        return out
+    diff = np.diff(close, axis=1, prepend=np.nan)
+    gains = _wilder_average(np.where(diff > 0, diff, 0.0), period, 1)
+    losses = _wilder_average(np.where(diff < 0, -diff, 0.0), period, 1)
+    total = gains + losses
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = np.where(np.abs(total) < EPSILON, 0.0, 100.0 * (gains / total))
+    out[:, period:] = rsi[:, period:]
+    return out
+
+
+def _dmi(high: np.ndarray, low: np.ndarray, tr: np.ndarray, period: int):
+    """+DI, -DI and ADX from the true range, sharing one set of smoothed DM and TR sums, as TA-Lib."""
+    shape = high.shape
+    plus_di, minus_di, adx = _empty(shape), _empty(shape), _empty(shape)
+    steps = shape[1]
+    if period >= steps:
+        return plus_di, minus_di, adx
+
+    diff_p = np.zeros(shape)
+    diff_m = np.zeros(shape)
+    diff_p[:, 1:] = high[:, 1:] - high[:, :-1]
+    diff_m[:, 1:] = low[:, :-1] - low[:, 1:]
+    plus_dm = np.where((diff_p > 0) & (diff_p > diff_m), diff_p, 0.0).T
+    minus_dm = np.where((diff_m > 0) & (diff_p < diff_m), diff_m, 0.0).T
+    tr = tr.T
+
+    smooth_plus = plus_dm[1:period].sum(axis=0)
+    smooth_minus = minus_dm[1:period].sum(axis=0)
+    smooth_tr = tr[1:period].sum(axis=0)
+    dx_total = np.zeros(shape[0])
+    prev_adx = None
+    plus_out, minus_out, adx_out = plus_di.T, minus_di.T, adx.T
+    for t in range(period, steps):
+        smooth_plus = smooth_plus - smooth_plus / period + plus_dm[t]
+        smooth_minus = smooth_minus - smooth_minus / period + minus_dm[t]
+        smooth_tr = smooth_tr - smooth_tr / period + tr[t]
+
+        tr_valid = np.abs(smooth_tr) >= EPSILON
+        with np.errstate(divide="ignore", invalid="ignore"):
+            plus = np.where(tr_valid, 100.0 * (smooth_plus / smooth_tr), 0.0)
+            minus = np.where(tr_valid, 100.0 * (smooth_minus / smooth_tr), 0.0)
+            total = plus + minus
+            dx_valid = tr_valid & (np.abs(total) >= EPSILON)
+            dx = np.where(dx_valid, 100.0 * (np.abs(minus - plus) / total), 0.0)
+        plus_out[t] = plus
+        minus_out[t] = minus
+
+        if t < 2 * period - 1:
+            dx_total += dx
+        elif t == 2 * period - 1:
+            prev_adx = (dx_total + dx) / period
+            adx_out[t] = prev_adx
+        else:
+            prev_adx = np.where(dx_valid, (prev_adx * (period - 1) + dx) / period, prev_adx)
+            adx_out[t] = prev_adx
+    return plus_di, minus_di, adx
+
+
+def _sar(high: np.ndarray, low: np.ndarray, acceleration: float, maximum: float) -> np.ndarray:
+    """Parabolic SAR with per-symbol state carried as vectors, as TA-Lib SAR."""
+    out = _empty(high.shape)
+    if high.shape[1] < 2:
+        return out
+    highs, lows, result = high.T, low.T, out.T
+
+    diff_p = highs[1] - highs[0]
+    diff_m = lows[0] - lows[1]
+    is_long = ~((diff_m > 0) & (diff_p < diff_m))
+    ep = np.where(is_long, highs[1], lows[1])
+    sar = np.where(is_long, lows[0], highs[0])
+    af = np.full(high.shape[0], acceleration)
+    new_high, new_low = highs[1], lows[1]
+
+    for t in range(1, len(highs)):
+        prev_high, prev_low = new_high, new_low
+        new_high, new_low = highs[t], lows[t]
+
+        flip_short = is_long & (new_low <= sar)
+        flip_long = ~is_long & (new_high >= sar)
+        flipped = flip_short | flip_long
+
+        # Reversals: the SAR jumps to the old extreme point, clamped by the last two bars
+        reversal = np.where(
+            flip_short,
+            np.maximum(np.maximum(ep, prev_high), new_high),
+            np.minimum(np.minimum(ep, prev_low), new_low),
+        )
+        # Continuations: a new extreme point speeds up the acceleration factor
+        extends = np.where(is_long, new_high > ep, new_low < ep) & ~flipped
+        ep = np.where(flipped, np.where(flip_short, new_low, new_high), ep)
+        ep = np.where(extends, np.where(is_long, new_high, new_low), ep)
+        af = np.where(flipped, acceleration, np.where(extends, np.minimum(af + acceleration, maximum), af))
+
+        current = np.where(flipped, reversal, sar)
+        result[t] = current
+        is_long = np.where(flipped, ~is_long, is_long)
+
+        sar = current + af * (ep - current)
+        sar = np.where(
+            is_long,
+            np.minimum(np.minimum(sar, prev_low), new_low),
+            np.maximum(np.maximum(sar, prev_high), new_high),
+        )
+    return out
+
+
+class _Block:
+    """OHLC matrices of symbols sharing the same bars, with memoized intermediates."""
+
+    def __init__(self, high: np.ndarray, low: np.ndarray, close: np.ndarray):
+        self.high, self.low, self.close = high, low, close
+        self.steps = close.shape[1]
+        self._memo: Dict[tuple, np.ndarray] = {}
+
+    def _cached(self, key: tuple, build) -> np.ndarray:
+        if key not in self._memo:
+            self._memo[key] = build()
+        return self._memo[key]
+
+    def sma(self, period: int) -> np.ndarray:
+        return self._cached(("sma", period), lambda: _sma(self.close, period))
+
+    def ema(self, period: int) -> np.ndarray:
+        return self._cached(("ema", period), lambda: _ema(self.close, period))
+
+    def true_range(self) -> np.ndarray:
+        return self._cached(("tr",), lambda: _true_range(self.high, self.low, self.close))
+
+
+def _bollinger(block: _Block) -> Dict[str, np.ndarray]:
+    middle = block.sma(20)
+    stddev = _rolling(block.close, 20, np.std)
+    return {"bb_upper": middle + 2 * stddev, "bb_middle": middle, "bb_lower": middle - 2 * stddev}
+
+
+def _macd(block: _Block) -> Dict[str, np.ndarray]:
+    # TA-Lib seeds MACD's fast EMA on the same bar as the slow one
+    macd = _ema(block.close, 12, start=26 - 12) - block.ema(26)
+    signal = _ema(macd, 9, start=25)
+    macd[:, :min(33, block.steps)] = np.nan
+    return {"macd": macd, "macd_signal": signal, "macd_hist": macd - signal}
+
+
+def _kdj(block: _Block) -> Dict[str, np.ndarray]:
+    highest9 = _rolling(block.high, 9, np.max)
+    lowest9 = _rolling(block.low, 9, np.min)
+    diff = (highest9 - lowest9) / 100.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fastk = np.where(diff != 0, (block.close - lowest9) / diff, 0.0)
+    fastk[np.isnan(diff)] = np.nan
+    slowk = _sma(fastk, 3, start=8)
+    slowd = _sma(slowk, 3, start=10)
+    slowk[:, :min(12, block.steps)] = np.nan
+    return {"k": slowk, "d": slowd, "j": 3 * slowk - 2 * slowd}
+
+
+def _cci(block: _Block) -> Dict[str, np.ndarray]:
+    typical = (block.high + block.low + block.close) / 3.0
+    cci = _empty(block.close.shape)
+    if block.steps >= 14:
+        windows = sliding_window_view(typical, 14, axis=1)
+        average = windows.mean(axis=-1)
+        deviation = np.abs(windows - average[..., None]).mean(axis=-1)
+        spread = typical[:, 13:] - average
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cci[:, 13:] = np.where(
+                (spread != 0) & (deviation != 0), spread / (0.015 * deviation), 0.0
+            )
+    return {"cci": cci}
+
+
+def _directional(block: _Block) -> Dict[str, np.ndarray]:
+    plus_di, minus_di, adx = _dmi(block.high, block.low, block.true_range(), 14)
+    return {"plus_di": plus_di, "minus_di": minus_di, "adx": adx}
+
+
+def _trix(block: _Block) -> Dict[str, np.ndarray]:
+    ema1 = _ema(block.close, 30)
+    ema2 = _ema(ema1, 30, start=29)
+    ema3 = _ema(ema2, 30, start=58)
+    return {"trix": _change(ema3, 1, percent=True)}
+
+
+def _willr(block: _Block) -> Dict[str, np.ndarray]:
+    highest14 = _rolling(block.high, 14, np.max)
+    lowest14 = _rolling(block.low, 14, np.min)
+    diff = (highest14 - lowest14) / -100.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        willr = np.where(diff != 0, (highest14 - block.close) / diff, 0.0)
+    willr[np.isnan(diff)] = np.nan
+    return {"willr": willr}
+
+
+def _tema(block: _Block) -> Dict[str, np.ndarray]:
+    tema1 = _ema(block.close, 20)
+    tema2 = _ema(tema1, 20, start=19)
+    tema3 = _ema(tema2, 20, start=38)
+    return {"tema": 3 * tema1 - 3 * tema2 + tema3}
+
+
+# Indicator field -> builder returning it (and the fields computed alongside it)
+_BUILDERS: Dict[str, Callable[[_Block], Dict[str, np.ndarray]]] = {
+    **{f"ma{p}": (lambda block, p=p: {f"ma{p}": block.sma(p)}) for p in (5, 10, 20, 60)},
+    **{f"ema{p}": (lambda block, p=p: {f"ema{p}": block.ema(p)}) for p in (12, 26)},
+    **{f"rsi{p}": (lambda block, p=p: {f"rsi{p}": _rsi(block.close, p)}) for p in (6, 12, 24)},
+    **dict.fromkeys(("bb_upper", "bb_middle", "bb_lower"), _bollinger),
+    **dict.fromkeys(("macd", "macd_signal", "macd_hist"), _macd),
+    **dict.fromkeys(("k", "d", "j"), _kdj),
+    "atr": lambda block: {"atr": _wilder_average(block.true_range(), 14, 1)},
+    "cci": _cci,
+    **dict.fromkeys(("plus_di", "minus_di", "adx"), _directional),
+    "trix": _trix,
+    "willr": _willr,
+    "sar": lambda block: {"sar": _sar(block.high, block.low, 0.02, 0.2)},
+    "roc": lambda block: {"roc": _change(block.close, 10, percent=True)},
+    "mom": lambda block: {"mom": _change(block.close, 10, percent=False)},
+    "tema": _tema,
+}
+
+
+def _compute_block(block: _Block, fields: Sequence[str], values: np.ndarray):
+    computed: Dict[str, np.ndarray] = {}
+    for name in fields:
+        if name not in computed:
+            computed.update(_BUILDERS[name](block))
+        values[name] = computed[name]
+
+
+def compute_indicator_matrix(
+    high: np.ndarray, low: np.ndarray, close: np.ndarray, fields: Optional[Sequence[str]] = None
+) -> np.ndarray:
+    """
+    Compute indicators for every symbol in one vectorized pass.
+
+    Bars where a symbol's high, low or close is NaN (stack_ohlc's padding)
+    are skipped for that symbol: each row's indicators are what talib gives
+    on its own bars, with NaN on the padded ones. Rows with the same bars
+    are computed together.
+
+    Args:
+        high: Highs, shape (S, T)
+        low: Lows, shape (S, T)
+        close: Closes, shape (S, T)
+        fields: Indicator fields to compute, default INDICATOR_FIELDS; only
+            these and the intermediates they need are computed
+
+    Returns:
+        Structured array of shape (S, T) with one float field per requested
+        indicator; values match talib run on each row, with NaN where talib
+        has no output yet
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    fields = list(INDICATOR_FIELDS if fields is None else fields)
+    values = np.full(close.shape, np.nan, dtype=np.dtype([(name, "<f8") for name in fields]))
+
+    present = np.isfinite(high) & np.isfinite(low) & np.isfinite(close)
+    if present.all():
+        _compute_block(_Block(high, low, close), fields, values)
+        return values
+
+    # Group symbols by which bars they have, and compute each group on those bars only
+    groups: Dict[bytes, List[int]] = {}
+    for row in range(close.shape[0]):
+        groups.setdefault(present[row].tobytes(), []).append(row)
+    for rows in groups.values():
+        columns = np.flatnonzero(present[rows[0]])
+        if len(columns) == 0:
+            continue
+        part = np.empty((len(rows), len(columns)), dtype=values.dtype)
+        block = _Block(high[np.ix_(rows, columns)], low[np.ix_(rows, columns)], close[np.ix_(rows, columns)])
+        _compute_block(block, fields, part)
+        values[np.ix_(rows, columns)] = part
+    return values
+
+
+def compute_batch_indicators(
+    frames: Dict[str, pd.DataFrame],
+    length: Optional[int] = None,
+    last_only: bool = False,
+    fields: Optional[Sequence[str]] = None,
+) -> BatchIndicators:
+    """
+    Stack per-symbol kline frames and compute indicators for all of them at once.
+
+    Args:
+        frames: Mapping of symbol to kline DataFrame
+        length: Keep only the newest ``length`` aligned bars
+        last_only: Keep only each symbol's last bar's values, shape (S,)
+        fields: Compute only these indicator fields (and what they depend on)
+
+    Returns:
+        BatchIndicators with the symbols, time axis and structured values
+    """
+    stacked = stack_ohlc(frames, length=length)
+    values = compute_indicator_matrix(stacked["high"], stacked["low"], stacked["close"], fields=fields)
+    if last_only and values.shape[1] == 0:
+        values = np.full(len(values), np.nan, dtype=values.dtype)
+    elif last_only:
+        # A symbol's last bar may be older than the newest bar of the union
+        present = np.isfinite(stacked["close"])
+        last = values.shape[1] - 1 - np.argmax(present[:, ::-1], axis=1)
+        values = values[np.arange(len(values)), last]
+    return BatchIndicators(stacked["symbols"], stacked["ts"], values)
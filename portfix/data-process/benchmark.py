@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Offline micro-benchmarks for the market data pipeline.
+
+Runs against synthetic random-walk klines so no network access is needed.
+
+    python benchmark.py snapshot --symbols 50 --bars 300
+    python benchmark.py signals --symbols 20 --years 3
+    python benchmark.py decode --bars 1000
+    python benchmark.py prompts --symbols 20
+"""
+import argparse
+import json
+import re
+import time
+import tracemalloc
+from typing import Callable, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+from MarketAnalyzer import MarketAnalyzer
+from generator import TradingAgent
+from lending_agent import LendingAgent, get_sample_borrowing_rates, get_sample_lending_rates
+from batch_indicators import INDICATOR_FIELDS
+from kline_decode import decode_binance_klines, decode_merkle_klines
+from prompt_encoding import encode_table
+from trend_signals import compute_trend_signals
+
+
+def make_klines(bars: int, seed: int = 0, unit: int = 1800000, start_price: float = 100.0) -> pd.DataFrame:
+    """Build a random-walk OHLCV frame shaped like fetch_kline_data's output"""
+    rng = np.random.default_rng(seed)
+    close = start_price * np.exp(np.cumsum(rng.normal(0, 0.01, bars)))
+    open_ = np.r_[start_price, close[:-1]]
+    spread = np.abs(rng.normal(0, 0.005, bars)) * close
+    ts = (int(time.time() * 1000) // unit - bars + 1) * unit + np.arange(bars, dtype=np.int64) * unit
+    df = pd.DataFrame({
+        'ts': ts,
+        'open': open_,
+        'high': np.maximum(open_, close) + spread,
+        'low': np.minimum(open_, close) - spread,
+        'close': close,
+        'volume': rng.uniform(10, 1000, bars),
+    })
+    df['timestamp'] = pd.to_datetime(df['ts'], unit='ms')
+    return df
+
+
+def time_per_call(func: Callable, frames: Dict[str, pd.DataFrame], repeat: int) -> float:
+    """Best-of-repeat mean seconds per symbol for func(df)"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for df in frames.values():
+            func(df)
+        best = min(best, (time.perf_counter() - start) / len(frames))
+    return best
+
+
+def bench_snapshot(args):
+    analyzer = MarketAnalyzer()
+    frames = {f"SYM{i}": make_klines(args.bars, seed=i) for i in range(args.symbols)}
+
+    # Both paths must produce the same record before their timings mean anything
+    for df in frames.values():
+        assert analyzer.analyze_kline_data(df, snapshot=False) == analyzer.analyze_kline_data(df, snapshot=True)
+
+    before = time_per_call(lambda df: analyzer.analyze_kline_data(df, snapshot=False), frames, args.repeat)
+    after = time_per_call(lambda df: analyzer.analyze_kline_data(df, snapshot=True), frames, args.repeat)
+    print(f"analyze_kline_data, {args.symbols} symbols x {args.bars} bars")
+    print(f"  dataframe: {before * 1e6:9.1f} us/symbol")
+    print(f"  snapshot:  {after * 1e6:9.1f} us/symbol  ({before / after:.2f}x)")
+
+
+def bench_signals(args):
+    analyzer = MarketAnalyzer()
+    bars = int(args.years * 365 * 48)
+    frames = [make_klines(bars, seed=i) for i in range(args.symbols)]
+
+    # Indicators are computed once up front; only the rule scoring is timed
+    start = time.perf_counter()
+    evaluated = [analyzer.graph.evaluate(df, INDICATOR_FIELDS) for df in frames]
+    indicators = {name: np.stack([values[name] for values in evaluated]) for name in INDICATOR_FIELDS}
+    close = np.stack([df['close'].to_numpy() for df in frames])
+    prepare = time.perf_counter() - start
+
+    best = float('inf')
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        result = compute_trend_signals(indicators, close)
+        best = min(best, time.perf_counter() - start)
+    print(f"compute_trend_signals, {args.symbols} symbols x {bars} bars (30m)")
+    print(f"  indicators: {prepare * 1e3:9.1f} ms (not timed below)")
+    print(f"  signals:    {best * 1e3:9.1f} ms  -> {result.signals.shape} int8")
+
+
+def binance_payload(df: pd.DataFrame) -> bytes:
+    """Serialize klines the way /api/v3/klines does: quoted decimal strings"""
+    rows = [
+        [int(r.ts), f"{r.open:.8f}", f"{r.high:.8f}", f"{r.low:.8f}", f"{r.close:.8f}", f"{r.volume:.8f}",
+         int(r.ts) + 1799999, f"{r.volume * r.close:.8f}", 100, f"{r.volume / 2:.8f}", f"{r.volume * r.close / 2:.8f}", "0"]
+        for r in df.itertuples()
+    ]
+    return json.dumps(rows, separators=(',', ':')).encode()
+
+
+def merkle_payload(df: pd.DataFrame) -> bytes:
+    """Serialize klines like /v1/chart: an items list of objects"""
+    items = df[['ts', 'open', 'high', 'low', 'close', 'volume']].to_dict('records')
+    return json.dumps({'items': items}).encode()
+
+
+def decode_binance_frame(payload: bytes) -> pd.DataFrame:
+    """The DataFrame decoding Binance_MarketAnalyzer used before structured arrays"""
+    df = pd.DataFrame(json.loads(payload), columns=['timestamp', 'open', 'high', 'low', 'close', 'volume',
+                                                    'close_time', 'quote_volume', 'trades', 'taker_buy_base',
+                                                    'taker_buy_quote', 'ignore'])
+    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+    for col in ['open', 'high', 'low', 'close', 'volume']:
+        df[col] = df[col].astype(float)
+    return df
+
+
+def decode_merkle_frame(payload: bytes) -> pd.DataFrame:
+    """The DataFrame decoding MarketAnalyzer used before structured arrays"""
+    df = pd.DataFrame(json.loads(payload)["items"])
+    df['timestamp'] = pd.to_datetime(df['ts'], unit='ms')
+    return df
+
+
+def measure(func: Callable, payload: bytes, repeat: int):
+    """Best-of-repeat seconds and peak traced allocation in bytes for func(payload)"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(payload)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    func(payload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def bench_decode(args):
+    df = make_klines(args.bars)
+    cases = [
+        ('binance', binance_payload(df), decode_binance_frame, decode_binance_klines),
+        ('merkle', merkle_payload(df), decode_merkle_frame, decode_merkle_klines),
+    ]
+    print(f"kline decoding, {args.bars} bars")
+    for venue, payload, before, after in cases:
+        old = before(payload)
+        new = after(payload)
+        assert np.allclose(old['close'].astype(float), new['close'], rtol=1e-8)
+        print(f"  {venue} ({len(payload) / 1024:.0f} KiB)")
+        for label, func in (('dataframe', before), ('structured', after)):
+            seconds, peak = measure(func, payload, args.repeat)
+            print(f"    {label:<10}: {seconds * 1e3:8.2f} ms  peak {peak / 1024:8.1f} KiB")
+
+
+_TOKEN_PIECES = re.compile(r"[\u4e00-\u9fff]|[A-Za-z]+|\d{1,3}|\s+|[^\sA-Za-z\d]")
+
+
+def token_counter() -> Tuple[str, Callable[[str], int]]:
+    """cl100k_base if tiktoken is installed, else a BPE-like estimate"""
+    try:
+        import tiktoken
+    except ImportError:
+        # Words, runs of up to 3 digits, single CJK characters and punctuation
+        # each cost about one token; spaces merge into the next piece
+        return 'estimated', lambda text: sum(
+            1 for piece in _TOKEN_PIECES.findall(text) if not piece.isspace() or '\n' in piece
+        )
+    encoding = tiktoken.get_encoding('cl100k_base')
+    return 'tiktoken cl100k_base', lambda text: len(encoding.encode(text))
+
+
+def bench_prompts(args):
+    analyzer = MarketAnalyzer()
+    market_data = []
+    for i in range(args.symbols):
+        record = analyzer.analyze_kline_data(make_klines(args.bars, seed=i, start_price=10.0 ** (i % 6 - 2)))
+        market_data.append({'symbol': f"SYM{i}", **record})
+    # Joule-style records: symbols without a Binance market carry no indicators
+    joule_data = [
+        {'symbol': record['symbol'], 'price': record['ma5'], 'ltv': 0.7, 'marketSize': 1.2e7 + i,
+         'totalBorrowed': 3.4e6 + i, 'borrowApy': 4.123456789, 'depositApy': 2.987654321,
+         'liquidationFactor': 0.8, 'technical_analysis': record['summary'] if i % 3 else '',
+         'binance_price': record['ma5'] if i % 3 else 0,
+         **{k: (v if i % 3 else float('nan')) for k, v in record.items() if k not in ('symbol', 'summary')}}
+        for i, record in enumerate(market_data)
+    ]
+    lending_rates, borrowing_rates = get_sample_lending_rates(), get_sample_borrowing_rates()
+    positions = {
+        'lending': {'USDT': {'amount': 2500.0, 'rate': 8.2, 'timestamp': '2025-01-01T00:00:00'}},
+        'borrowing': {'ETH': {'amount': 0.75, 'rate': 4.7, 'timestamp': '2025-01-01T00:00:00'}},
+    }
+
+    trading = TradingAgent(output_file='output/benchmark_trading.jsonl', api_key='offline',
+                           use_response_cache=False, use_materiality_gate=False)
+    lending = LendingAgent(output_file='output/benchmark_lending.jsonl', api_key='offline',
+                           use_response_cache=False)
+    lending.active_positions = positions
+
+    def prompt_parts(request) -> Tuple[str, str]:
+        """(static system prefix, dynamic user message) of a completion request"""
+        system, user = request['messages']
+        return system['content'], user['content']
+
+    def legacy(prompt: str, sections) -> str:
+        """The prompt as it was built with json.dumps(..., indent=2) sections"""
+        for new, old in sections:
+            prompt = prompt.replace(new, old, 1)
+        return prompt
+
+    rates_table = encode_table(
+        {'symbol': s, 'lending_rate': lending_rates.get(s), 'borrowing_rate': borrowing_rates.get(s)}
+        for s in dict.fromkeys([*lending_rates, *borrowing_rates])
+    )
+    cases = [
+        ('trading', prompt_parts(trading._completion_request(market_data)),
+         [(encode_table(market_data), json.dumps(market_data, indent=2))]),
+        # Joule records through the same template: only the data section differs
+        ('joule', prompt_parts(trading._completion_request(joule_data)),
+         [(encode_table(joule_data), json.dumps(joule_data, indent=2))]),
+        ('lending', prompt_parts(lending._completion_request(market_data, lending_rates, borrowing_rates, 100000.0)),
+         [(encode_table(market_data), json.dumps(market_data, indent=2)),
+          (rates_table, json.dumps(lending_rates, indent=2) + '\n\n' + json.dumps(borrowing_rates, indent=2)),
+          (encode_table({'side': side, 'symbol': symbol, **position}
+                        for side, held in positions.items() for symbol, position in held.items()),
+           json.dumps(positions, indent=2))]),
+    ]
+    tokenizer, count_tokens = token_counter()
+    print(f"prompt tokens, {args.symbols} symbols ({tokenizer})")
+    for name, (prefix, data), sections in cases:
+        before = count_tokens(prefix) + count_tokens(legacy(data, sections))
+        after = count_tokens(prefix) + count_tokens(data)
+        print(f"  {name:<9} json indent=2: {before:7d}  compact: {after:7d}  ({1 - after / before:.0%} fewer)"
+              f"  static prefix: {count_tokens(prefix):5d} ({count_tokens(prefix) / after:.0%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    snapshot = sub.add_parser('snapshot', help='analyze_kline_data: DataFrame path vs last-value snapshot')
+    snapshot.add_argument('--symbols', type=int, default=50)
+    snapshot.add_argument('--bars', type=int, default=300)
+    snapshot.add_argument('--repeat', type=int, default=5)
+    snapshot.set_defaults(func=bench_snapshot)
+
+    signals = sub.add_parser('signals', help='compute_trend_signals over a multi-year 30m history')
+    signals.add_argument('--symbols', type=int, default=20)
+    signals.add_argument('--years', type=float, default=3)
+    signals.add_argument('--repeat', type=int, default=5)
+    signals.set_defaults(func=bench_signals)
+
+    decode = sub.add_parser('decode', help='venue response decoding: DataFrame vs structured array')
+    decode.add_argument('--bars', type=int, default=1000)
+    decode.add_argument('--repeat', type=int, default=20)
+    decode.set_defaults(func=bench_decode)
+
+    prompts = sub.add_parser('prompts', help='LLM prompt size: indented JSON vs compact tables')
+    prompts.add_argument('--symbols', type=int, default=20)
+    prompts.add_argument('--bars', type=int, default=300)
+    prompts.set_defaults(func=bench_prompts)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+from datetime import datetime
+from typing import Any, Dict, List
+
+import numpy as np
+
+from sharding import round_to_total
+from trend_signals import SIGNAL_FIELDS, SIGNAL_INPUTS, compute_trend_signals
+
+# Indicators trend_strength reads; with any of them missing it undercounts
+STRENGTH_INPUTS = ("ma5", "ma10", "ma20", "rsi6", "k", "d", "macd_hist", "adx")
+
+# Leverage range of fallback positions. Much narrower than what the model may
+# choose (3-150): the rules know nothing about news or cross-asset context
+FALLBACK_MIN_LEVERAGE = 3
+FALLBACK_MAX_LEVERAGE = 10
+
+# Record fields holding the latest price, first present wins
+PRICE_FIELDS = ("current_price", "price", "binance_price")
+
+SOURCE_LLM = "llm"
+SOURCE_CACHE = "cache"
+SOURCE_REUSED = "reused"
+SOURCE_FALLBACK = "fallback"
+
+
+_NUMBER_TYPES = (int, float)
+
+
+def _number(value: Any) -> float:
+    return float(value) if type(value) in _NUMBER_TYPES else np.nan
+
+
+def _price(record: Dict[str, Any]) -> float:
+    for field in PRICE_FIELDS:
+        value = record.get(field)
+        if type(value) in _NUMBER_TYPES and value:
+            return float(value)
+    return np.nan
+
+
+def rule_based_actions(market_data: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Trading actions from analyze_trend's rules alone, without the LLM.
+
+    For each symbol the seven analyze_trend signals are summed into a score
+    in [-7, 7]; its sign is the direction, falling back to trend_strength
+    (>= 3 long, else short) when the signals cancel out. Conviction blends
+    |score| / 7 with how far trend_strength agrees with the direction. It
+    sets both the leverage, between FALLBACK_MIN_LEVERAGE and
+    FALLBACK_MAX_LEVERAGE, and the weight of the position; weights are
+    normalized to sum to 100.
+
+    trend_strength counts a missing input as bearish, so when one of its
+    inputs is missing it is not used: agreement is taken as 0.5, and a
+    symbol whose signals also cancel out is neutral, a long at
+    FALLBACK_MIN_LEVERAGE with the minimum weight.
+
+    Args:
+        market_data: Records like get_market_indicators returns; missing
+            indicators only silence the rules that read them, symbols
+            without any numeric indicator are left out
+
+    Returns:
+        Dict shaped like TradingAgent.generate_trading_actions' result, with
+        "source": "fallback"
+    """
+    result = {"actions": [], "timestamp": datetime.now().isoformat(), "source": SOURCE_FALLBACK}
+    if not market_data:
+        return result
+
+    # One (symbols, inputs) matrix; a missing field is NaN
+    try:
+        matrix = np.array([[record.get(name) for name in SIGNAL_INPUTS] for record in market_data], dtype=np.float64)
+    except (TypeError, ValueError):
+        # Some field is not a number; slower path that blanks it
+        matrix = np.array([[_number(record.get(name)) for name in SIGNAL_INPUTS] for record in market_data])
+    matrix = matrix.reshape(len(market_data), len(SIGNAL_INPUTS))
+
+    # Symbols without a single finite indicator have nothing for the rules to read
+    keep = np.isfinite(matrix).any(axis=1)
+    if not keep.any():
+        return result
+    market_data = [record for record, kept in zip(market_data, keep) if kept]
+    matrix = matrix[keep]
+
+    indicators = {name: matrix[:, i] for i, name in enumerate(SIGNAL_INPUTS)}
+    trend = compute_trend_signals(indicators, np.array([_price(record) for record in market_data]))
+    score = trend.signals.sum(axis=-1).astype(np.int64)
+    strength = trend.trend_strength.astype(np.int64)
+    strength_known = np.isfinite(matrix[:, [SIGNAL_INPUTS.index(name) for name in STRENGTH_INPUTS]]).all(axis=1)
+    # Missing inputs read as bearish in trend_strength; without any signal either, stay neutral
+    neutral = (score == 0) & ~strength_known
+
+    direction = np.where(score != 0, np.sign(score), np.where(neutral | (strength >= 3), 1, -1))
+    # An undercounted trend_strength says nothing about agreement either way
+    agreement = np.where(strength_known, np.where(direction > 0, strength, 5 - strength) / 5, 0.5)
+    conviction = np.where(neutral, 0.0, 0.5 * np.abs(score) / len(SIGNAL_FIELDS) + 0.5 * agreement)
+    leverage = direction * np.rint(
+        FALLBACK_MIN_LEVERAGE + conviction * (FALLBACK_MAX_LEVERAGE - FALLBACK_MIN_LEVERAGE)
+    ).astype(np.int64)
+    # Every symbol keeps some weight so the allocation is never empty
+    weights = conviction + 0.05
+    percentages = round_to_total((weights / weights.sum() * 100).tolist())
+
+    for i, record in enumerate(market_data):
+        active = [
+            f"{field}{'+' if value > 0 else '-'}"
+            for field, value in zip(trend.fields, trend.signals[i]) if value
+        ]
+        trend_note = f"{int(strength[i])}/5" if strength_known[i] else "unknown"
+        result["actions"].append({
+            "symbol": record.get("symbol"),
+            "leverage": int(leverage[i]),
+            "position_percentage": percentages[i],
+            "reason": (
+                f"Rule-based fallback: signal score {int(score[i]):+d}/{len(SIGNAL_FIELDS)}"
+                f" ({', '.join(active) or 'no signals'}), trend strength {trend_note}"
+            ),
+        })
+    return result
@@ -1,10 +1,21 @@
+import asyncio
 import json
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime
-from typing import Dict, List, Any, Callable, Optional
+from typing import Dict, List, Any, Callable, Optional, Tuple
 import logging
 from openai import OpenAI
+from action_stream import ActionCallback, collect_stream, emit_actions
+from async_llm import AsyncLLMPool, get_default_pool
+from fallback_policy import SOURCE_CACHE, SOURCE_LLM, SOURCE_REUSED, rule_based_actions
+from prompt_encoding import encode_table
+from prompt_templates import PromptTemplate
+from sharding import DEFAULT_SHARD_SIZE, reduce_shard_results, shard_records
+from llm_cache import LLMResponseCache, get_default_response_cache
+from llm_telemetry import LLMTelemetry, get_default_telemetry, instrumented_create
+from materiality import MaterialityGate
 
 # Configure logging
 logging.basicConfig(
@@ -12,6 +23,44 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Seconds a tick waits for the LLM before answering with the rule-based policy
+DEFAULT_TICK_DEADLINE = 30.0
+
+TRADING_PROMPT = PromptTemplate(
+    prefix="""You are a professional trading agent. Analyze the market data and provide trading actions in JSON format.
+
+The user sends market data as a table: one row per symbol, "|"-separated columns, empty cell = no data.
+Based on this market data, generate trading actions for each symbol.
+Your response must be a valid JSON object with the following structure:
+
+```json
+{{
+  "actions": [
+    {{
+      "symbol": "BTC",
+      "leverage": 5,  // Positive for long, negative for short, range from -150 to 150
+      "position_percentage": 60,  // Percentage of total portfolio allocated to this symbol (0-100)
+      "reason": "Strong upward trend with increasing volume"
+    }},
+    // More actions for other symbols
+  ]
+}}
+```
+
+Important requirements:
+1. Determine whether to go long (positive leverage) or short (negative leverage)
+2. Set the leverage value between -150 and 150 (absolute value between 3 and 150)
+3. Assign a position_percentage to each symbol representing what percentage of the total portfolio should be allocated to it
+4. The sum of all position_percentage values MUST equal exactly 100%
+5. Provide a brief reason for each action
+
+Return only the JSON object without any additional text.""",
+    suffix="""Analyze the following market data and generate trading actions:
+
+Market Data (one row per symbol, "|"-separated columns, empty cell = no data):
+{market_data}""",
+)
+
 
 class TradingAgent:
     """
@@ -24,6 +73,11 @@ class TradingAgent:
         api_key: Optional[str] = None,
         model: str = "deepseek-chat",
         base_url: str = "https://api.deepseek.com",
+        response_cache: Optional[LLMResponseCache] = None,
+        use_response_cache: bool = True,
+        materiality_gate: Optional[MaterialityGate] = None,
+        use_materiality_gate: bool = True,
+        telemetry: Optional[LLMTelemetry] = None,
     ):
         """
         Initialize the trading agent.
@@ -33,8 +87,20 @@ class TradingAgent:
             api_key: API key for the LLM service
             model: Model name to use
             base_url: Base URL for the API
+            response_cache: Cache for LLM responses; defaults to the shared one
+            use_response_cache: Set to False to call the LLM on every request
+            materiality_gate: Change detector deciding whether a tick needs the LLM
+            use_materiality_gate: Set to False to call the LLM on every tick
+            telemetry: Where LLM calls are recorded; defaults to the shared one
         """
         self.output_file = output_file
+        self.response_cache = (
+            (response_cache or get_default_response_cache()) if use_response_cache else None
+        )
+        self.materiality_gate = (
+            (materiality_gate or MaterialityGate()) if use_materiality_gate else None
+        )
+        self.telemetry = telemetry or get_default_telemetry()
 
         # Initialize OpenAI client
         if not api_key:
@@ -46,75 +112,183 @@ class TradingAgent:
                 )
 
         self.client = OpenAI(api_key=api_key, base_url=base_url)
+        self.api_key = api_key
+        self.base_url = base_url
         self.model = model
 
+        # LLM calls of generate_trading_actions_within; at most one at a time
+        self._llm_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="trading-llm")
+        self._inflight = None
+
         # Create output directory if it doesn't exist
         os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
 
         logger.info(f"Trading agent initialized. Output will be saved to {output_file}")
 
     def generate_trading_actions(
-        self, market_data: List[Dict[str, Any]]
+        self,
+        market_data: List[Dict[str, Any]],
+        on_action: Optional[ActionCallback] = None,
     ) -> Dict[str, Any]:
         """
         Generate trading actions based on market data.
 
         Args:
             market_data: List of market data for different symbols
+            on_action: Called with each action as soon as it is complete; the
+                response is streamed when set. Streamed actions are as the
+                model wrote them, the returned dict is normalized.
 
         Returns:
             Dict containing trading actions with timestamp and position percentages
         """
-        # Prepare the prompt for the LLM
-        prompt = self._prepare_prompt(market_data)
+        return self._generate(market_data, on_action)
 
-        try:
-            # Call the LLM to generate trading actions
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a professional trading agent. Analyze the market data and provide trading actions in JSON format.",
-                    },
-                    {"role": "user", "content": prompt},
-                ],
-                response_format={"type": "json_object"},
-                max_tokens=2048,  # Adjust as needed to prevent truncation
-                temperature=0.2,  # Lower temperature for more deterministic outputs
-            )
+    async def agenerate_trading_actions(
+        self,
+        market_data: List[Dict[str, Any]],
+        pool: Optional[AsyncLLMPool] = None,
+        on_action: Optional[ActionCallback] = None,
+    ) -> Dict[str, Any]:
+        """
+        Async variant of generate_trading_actions.
 
-            # Extract and parse the response
-            content = response.choices[0].message.content
-            if not content:
-                logger.warning("Received empty content from LLM")
-                return {"actions": [], "timestamp": datetime.now().isoformat()}
+        The request goes through a shared AsyncLLMPool, so it can run
+        concurrently with the other agents of a tick.
 
-            result = json.loads(content)
+        Args:
+            market_data: List of market data for different symbols
+            pool: Pool to send the request through; defaults to the shared one
+            on_action: Called with each action as soon as it is complete, as
+                in generate_trading_actions
+
+        Returns:
+            Dict containing trading actions with timestamp and position percentages
+        """
+        return await self._agenerate(market_data, pool, on_action)
+
+    def generate_trading_actions_within(
+        self,
+        market_data: List[Dict[str, Any]],
+        deadline: float = DEFAULT_TICK_DEADLINE,
+    ) -> Dict[str, Any]:
+        """
+        Generate trading actions within a deadline, falling back to fixed rules.
 
-            # Ensure timestamp is included
-            if "timestamp" not in result:
-                result["timestamp"] = datetime.now().isoformat()
+        The LLM call runs on a worker thread. If it fails, returns no
+        actions or has not returned within deadline seconds, the actions
+        come from rule_based_actions instead, tagged "source": "fallback".
+        A late answer is not wasted: it still lands in the response cache
+        and materiality gate for the next tick. While a late call is still
+        running no new one is started.
 
-            # Validate position percentages
-            if "actions" in result:
-                total_percentage = sum(
-                    action.get("position_percentage", 0) for action in result["actions"]
-                )
-                if total_percentage != 100 and result["actions"]:
-                    logger.warning(
-                        f"Total position percentage is {total_percentage}%, adjusting to 100%"
-                    )
-                    # Normalize percentages to sum to 100%
-                    for action in result["actions"]:
-                        if "position_percentage" in action and total_percentage > 0:
-                            action["position_percentage"] = round(
-                                action["position_percentage"] / total_percentage * 100,
-                                2,
-                            )
+        Args:
+            market_data: List of market data for different symbols
+            deadline: Seconds to wait for the LLM
+
+        Returns:
+            Dict containing trading actions with timestamp, position
+            percentages and the source of the decision
+        """
+        future = None
+        if self._inflight is None or self._inflight.done():
+            future = self._inflight = self._llm_executor.submit(self.generate_trading_actions, market_data)
+
+        if future is None:
+            reason = "previous LLM call still running"
+        else:
+            try:
+                result = future.result(timeout=deadline)
+                if result.get("actions"):
+                    return result
+                reason = result.get("error", "no actions returned")
+            except FutureTimeoutError:
+                reason = f"no LLM answer within {deadline:.1f}s"
+
+        logger.warning(f"Using rule-based trading actions: {reason}")
+        result = rule_based_actions(market_data)
+        result["fallback_reason"] = reason
+        return result
+
+    def generate_trading_actions_sharded(
+        self,
+        market_data: List[Dict[str, Any]],
+        shard_size: int = DEFAULT_SHARD_SIZE,
+        max_concurrency: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Generate trading actions with one LLM call per shard of symbols.
 
-            return result
+        Large universes make one prompt slow to process and the response
+        long to generate. The symbols are split into shards of about
+        shard_size, each shard is analyzed on its own thread, and the shard
+        allocations are merged by reduce_shard_results into one whose
+        position percentages sum to 100.
+
+        Args:
+            market_data: List of market data for different symbols
+            shard_size: Symbols per LLM call
+            max_concurrency: Shards in flight at once; defaults to all of them
 
+        Returns:
+            Dict containing trading actions with timestamp and position percentages
+        """
+        shards = shard_records(market_data, shard_size)
+        if len(shards) <= 1:
+            return self.generate_trading_actions(market_data)
+        with ThreadPoolExecutor(max_workers=max_concurrency or len(shards)) as executor:
+            results = list(executor.map(
+                lambda i: self._generate(shards[i], gate_name=f"trading/shard{i}"), range(len(shards))
+            ))
+        return reduce_shard_results(shards, results)
+
+    async def agenerate_trading_actions_sharded(
+        self,
+        market_data: List[Dict[str, Any]],
+        shard_size: int = DEFAULT_SHARD_SIZE,
+        pool: Optional[AsyncLLMPool] = None,
+    ) -> Dict[str, Any]:
+        """
+        Async variant of generate_trading_actions_sharded; the pool bounds concurrency.
+
+        Args:
+            market_data: List of market data for different symbols
+            shard_size: Symbols per LLM call
+            pool: Pool to send the requests through; defaults to the shared one
+
+        Returns:
+            Dict containing trading actions with timestamp and position percentages
+        """
+        shards = shard_records(market_data, shard_size)
+        if len(shards) <= 1:
+            return await self.agenerate_trading_actions(market_data, pool)
+        results = await asyncio.gather(*(
+            self._agenerate(shard, pool, gate_name=f"trading/shard{i}") for i, shard in enumerate(shards)
+        ))
+        return reduce_shard_results(shards, list(results))
+
+    def _generate(
+        self,
+        market_data: List[Dict[str, Any]],
+        on_action: Optional[ActionCallback] = None,
+        gate_name: str = "trading",
+    ) -> Dict[str, Any]:
+        """Body of generate_trading_actions, also run once per shard."""
+        previous, cache_key = self._reuse_previous(market_data, gate_name)
+        if previous is not None:
+            emit_actions(previous, on_action)
+            return previous
+
+        try:
+            # Call the LLM to generate trading actions
+            request = self._completion_request(market_data)
+            if on_action is None:
+                response = instrumented_create(self.client, "trading", self.telemetry, **request)
+                content = response.choices[0].message.content
+            else:
+                chunks = instrumented_create(self.client, "trading", self.telemetry, stream=True, **request)
+                content = collect_stream(chunks, on_action)
+            return self._handle_content(content, market_data, cache_key, gate_name)
         except Exception as e:
             logger.error(f"Error generating trading actions: {str(e)}")
             return {
@@ -123,54 +297,144 @@ class TradingAgent:
                 "timestamp": datetime.now().isoformat(),
             }
 
-    def _prepare_prompt(self, market_data: List[Dict[str, Any]]) -> str:
+    async def _agenerate(
+        self,
+        market_data: List[Dict[str, Any]],
+        pool: Optional[AsyncLLMPool] = None,
+        on_action: Optional[ActionCallback] = None,
+        gate_name: str = "trading",
+    ) -> Dict[str, Any]:
+        """Body of agenerate_trading_actions, also run once per shard."""
+        previous, cache_key = self._reuse_previous(market_data, gate_name)
+        if previous is not None:
+            emit_actions(previous, on_action)
+            return previous
+
+        try:
+            pool = pool or get_default_pool()
+            request = self._completion_request(market_data)
+            if on_action is None:
+                response = await pool.create(
+                    self.api_key, self.base_url, agent="trading", telemetry=self.telemetry, **request
+                )
+                content = response.choices[0].message.content
+            else:
+                content = await pool.stream(
+                    self.api_key, self.base_url, on_action, agent="trading", telemetry=self.telemetry, **request
+                )
+            return self._handle_content(content, market_data, cache_key, gate_name)
+        except Exception as e:
+            logger.error(f"Error generating trading actions: {str(e)}")
+            return {
+                "actions": [],
+                "error": str(e),
+                "timestamp": datetime.now().isoformat(),
+            }
+
+    def _reuse_previous(
+        self, market_data: List[Dict[str, Any]], gate_name: str = "trading"
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
         """
-        Prepare the prompt for the LLM.
+        Look for a previous result that still applies to market_data.
 
         Args:
             market_data: List of market data for different symbols
+            gate_name: Materiality gate entry; one per shard in sharded mode
 
         Returns:
-            Prompt string
+            (previous result or None, response cache key or None)
         """
-        market_data_str = json.dumps(market_data, indent=2)
-        current_time = datetime.now().isoformat()
-
-        prompt = f"""
-Analyze the following market data and generate trading actions:
+        # Re-emit the previous actions if nothing material changed since the last LLM call
+        if self.materiality_gate is not None:
+            previous = self.materiality_gate.reuse(gate_name, market_data)
+            if previous is not None:
+                previous["source"] = SOURCE_REUSED
+                return previous, None
+
+        # Reuse the previous response if the market state is unchanged at cache precision
+        cache_key = None
+        if self.response_cache is not None:
+            cache_key = self.response_cache.make_key("trading", self.model, market_data)
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                cached["timestamp"] = datetime.now().isoformat()
+                cached["source"] = SOURCE_CACHE
+                return cached, cache_key
+        return None, cache_key
+
+    def _completion_request(self, market_data: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Arguments of the chat.completions.create call for market_data."""
+        return dict(
+            model=self.model,
+            messages=TRADING_PROMPT.bind().messages(market_data=self._prepare_prompt(market_data)),
+            response_format={"type": "json_object"},
+            max_tokens=2048,  # Adjust as needed to prevent truncation
+            temperature=0.2,  # Lower temperature for more deterministic outputs
+        )
+
+    def _handle_content(
+        self,
+        content: Optional[str],
+        market_data: List[Dict[str, Any]],
+        cache_key: Optional[str],
+        gate_name: str = "trading",
+    ) -> Dict[str, Any]:
+        """Parse and normalize an LLM response, then remember it."""
+        if not content:
+            logger.warning("Received empty content from LLM")
+            return {"actions": [], "timestamp": datetime.now().isoformat(), "source": SOURCE_LLM}
 
-Market Data:
-{market_data_str}
+        try:
+            result = json.loads(content)
+        except json.JSONDecodeError:
+            self.telemetry.increment("llm_json_parse_failures_total", agent="trading", model=self.model)
+            raise
+
+        # Ensure timestamp is included
+        if "timestamp" not in result:
+            result["timestamp"] = datetime.now().isoformat()
+        result["source"] = SOURCE_LLM
+
+        # Validate position percentages
+        if "actions" in result:
+            total_percentage = sum(
+                action.get("position_percentage", 0) for action in result["actions"]
+            )
+            if total_percentage != 100 and result["actions"]:
+                logger.warning(
+                    f"Total position percentage is {total_percentage}%, adjusting to 100%"
+                )
+                self.telemetry.increment(
+                    "llm_normalizations_total", agent="trading", model=self.model, field="position_percentage"
+                )
+                # Normalize percentages to sum to 100%
+                for action in result["actions"]:
+                    if "position_percentage" in action and total_percentage > 0:
+                        action["position_percentage"] = round(
+                            action["position_percentage"] / total_percentage * 100,
+                            2,
+                        )
+
+        if cache_key is not None and result.get("actions"):
+            self.response_cache.put(cache_key, result)
+        if self.materiality_gate is not None and result.get("actions"):
+            self.materiality_gate.record(gate_name, market_data, result)
+        return result
 
-Based on this market data, generate trading actions for each symbol. 
-Your response must be a valid JSON object with the following structure:
+    def _prepare_prompt(self, market_data: List[Dict[str, Any]]) -> str:
+        """
+        Prepare the dynamic part of the prompt for the LLM.
 
-```json
-{{
-  "actions": [
-    {{
-      "symbol": "BTC",
-      "leverage": 5,  // Positive for long, negative for short, range from -150 to 150
-      "position_percentage": 60,  // Percentage of total portfolio allocated to this symbol (0-100)
-      "reason": "Strong upward trend with increasing volume"
-    }},
-    // More actions for other symbols
-  ],
-  "timestamp": "{current_time}"
-}}
-```
+        The instructions are the fixed prefix of TRADING_PROMPT; only the
+        market data table changes between calls.
 
-Important requirements:
-1. Determine whether to go long (positive leverage) or short (negative leverage)
-2. Set the leverage value between -150 and 150 (absolute value between 3 and 150)
-3. Assign a position_percentage to each symbol representing what percentage of the total portfolio should be allocated to it
-4. The sum of all position_percentage values MUST equal exactly 100%
-5. Provide a brief reason for each action
-6. Include the current timestamp in the response
+        Args:
+            market_data: List of market data for different symbols
 
-Return only the JSON object without any additional text.
-"""
-        return prompt
+        Returns:
+            Market data table for TRADING_PROMPT's suffix
+        """
+        return encode_table(market_data)
 
     def process_market_data(self, get_market_data: Callable[[], List[Dict[str, Any]]]):
         """
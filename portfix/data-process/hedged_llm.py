@@ -0,0 +1,211 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from async_llm import AsyncLLMPool
+from llm_telemetry import LLMTelemetry, get_default_telemetry
+
+logger = logging.getLogger(__name__)
+
+# Hedge delay before an endpoint has enough latency samples for a quantile
+DEFAULT_HEDGE_DELAY = 15.0
+# Fire the backup once the primary is slower than this quantile of its history
+DEFAULT_HEDGE_QUANTILE = 0.95
+DEFAULT_MIN_SAMPLES = 20
+# Latencies remembered per endpoint
+DEFAULT_LATENCY_WINDOW = 200
+
+
+class LLMEndpoint(NamedTuple):
+    """An OpenAI-compatible chat completions endpoint serving a DeepSeek model."""
+
+    name: str
+    base_url: str
+    model: str
+    # Environment variable holding the API key
+    api_key_env: str
+
+
+# The agents call DeepSeek directly; the frontend (optimizePortfolio.ts) runs
+# the same model family through SiliconFlow, which makes a natural backup
+DEFAULT_BACKUP_ENDPOINTS = [
+    LLMEndpoint(
+        "siliconflow", "https://api.siliconflow.cn/v1/", "Pro/deepseek-ai/DeepSeek-V3", "SILICONFLOW_API_KEY"
+    ),
+]
+
+
+class HedgedLLMPool(AsyncLLMPool):
+    """
+    AsyncLLMPool that hedges slow requests on backup endpoints.
+
+    The caller's endpoint is the primary. If it has not answered within the
+    hedge delay, the request is also sent to the next backup (with the
+    backup's model name), and so on down the list. The first response whose
+    content is a JSON object wins; the others are cancelled. An error or
+    invalid response moves on to the next endpoint at once instead of
+    waiting out the delay.
+
+    The hedge delay is the primary's ``hedge_quantile`` latency over its last
+    ``window`` successful requests, or ``initial_delay`` until it has
+    ``min_samples`` of them. Tail requests then cost one extra call while
+    the typical request costs nothing. Streams are not hedged.
+
+    get_default_pool returns one whenever a backup's API key is set, so
+    AgentTickRunner and the agents' async methods hedge by default.
+
+    Usage:
+        pool = HedgedLLMPool()
+        runner = AgentTickRunner(pool=pool)
+    """
+
+    def __init__(
+        self,
+        backups: Optional[List[LLMEndpoint]] = None,
+        hedge_quantile: float = DEFAULT_HEDGE_QUANTILE,
+        initial_delay: float = DEFAULT_HEDGE_DELAY,
+        min_samples: int = DEFAULT_MIN_SAMPLES,
+        window: int = DEFAULT_LATENCY_WINDOW,
+        **kwargs,
+    ):
+        """
+        Initialize the pool.
+
+        Args:
+            backups: Endpoints to hedge on, in order; those without an API
+                key in the environment are skipped
+            hedge_quantile: Latency quantile of the primary after which to hedge
+            initial_delay: Hedge delay in seconds until enough samples exist
+            min_samples: Samples needed before the quantile is trusted
+            window: Latencies remembered per endpoint
+            **kwargs: Passed to AsyncLLMPool
+        """
+        super().__init__(**kwargs)
+        self.backups: List[Tuple[LLMEndpoint, str]] = []
+        for endpoint in DEFAULT_BACKUP_ENDPOINTS if backups is None else backups:
+            api_key = os.environ.get(endpoint.api_key_env)
+            if api_key:
+                self.backups.append((endpoint, api_key))
+            else:
+                logger.info(f"No {endpoint.api_key_env} set, not hedging on {endpoint.name}")
+        self.hedge_quantile = hedge_quantile
+        self.initial_delay = initial_delay
+        self.min_samples = min_samples
+        self.window = window
+        self.hedged = 0
+        self.backup_wins = 0
+        self._latencies: Dict[Tuple[str, str], Deque[float]] = {}
+        self._latency_lock = threading.Lock()
+
+    def record_latency(self, base_url: str, model: str, seconds: float):
+        with self._latency_lock:
+            samples = self._latencies.get((base_url, model))
+            if samples is None:
+                samples = self._latencies[(base_url, model)] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def hedge_delay(self, base_url: str, model: str) -> float:
+        """Seconds to wait on an endpoint before hedging."""
+        with self._latency_lock:
+            samples = list(self._latencies.get((base_url, model), ()))
+        if len(samples) < self.min_samples:
+            return self.initial_delay
+        return float(np.quantile(samples, self.hedge_quantile))
+
+    async def _attempt(self, api_key: str, base_url: str, request, agent: str, telemetry: Optional[LLMTelemetry]):
+        start = time.monotonic()
+        try:
+            response = await super().create(api_key, base_url, agent=agent, telemetry=telemetry, **request)
+        except asyncio.CancelledError:
+            # A lost race still says the endpoint took at least this long;
+            # dropping it would bias the quantile towards fast requests
+            self.record_latency(base_url, request.get("model", ""), time.monotonic() - start)
+            raise
+        content = response.choices[0].message.content
+        # Only a parseable JSON object counts as an answer
+        try:
+            parsed = json.loads(content or "null")
+        except json.JSONDecodeError:
+            (telemetry or get_default_telemetry()).increment(
+                "llm_json_parse_failures_total", agent=agent, model=request.get("model", "")
+            )
+            raise
+        if not isinstance(parsed, dict):
+            raise ValueError("response is not a JSON object")
+        self.record_latency(base_url, request.get("model", ""), time.monotonic() - start)
+        return response
+
+    async def create(
+        self,
+        api_key: str,
+        base_url: str,
+        *,
+        agent: str = "unknown",
+        telemetry: Optional[LLMTelemetry] = None,
+        **request,
+    ):
+        """
+        Run one chat completion, hedged across the backups.
+
+        Every attempt is recorded in telemetry under its own model.
+
+        Args:
+            api_key: API key of the primary endpoint
+            base_url: Base URL of the primary endpoint
+            agent: Agent label of the call in telemetry
+            telemetry: Where to record the attempts; defaults to the shared one
+            **request: Arguments of chat.completions.create
+
+        Returns:
+            The first valid chat completion response
+        """
+        candidates = [("primary", api_key, base_url, request)] + [
+            (endpoint.name, key, endpoint.base_url, {**request, "model": endpoint.model})
+            for endpoint, key in self.backups
+            if endpoint.base_url != base_url
+        ]
+        delay = self.hedge_delay(base_url, request.get("model", ""))
+        pending: Dict[asyncio.Task, str] = {}
+        launched = 0
+        error: Optional[BaseException] = None
+
+        def launch():
+            nonlocal launched
+            name, key, url, args = candidates[launched]
+            pending[asyncio.ensure_future(self._attempt(key, url, args, agent, telemetry))] = name
+            launched += 1
+
+        launch()
+        try:
+            while pending:
+                more = launched < len(candidates)
+                done, _ = await asyncio.wait(
+                    pending, timeout=delay if more else None, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    logger.info(f"No response within {delay:.1f}s, hedging on {candidates[launched][0]}")
+                    self.hedged += 1
+                    launch()
+                    continue
+                for task in done:
+                    name = pending.pop(task)
+                    if task.exception() is None:
+                        if name != "primary":
+                            self.backup_wins += 1
+                        return task.result()
+                    error = task.exception()
+                    logger.warning(f"{name} endpoint failed: {error}")
+                # Everything that finished failed: move on without waiting out the delay
+                if launched < len(candidates):
+                    launch()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
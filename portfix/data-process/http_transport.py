@@ -0,0 +1,277 @@
+import logging
+import random
+import threading
+import time
+from typing import Dict, NamedTuple, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# (connect, read) seconds; a request never hangs longer than this per attempt
+DEFAULT_TIMEOUT = (3.05, 10)
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+DEFAULT_MAX_BACKOFF = 8.0
+# Connections kept per host; with pool_block a caller waits for a free one
+DEFAULT_POOL_MAXSIZE = 8
+
+# Statuses worth another attempt. 418 (Binance's IP ban after ignoring 429s)
+# is not one of them: retrying only extends the ban, so it raises at once.
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Pause a host once its reported weight reaches this share of the limit
+WEIGHT_SAFETY = 0.9
+
+BROWSER_USER_AGENT = (
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/133.0.0.0 Safari/537.36"
+)
+
+
+def browser_headers(origin: str) -> Dict[str, str]:
+    """
+    Headers of a Chrome request made from ``origin``'s web app.
+
+    Args:
+        origin: Page origin, e.g. "https://app.merkle.trade"
+
+    Returns:
+        Header dict for the venue's public API
+    """
+    return {
+        "accept": "*/*",
+        "accept-language": "zh-CN,zh;q=0.9,en;q=0.8",
+        "dnt": "1",
+        "origin": origin,
+        "priority": "u=1, i",
+        "referer": f"{origin}/",
+        "sec-ch-ua": '"Not(A:Brand";v="99", "Google Chrome";v="133", "Chromium";v="133"',
+        "sec-ch-ua-mobile": "?0",
+        "sec-ch-ua-platform": '"macOS"',
+        "sec-fetch-dest": "empty",
+        "sec-fetch-mode": "cors",
+        "sec-fetch-site": "same-site",
+        "user-agent": BROWSER_USER_AGENT,
+    }
+
+
+class HostLimits(NamedTuple):
+    """Request budget for one host."""
+
+    # Sustained tokens per second
+    rate: float
+    # Bucket size, i.e. how many tokens may be spent at once
+    burst: float
+    # Response header reporting the weight used in the venue's window
+    weight_header: Optional[str] = None
+    # Venue limit for ``weight_header`` and the window it is counted over
+    weight_limit: Optional[int] = None
+    weight_window: float = 60.0
+
+
+# Budgets stay below each venue's published limit so that several processes
+# sharing an IP still fit. Binance: 6000 request weight per minute per IP.
+DEFAULT_HOST_LIMITS: Dict[str, HostLimits] = {
+    "api.binance.com": HostLimits(
+        rate=6000 * 0.8 / 60, burst=400,
+        weight_header="X-MBX-USED-WEIGHT-1M", weight_limit=6000,
+    ),
+    "api.merkle.trade": HostLimits(rate=10, burst=20),
+    "price-api.joule.finance": HostLimits(rate=5, burst=10),
+}
+
+
+class TokenBucket:
+    """Thread-safe token bucket; callers block until their tokens are available."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1) -> float:
+        """
+        Take ``tokens`` from the bucket, sleeping until they are available.
+
+        Tokens are reserved before sleeping, so concurrent callers queue up
+        behind each other instead of all waking at the same moment.
+
+        Returns:
+            Seconds spent waiting
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            wait = max(-self._tokens / self.rate, self._paused_until - now, 0.0)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def pause(self, seconds: float):
+        """Stop handing out tokens for ``seconds``, e.g. after a 429."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = min(self._tokens, 0.0)
+
+
+class HttpTransport:
+    """
+    Shared HTTP client for the market data fetchers.
+
+    One requests.Session keeps connections alive; every host gets its own
+    connection pool of ``pool_maxsize`` and its own token bucket. Each
+    attempt is bounded by ``timeout``; connection errors, timeouts and
+    RETRY_STATUSES are retried with full-jitter exponential backoff, honouring
+    Retry-After; no wait exceeds ``max_backoff``, and a response asking for a
+    longer one raises instead of blocking the caller. Hosts reporting a
+    used-weight header are paused until their window rolls over once usage
+    gets close to the limit.
+    """
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, HostLimits]] = None,
+        timeout=DEFAULT_TIMEOUT,
+        retries: int = DEFAULT_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+        max_backoff: float = DEFAULT_MAX_BACKOFF,
+        pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+        session: Optional[requests.Session] = None,
+    ):
+        self.limits = dict(DEFAULT_HOST_LIMITS if limits is None else limits)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.pool_maxsize = pool_maxsize
+        self.session = session or requests.Session()
+        self._buckets: Dict[str, Optional[TokenBucket]] = {}
+        self._lock = threading.Lock()
+
+    def _host(self, url: str) -> str:
+        parts = urlsplit(url)
+        host = parts.hostname or ""
+        with self._lock:
+            if host not in self._buckets:
+                # pool_block=True: wait for an idle connection instead of opening extra ones
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize, pool_block=True)
+                self.session.mount(f"{parts.scheme}://{parts.netloc}", adapter)
+                limits = self.limits.get(host)
+                self._buckets[host] = TokenBucket(limits.rate, limits.burst) if limits else None
+        return host
+
+    def _retry_delay(self, attempt: int, response: Optional[requests.Response]) -> Optional[float]:
+        """Seconds to wait before the next attempt, or None if Retry-After exceeds max_backoff"""
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                if float(retry_after) > self.max_backoff:
+                    return None
+                delay = max(delay, float(retry_after))
+        return delay
+
+    def _observe(self, host: str, response: requests.Response):
+        limits = self.limits.get(host)
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            return
+        if response.status_code in (418, 429):
+            retry_after = response.headers.get("Retry-After")
+            bucket.pause(float(retry_after) if retry_after and retry_after.isdigit() else limits.weight_window)
+            return
+        if limits.weight_header is None:
+            return
+        used = response.headers.get(limits.weight_header)
+        if used is not None and used.isdigit() and int(used) >= limits.weight_limit * WEIGHT_SAFETY:
+            # Wait for the venue's window to roll over before spending more weight
+            window = limits.weight_window
+            remaining = window - time.time() % window
+            logger.warning(f"{host} used weight {used}/{limits.weight_limit}, pausing {remaining:.1f}s")
+            bucket.pause(remaining)
+
+    def request(self, method: str, url: str, weight: float = 1, **kwargs) -> requests.Response:
+        """
+        Send a request through the host's pool and rate limit, retrying
+        transient failures.
+
+        Args:
+            method: HTTP method
+            url: Absolute URL
+            weight: Tokens this request costs against the host's bucket
+                (Binance request weight for Binance endpoints)
+            **kwargs: Passed to requests.Session.request
+
+        Returns:
+            The successful response
+
+        Raises:
+            requests.HTTPError: Non-retryable status (including 418), Retry-After
+                longer than max_backoff, or retries exhausted
+            requests.RequestException: Connection error or timeout after the last retry
+        """
+        host = self._host(url)
+        bucket = self._buckets[host]
+        kwargs.setdefault("timeout", self.timeout)
+        for attempt in range(self.retries + 1):
+            if bucket is not None:
+                bucket.acquire(weight)
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.retries:
+                    raise
+                logger.warning(f"{method} {host} failed ({e}), retry {attempt + 1}/{self.retries}")
+                time.sleep(self._retry_delay(attempt, None))
+                continue
+
+            self._observe(host, response)
+            if response.status_code in RETRY_STATUSES and attempt < self.retries:
+                delay = self._retry_delay(attempt, response)
+                if delay is not None:
+                    logger.warning(
+                        f"{method} {host} returned {response.status_code}, retry {attempt + 1}/{self.retries}"
+                    )
+                    time.sleep(delay)
+                    continue
+                logger.warning(
+                    f"{method} {host} returned {response.status_code} with Retry-After "
+                    f"{response.headers['Retry-After']}s, over max backoff {self.max_backoff}s"
+                )
+            response.raise_for_status()
+            return response
+
+    def get(self, url: str, params=None, weight: float = 1, **kwargs) -> requests.Response:
+        """GET ``url``; see request()."""
+        return self.request("GET", url, weight=weight, params=params, **kwargs)
+
+
+_transport_lock = threading.Lock()
+_default_transport: Optional[HttpTransport] = None
+
+
+def get_default_transport(pool_maxsize: int = DEFAULT_POOL_MAXSIZE) -> HttpTransport:
+    """
+    Process-wide transport so all fetchers share pools and rate limits.
+
+    The pool size is fixed by the first call; a later call asking for larger
+    pools logs a warning, since its requests queue for the existing ones.
+    """
+    global _default_transport
+    with _transport_lock:
+        if _default_transport is None:
+            _default_transport = HttpTransport(pool_maxsize=pool_maxsize)
+        elif pool_maxsize > _default_transport.pool_maxsize:
+            logger.warning(
+                f"Default transport has {_default_transport.pool_maxsize} connections per host, "
+                f"ignoring pool_maxsize={pool_maxsize}; request it on the first call instead"
+            )
+        return _default_transport
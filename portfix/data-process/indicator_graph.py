@@ -0,0 +1,354 @@
+import math
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import talib
+
+# Raw candle columns every graph can read
+SOURCE_FIELDS = ("open", "high", "low", "close", "volume")
+
+# Residual weight of a recursive indicator's seed that counts as converged
+DEFAULT_TOLERANCE = 0.01
+
+
+class IndicatorNode:
+    """
+    One named quantity in the indicator graph and the inputs it is computed from.
+
+    ``lookback`` is the number of bars the node consumes beyond its inputs'
+    lookback before its first output. Recursive nodes also declare ``decay``,
+    the per-bar factor by which the influence of their seed shrinks, and
+    ``stages`` when they chain several such recursions (TEMA, TRIX).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        inputs: Sequence[str],
+        func: Callable[..., Any],
+        lookback: int = 0,
+        decay: Optional[float] = None,
+        stages: int = 1,
+    ):
+        self.name = name
+        self.inputs = tuple(inputs)
+        self.func = func
+        self.lookback = lookback
+        self.decay = decay
+        self.stages = stages
+
+    def settle_bars(self, tolerance: float = DEFAULT_TOLERANCE) -> int:
+        """Bars after the first output until the seed's weight drops below tolerance"""
+        if self.decay is None:
+            return 0
+        return self.stages * math.ceil(math.log(tolerance) / math.log(self.decay))
+
+    def __repr__(self) -> str:
+        return f"IndicatorNode({self.name!r}, inputs={self.inputs!r})"
+
+
+# Registry of every known indicator; names starting with "_" are shared intermediates
+INDICATORS: Dict[str, IndicatorNode] = {}
+
+
+def indicator(name: str, *inputs: str, lookback: int = 0, decay: Optional[float] = None, stages: int = 1):
+    """
+    Register an indicator computed from source columns or other indicators.
+
+    Usage:
+        @indicator("ma20", "close", lookback=19)
+        def _ma20(close):
+            return talib.SMA(close, timeperiod=20)
+    """
+
+    def register(func: Callable[..., Any]) -> Callable[..., Any]:
+        INDICATORS[name] = IndicatorNode(name, inputs, func, lookback, decay, stages)
+        return func
+
+    return register
+
+
+class IndicatorGraph:
+    """
+    Evaluates registered indicators as a DAG.
+
+    Only the requested indicators and their transitive inputs are computed,
+    and every node is computed once per evaluation, so quantities such as
+    EMA12/EMA26 (shared with MACD) and SMA20 (shared with the Bollinger
+    middle band) are reused. ATR, +DI/-DI and ADX are one TA-Lib call each
+    and do not share a true range node: recomputing it in C costs a few
+    microseconds, while feeding a shared one through Python-level Wilder
+    recurrences costs hundreds.
+
+    Usage:
+        graph = IndicatorGraph()
+        values = graph.evaluate(df, ["rsi6", "macd", "k", "d"])
+    """
+
+    def __init__(self, nodes: Optional[Mapping[str, IndicatorNode]] = None):
+        self.nodes = dict(INDICATORS if nodes is None else nodes)
+        self._plans: Dict[Tuple[str, ...], List[IndicatorNode]] = {}
+
+    def plan(self, names: Iterable[str]) -> List[IndicatorNode]:
+        """
+        Resolve the nodes needed for ``names`` in dependency order.
+
+        Args:
+            names: Indicators to compute
+
+        Returns:
+            Nodes to evaluate, each after all of its inputs
+        """
+        key = tuple(names)
+        if key in self._plans:
+            return self._plans[key]
+
+        order: List[IndicatorNode] = []
+        state: Dict[str, str] = {}
+
+        def visit(name: str):
+            if name in SOURCE_FIELDS or state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise ValueError(f"Indicator dependency cycle at {name}")
+            if name not in self.nodes:
+                raise KeyError(f"Unknown indicator: {name}")
+            state[name] = "visiting"
+            node = self.nodes[name]
+            for dependency in node.inputs:
+                visit(dependency)
+            state[name] = "done"
+            order.append(node)
+
+        for name in key:
+            visit(name)
+        self._plans[key] = order
+        return order
+
+    def evaluate(self, data: Any, names: Optional[Sequence[str]] = None) -> Dict[str, np.ndarray]:
+        """
+        Compute the requested indicators.
+
+        Args:
+            data: DataFrame, dict or structured array with high/low/close columns
+            names: Indicators to return; defaults to every public indicator
+
+        Returns:
+            Dict mapping each requested name to its values, in request order
+        """
+        if names is None:
+            names = [name for name in self.nodes if not name.startswith("_")]
+        values: Dict[str, Any] = {}
+        for node in self.plan(names):
+            args = []
+            for dependency in node.inputs:
+                if dependency not in values:
+                    values[dependency] = np.ascontiguousarray(data[dependency], dtype=np.float64)
+                args.append(values[dependency])
+            values[node.name] = node.func(*args)
+        return {name: values[name] for name in names}
+
+    def lookback(self, names: Iterable[str]) -> int:
+        """
+        Index of the first bar on which every requested indicator has a value.
+
+        Args:
+            names: Indicators to compute
+
+        Returns:
+            Number of warm-up bars, as talib's *_Lookback functions report
+        """
+        memo: Dict[str, int] = {}
+
+        def visit(name: str) -> int:
+            if name in SOURCE_FIELDS:
+                return 0
+            if name not in memo:
+                node = self.nodes[name]
+                memo[name] = node.lookback + max((visit(dep) for dep in node.inputs), default=0)
+            return memo[name]
+
+        return max((visit(name) for name in names), default=0)
+
+    def required_bars(self, names: Iterable[str], tolerance: float = DEFAULT_TOLERANCE) -> int:
+        """
+        Number of bars to fetch so the last bar of every requested indicator is
+        both available and converged.
+
+        Recursive indicators (EMA, Wilder smoothing) keep a trace of their seed
+        forever; the warm-up after the first output is sized so that trace
+        weighs less than ``tolerance``, summed along each dependency chain.
+
+        Args:
+            names: Indicators to compute
+            tolerance: Residual seed weight accepted on the last bar
+
+        Returns:
+            Bar count, including the last bar itself
+        """
+        memo: Dict[str, int] = {}
+
+        def visit(name: str) -> int:
+            if name in SOURCE_FIELDS:
+                return 0
+            if name not in memo:
+                node = self.nodes[name]
+                memo[name] = (
+                    node.lookback
+                    + node.settle_bars(tolerance)
+                    + max((visit(dep) for dep in node.inputs), default=0)
+                )
+            return memo[name]
+
+        return max((visit(name) for name in names), default=0) + 1
+
+
+def _select(index: int) -> Callable[[Tuple[np.ndarray, ...]], np.ndarray]:
+    return lambda outputs: outputs[index]
+
+
+# 移动平均线族
+for _period in (5, 10, 20, 60):
+    indicator(f"ma{_period}", "close", lookback=_period - 1)(lambda close, p=_period: talib.SMA(close, timeperiod=p))
+
+# 指数移动平均线
+for _period in (12, 26):
+    indicator(f"ema{_period}", "close", lookback=_period - 1, decay=1 - 2 / (_period + 1))(lambda close, p=_period: talib.EMA(close, timeperiod=p))
+
+# RSI族
+for _period in (6, 12, 24):
+    indicator(f"rsi{_period}", "close", lookback=_period, decay=(_period - 1) / _period)(lambda close, p=_period: talib.RSI(close, timeperiod=p))
+
+
+# 布林带：中轨即ma20
+@indicator("_stddev20", "close", lookback=19)
+def _stddev20(close):
+    return talib.STDDEV(close, timeperiod=20, nbdev=1)
+
+
+@indicator("bb_middle", "ma20")
+def _bb_middle(ma20):
+    return ma20
+
+
+@indicator("bb_upper", "ma20", "_stddev20")
+def _bb_upper(ma20, stddev):
+    return ma20 + 2 * stddev
+
+
+@indicator("bb_lower", "ma20", "_stddev20")
+def _bb_lower(ma20, stddev):
+    return ma20 - 2 * stddev
+
+
+# MACD：复用ema12/ema26。TA-Lib会在慢线起点重新初始化快线，两者的差异按(11/13)^n衰减，
+# 最后一根K线上可以忽略
+@indicator("_macd_line", "ema12", "ema26")
+def _macd_line(ema12, ema26):
+    return ema12 - ema26
+
+
+@indicator("macd_signal", "_macd_line", lookback=8, decay=1 - 2 / 10)
+def _macd_signal(line):
+    signal = np.full(len(line), np.nan)
+    valid = np.flatnonzero(~np.isnan(line))
+    if len(valid):
+        signal[valid[0]:] = talib.EMA(line[valid[0]:], timeperiod=9)
+    return signal
+
+
+@indicator("macd", "_macd_line", "macd_signal")
+def _macd(line, signal):
+    # 与talib一致：信号线出现之前不输出MACD
+    return np.where(np.isnan(signal), np.nan, line)
+
+
+@indicator("macd_hist", "macd", "macd_signal")
+def _macd_hist(macd, signal):
+    return macd - signal
+
+
+# KDJ
+@indicator("_stoch", "high", "low", "close", lookback=12)
+def _stoch(high, low, close):
+    return talib.STOCH(
+        high, low, close,
+        fastk_period=9, slowk_period=3, slowk_matype=0,
+        slowd_period=3, slowd_matype=0,
+    )
+
+
+indicator("k", "_stoch")(_select(0))
+indicator("d", "_stoch")(_select(1))
+
+
+@indicator("j", "k", "d")
+def _j(k, d):
+    return 3 * k - 2 * d
+
+
+@indicator("atr", "high", "low", "close", lookback=14, decay=13 / 14)
+def _atr(high, low, close):
+    return talib.ATR(high, low, close, timeperiod=14)
+
+
+@indicator("plus_di", "high", "low", "close", lookback=14, decay=13 / 14)
+def _plus_di(high, low, close):
+    return talib.PLUS_DI(high, low, close, timeperiod=14)
+
+
+@indicator("minus_di", "high", "low", "close", lookback=14, decay=13 / 14)
+def _minus_di(high, low, close):
+    return talib.MINUS_DI(high, low, close, timeperiod=14)
+
+
+# ADX再对DX做一次Wilder平滑，共两级递推
+@indicator("adx", "high", "low", "close", lookback=27, decay=13 / 14, stages=2)
+def _adx(high, low, close):
+    return talib.ADX(high, low, close, timeperiod=14)
+
+
+@indicator("sar", "high", "low", lookback=1)
+def _sar(high, low):
+    return talib.SAR(high, low, acceleration=0.02, maximum=0.2)
+
+
+@indicator("roc", "close", lookback=10)
+def _roc(close):
+    return talib.ROC(close, timeperiod=10)
+
+
+@indicator("tema", "close", lookback=57, decay=1 - 2 / 21, stages=3)
+def _tema(close):
+    return talib.TEMA(close, timeperiod=20)
+
+
+@indicator("mom", "close", lookback=10)
+def _mom(close):
+    return talib.MOM(close, timeperiod=10)
+
+
+@indicator("cci", "high", "low", "close", lookback=13)
+def _cci(high, low, close):
+    return talib.CCI(high, low, close, timeperiod=14)
+
+
+@indicator("trix", "close", lookback=88, decay=1 - 2 / 31, stages=3)
+def _trix(close):
+    return talib.TRIX(close, timeperiod=30)
+
+
+@indicator("willr", "high", "low", "close", lookback=13)
+def _willr(high, low, close):
+    return talib.WILLR(high, low, close, timeperiod=14)
+
+
+_default_graph: Optional[IndicatorGraph] = None
+
+
+def get_default_graph() -> IndicatorGraph:
+    """Return a graph over every registered indicator"""
+    global _default_graph
+    if _default_graph is None:
+        _default_graph = IndicatorGraph()
+    return _default_graph
@@ -1,31 +1,57 @@
-import requests
+import os
+import sys
+import numpy as np
 import pandas as pd
-import talib
 import time
-from typing import Dict, List
+import logging
+from typing import Dict, List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from http_transport import BROWSER_USER_AGENT, HttpTransport, browser_headers, get_default_transport
+from kline_decode import decode_binance_klines
+from kline_store import KlineStore, klines_to_frame, get_default_store, timeframe_to_ms
+from batch_indicators import BatchIndicators, compute_batch_indicators
+from indicator_graph import IndicatorGraph, get_default_graph
+from singleflight import SingleFlight, get_default_flight
+
+logger = logging.getLogger(__name__)
+
+# 币安K线接口单次最多返回的数量
+BINANCE_MAX_LIMIT = 1000
+
+# Binance_MarketAnalyzer计算的指标
+BINANCE_INDICATOR_FIELDS = [
+    'ma5', 'ma10', 'ma20', 'ma60',
+    'rsi6', 'rsi12', 'rsi24',
+    'macd', 'macd_signal', 'macd_hist',
+    'k', 'd', 'j'
+]
+
+def binance_kline_weight(limit: int) -> int:
+    """币安/api/v3/klines按limit计算的请求权重"""
+    if limit <= 100:
+        return 1
+    if limit <= 500:
+        return 2
+    if limit <= 1000:
+        return 5
+    return 10
 
 class Joule_Finance_MarketAnalyzer:
-    def __init__(self):
-        self.headers = {
-            'accept': '*/*',
-            'accept-language': 'zh-CN,zh;q=0.9,en;q=0.8',
-            'dnt': '1',
-            'origin': 'https://app.joule.finance',
-            'priority': 'u=1, i',
-            'referer': 'https://app.joule.finance/',
-            'sec-ch-ua': '"Not(A:Brand";v="99", "Google Chrome";v="133", "Chromium";v="133"',
-            'sec-ch-ua-mobile': '?0',
-            'sec-ch-ua-platform': '"macOS"',
-            'sec-fetch-dest': 'empty',
-            'sec-fetch-mode': 'cors',
-            'sec-fetch-site': 'same-site',
-            'user-agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/133.0.0.0 Safari/537.36',
-        }
+    def __init__(self, transport: Optional[HttpTransport] = None, flight: Optional[SingleFlight] = None):
+        # 共享的HTTP连接池、超时重试和限流
+        self.transport = transport or get_default_transport()
+        # 做空和借贷在同一周期内请求市场数据时共用一次获取
+        self.flight = flight or get_default_flight()
+        self.headers = browser_headers('https://app.joule.finance')
 
 
     def fetch_market_data(self) -> pd.DataFrame:
         """获取K线数据并转换为DataFrame格式"""
-        response = requests.get('https://price-api.joule.finance/api/market', headers=self.headers)
+        return self.flight.do(('joule', 'market'), self._fetch_market_data).copy()
+
+    def _fetch_market_data(self) -> pd.DataFrame:
+        response = self.transport.get('https://price-api.joule.finance/api/market', headers=self.headers)
         data = response.json()
         df = pd.json_normalize(data["data"])
         df2=df[['ltv', 'marketSize', 'totalBorrowed', 
@@ -39,134 +65,150 @@ class Joule_Finance_MarketAnalyzer:
         return df2
 
 class Binance_MarketAnalyzer:
-    def __init__(self):
+    def __init__(self, store: Optional[KlineStore] = None, graph: Optional[IndicatorGraph] = None,
+                 transport: Optional[HttpTransport] = None, flight: Optional[SingleFlight] = None):
+        # 共享的HTTP连接池、超时重试和限流，币安按请求权重计数
+        self.transport = transport or get_default_transport()
+        # 合并并发的相同K线请求，结果在短TTL内复用
+        self.flight = flight or get_default_flight()
+        # 本地K线库，设置后只增量请求新K线
+        self.store = store
+        self.graph = graph or get_default_graph()
         self.headers = {
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/133.0.0.0 Safari/537.36'
+            'User-Agent': BROWSER_USER_AGENT
         }
 
-    def fetch_kline_data(self, symbol: str, interval: str = '30m', limit: int = 96) -> pd.DataFrame:
-        """获取币安K线数据"""
+    def plan_kline_limit(self, names: Optional[List[str]] = None) -> int:
+        """根据所需指标的预热长度确定要获取的K线数量"""
+        return min(self.graph.required_bars(names or BINANCE_INDICATOR_FIELDS), BINANCE_MAX_LIMIT)
+
+    def fetch_klines(self, symbol: str, interval: str = '30m', limit: Optional[int] = None) -> np.ndarray:
+        """获取币安K线，直接解析为KLINE_DTYPE结构化数组；limit默认按指标所需数量确定"""
+        limit = limit or self.plan_kline_limit()
+        klines = self.flight.do(('binance', symbol, interval, limit),
+                                lambda: self._fetch_klines(symbol, interval, limit))
+        return klines.copy()
+
+    def fetch_kline_data(self, symbol: str, interval: str = '30m', limit: Optional[int] = None) -> pd.DataFrame:
+        """获取币安K线数据并转换为DataFrame格式"""
+        return klines_to_frame(self.fetch_klines(symbol, interval, limit))
+
+    def _fetch_klines(self, symbol: str, interval: str, limit: int) -> np.ndarray:
+        if self.store is not None:
+            return self._fetch_klines_cached(symbol, interval, limit)
+        return self._request_klines(symbol, interval, limit)
+
+    def _fetch_klines_cached(self, symbol: str, interval: str, limit: int) -> np.ndarray:
+        """增量获取K线：只请求本地最后一根K线及之后的数据，合并入库后返回最近limit根"""
+        last_ts = self.store.last_ts('binance', symbol, interval)
+        start_time = None
+        if last_ts is not None:
+            unit = timeframe_to_ms(interval)
+            window_start = int(time.time() * 1000) - limit * unit
+            # 本地数据覆盖了整个窗口时（两端都覆盖，limit变大后旧数据可能不够长），
+            # 从最后一根（可能未收盘的）K线开始获取；否则重新获取完整的limit根
+            first_ts = self.store.first_ts('binance', symbol, interval)
+            if last_ts >= window_start and first_ts <= window_start + unit:
+                start_time = last_ts
+        klines = self._request_klines(symbol, interval, limit, start_time=start_time)
+        if len(klines):
+            self.store.merge('binance', symbol, interval, klines)
+        return self.store.tail('binance', symbol, interval, limit)
+
+    def _request_klines(self, symbol: str, interval: str, limit: int,
+                        start_time: Optional[int] = None) -> np.ndarray:
+        """请求币安K线接口"""
         url = f'https://api.binance.com/api/v3/klines'
         params = {
             'symbol': f'{symbol}USDT',
             'interval': interval,
             'limit': limit
         }
+        if start_time is not None:
+            params['startTime'] = start_time
         
-        response = requests.get(url, params=params, headers=self.headers)
-        data = response.json()
-        
-        df = pd.DataFrame(data, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume',
-                                       'close_time', 'quote_volume', 'trades', 'taker_buy_base',
-                                       'taker_buy_quote', 'ignore'])
-        
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-        for col in ['open', 'high', 'low', 'close', 'volume']:
-            df[col] = df[col].astype(float)
-        return df
+        response = self.transport.get(url, params=params, headers=self.headers,
+                                      weight=binance_kline_weight(limit))
+        return decode_binance_klines(response.content)
 
     def calculate_technical_indicators(self, df: pd.DataFrame) -> pd.DataFrame:
-        """计算技术指标"""
-        close_prices = df['close']
-        high_prices = df['high']
-        low_prices = df['low']
-        
-        # 移动平均线族
-        ma5 = talib.SMA(close_prices, timeperiod=5)
-        ma10 = talib.SMA(close_prices, timeperiod=10)
-        ma20 = talib.SMA(close_prices, timeperiod=20)
-        ma60 = talib.SMA(close_prices, timeperiod=60)
-        
-        # RSI族
-        rsi6 = talib.RSI(close_prices, timeperiod=6)
-        rsi12 = talib.RSI(close_prices, timeperiod=12)
-        rsi24 = talib.RSI(close_prices, timeperiod=24)
-        
-        # MACD
-        macd, macd_signal, macd_hist = talib.MACD(
-            close_prices, 
-            fastperiod=12, 
-            slowperiod=26, 
-            signalperiod=9
-        )
-        
-        # KDJ
-        k, d = talib.STOCH(
-            high_prices, low_prices, close_prices,
-            fastk_period=9, slowk_period=3, slowk_matype=0,
-            slowd_period=3, slowd_matype=0
-        )
-        j = 3 * k - 2 * d
-
-        return pd.DataFrame({
-            'ma5': ma5,
-            'ma10': ma10,
-            'ma20': ma20,
-            'ma60': ma60,
-            'rsi6': rsi6,
-            'rsi12': rsi12,
-            'rsi24': rsi24,
-            'macd': macd,
-            'macd_signal': macd_signal,
-            'macd_hist': macd_hist,
-            'k': k,
-            'd': d,
-            'j': j,
-        })
+        """计算技术指标，只计算BINANCE_INDICATOR_FIELDS及其依赖"""
+        values = self.graph.evaluate(df, BINANCE_INDICATOR_FIELDS)
+        return pd.DataFrame(values, index=df.index)
+
+    def calculate_technical_indicators_batch(self, frames: Dict[str, pd.DataFrame],
+                                             last_only: bool = True) -> BatchIndicators:
+        """将多个交易对的K线按时间对齐成矩阵，一次向量化计算全部指标"""
+        return compute_batch_indicators(frames, last_only=last_only, fields=BINANCE_INDICATOR_FIELDS)
 
     def analyze_trend(self, df: pd.DataFrame, indicators: pd.DataFrame) -> str:
         """分析趋势"""
-        current_price = float(df['close'].iloc[-1])
+        latest = {k: indicators[k].iloc[-1] for k in indicators.columns}
+        return self.analyze_trend_latest(float(df['close'].iloc[-1]), latest)
+
+    def analyze_trend_latest(self, current_price: float, latest: Dict[str, float]) -> str:
+        """基于最新一根K线的指标值分析趋势，输入尚未算出(NaN)的规则跳过"""
         signals = []
+
+        def ready(*names: str) -> bool:
+            return all(np.isfinite(latest[name]) for name in names)
         
         # MA分析
-        ma5_current = indicators['ma5'].iloc[-1]
-        ma10_current = indicators['ma10'].iloc[-1]
-        ma20_current = indicators['ma20'].iloc[-1]
+        ma5_current = latest['ma5']
+        ma10_current = latest['ma10']
+        ma20_current = latest['ma20']
         
-        if ma5_current > ma10_current > ma20_current:
-            signals.append("短期、中期均线呈多头排列，上升趋势强劲")
-        elif ma5_current < ma10_current < ma20_current:
-            signals.append("短期、中期均线呈空头排列，下降趋势明显")
+        if ready('ma5', 'ma10', 'ma20'):
+            if ma5_current > ma10_current > ma20_current:
+                signals.append("短期、中期均线呈多头排列，上升趋势强劲")
+            elif ma5_current < ma10_current < ma20_current:
+                signals.append("短期、中期均线呈空头排列，下降趋势明显")
         
         # RSI分析
-        rsi6_current = indicators['rsi6'].iloc[-1]
-        rsi12_current = indicators['rsi12'].iloc[-1]
+        rsi6_current = latest['rsi6']
+        rsi12_current = latest['rsi12']
         
-        if rsi6_current > 80 and rsi12_current > 70:
-            signals.append("RSI双重超买，注意回调风险")
-        elif rsi6_current < 20 and rsi12_current < 30:
-            signals.append("RSI双重超卖，可能存在反弹机会")
+        if ready('rsi6', 'rsi12'):
+            if rsi6_current > 80 and rsi12_current > 70:
+                signals.append("RSI双重超买，注意回调风险")
+            elif rsi6_current < 20 and rsi12_current < 30:
+                signals.append("RSI双重超卖，可能存在反弹机会")
         
         # KDJ分析
-        k_current = indicators['k'].iloc[-1]
-        d_current = indicators['d'].iloc[-1]
+        k_current = latest['k']
+        d_current = latest['d']
         
-        if k_current > d_current:
-            signals.append("KDJ金叉形态，可能上涨")
-        else:
-            signals.append("KDJ死叉形态，可能下跌")
+        if ready('k', 'd'):
+            if k_current > d_current:
+                signals.append("KDJ金叉形态，可能上涨")
+            else:
+                signals.append("KDJ死叉形态，可能下跌")
             
         return "\n".join(signals)
 
     def analyze_market(self, symbol: str):
-        """分析市场"""
-        df = self.fetch_kline_data(symbol)
-        indicators = self.calculate_technical_indicators(df)
+        """分析市场：只取各指标最新值，不构建指标DataFrame"""
+        klines = self.fetch_klines(symbol)
+        values = self.graph.evaluate(klines, BINANCE_INDICATOR_FIELDS)
+        latest = {k: float(v[-1]) for k, v in values.items()}
         
-        formatted_indicators = {k: round(float(v), 2) if pd.notna(v) else v 
-                              for k, v in indicators.iloc[-1].to_dict().items()}
-        analysis = self.analyze_trend(df, indicators)
+        # K线不足时算不出的指标不输出
+        formatted_indicators = {k: round(v, 2) for k, v in latest.items() if v == v}
+        missing = [k for k in latest if k not in formatted_indicators]
+        if missing:
+            logger.warning(f"Only {len(klines)} klines available for {symbol}, cannot compute: {', '.join(missing)}")
+        current_price = float(klines['close'][-1])
+        analysis = self.analyze_trend_latest(current_price, latest)
         
         formatted_indicators["summary"] = "。".join(analysis.split("\n"))
         formatted_indicators["symbol"] = symbol
-        formatted_indicators["current_price"] = round(float(df['close'].iloc[-1]), 2)
+        formatted_indicators["current_price"] = round(current_price, 2)
         return formatted_indicators
 
-def get_binance_market_analysis():
-    analyzer = Binance_MarketAnalyzer()
+def get_binance_market_analysis(symbols: Optional[List[str]] = None):
+    analyzer = Binance_MarketAnalyzer(store=get_default_store())
     total_indicators = []
-    for symbol in ["BTC", "ETH", "APT"]:
+    for symbol in symbols or ["BTC", "ETH", "APT"]:
         try:
             indicators = analyzer.analyze_market(symbol)
             total_indicators.append(indicators)
@@ -187,12 +229,7 @@ def get_joule_finance_market_data_analysis():
     }
     
     # Technical indicators to copy from Binance analysis
-    technical_indicators = [
-        'ma5', 'ma10', 'ma20', 'ma60',
-        'rsi6', 'rsi12', 'rsi24',
-        'macd', 'macd_signal', 'macd_hist',
-        'k', 'd', 'j'
-    ]
+    technical_indicators = BINANCE_INDICATOR_FIELDS
     
     # Convert analysis_results to a dictionary for easier lookup
     analysis_dict = {result['symbol']: result for result in analysis_results}
@@ -1,14 +1,24 @@
+import asyncio
 import json
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Any, Callable, Optional
+from typing import Dict, List, Any, Callable, Optional, Tuple
 import logging
 from openai import OpenAI
 from Joule_Finance_MarketAnalyzer import (
     Joule_Finance_MarketAnalyzer,
     Binance_MarketAnalyzer,
 )
+from action_stream import ActionCallback, collect_stream, emit_actions
+from async_llm import AsyncLLMPool, get_default_pool
+from prompt_encoding import encode_table
+from prompt_templates import PromptTemplate
+from sharding import DEFAULT_SHARD_SIZE, reduce_shard_results, shard_records
+from llm_cache import LLMResponseCache, get_default_response_cache
+from llm_telemetry import LLMTelemetry, get_default_telemetry, instrumented_create
+from materiality import MaterialityGate
 
 # Configure logging
 logging.basicConfig(
@@ -16,6 +26,62 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 提示词要求模型最多推荐3个币种，分片合并后同样只保留3个
+MAX_SHORT_ACTIONS = 3
+
+# 前缀（角色、JSON结构、规则）每次调用逐字节相同，可命中服务端的上下文缓存；
+# 只有后缀中的市场数据会变化
+SHORTING_PROMPT = PromptTemplate(
+    prefix="""你是一个专业的做空交易分析专家。分析市场数据并提供做空建议，包括目标价格和仓位分配。
+
+The user sends market data as a table: one row per symbol, "|"-separated columns, empty cell = no data.
+Based on this market data, select 1-3 cryptocurrencies with the highest shorting potential.
+Your response must be a valid JSON object with the following structure:
+
+```json
+{{
+  "actions": [
+    {{
+      "symbol": "BTC",
+      "current_price": 50000,
+      "target_price": 45000,  // Target price after {investment_hours} hours
+      "position_percentage": 60,  // Position percentage (0-100)
+      "reason": "Technical indicators show downward trend, negative funding rate, bearish market sentiment",
+      "risk_level": "medium",  // low, medium, high
+      "funding_rate": 5.2,  // Annual funding rate
+      "borrow_rate": 3.1,  // Annual borrowing rate
+      "price_change_percentage": 10,  // Expected price drop percentage
+      "funding_profit": 0.5,  // Funding rate profit
+      "borrow_cost": 0.3,  // Borrowing cost
+      "expected_profit_percentage": 10.2  // Total expected profit percentage
+    }},
+    // Add up to 2 more cryptocurrencies
+  ]
+}}
+```
+
+Important requirements:
+1. Select only 1-3 cryptocurrencies with the highest shorting potential
+2. Analyze technical indicators, funding rates, and market trends for each
+3. Predict target price after {investment_hours} hours
+4. Allocate position percentages, must sum to 100%
+5. Provide detailed reasoning for shorting recommendations
+6. Assess risk level
+7. Calculate and include:
+   - Annual funding rate
+   - Annual borrowing rate
+   - Expected price drop percentage
+   - Funding rate profit
+   - Borrowing cost
+   - Total expected profit percentage
+
+Return only the JSON object without any additional text.""",
+    suffix="""Analyze the following market data and select 1-3 most valuable cryptocurrencies for shorting:
+
+Market Data (one row per symbol, "|"-separated columns, empty cell = no data):
+{market_data}""",
+)
+
 
 class ShortingAnalyzer:
     def __init__(
@@ -25,6 +91,11 @@ class ShortingAnalyzer:
         model: str = "deepseek-chat",
         base_url: str = "https://api.deepseek.com",
         investment_hours: int = 24,  # Default investment period: 24 hours
+        response_cache: Optional[LLMResponseCache] = None,
+        use_response_cache: bool = True,
+        materiality_gate: Optional[MaterialityGate] = None,
+        use_materiality_gate: bool = True,
+        telemetry: Optional[LLMTelemetry] = None,
     ):
         """
         Initialize the shorting analyzer
@@ -35,8 +106,21 @@ class ShortingAnalyzer:
             model: Model name
             base_url: API base URL
             investment_hours: Investment period in hours
+            response_cache: Cache for LLM responses; defaults to the shared one
+            use_response_cache: Set to False to call the LLM on every request
+            materiality_gate: Change detector deciding whether a tick needs the LLM
+            use_materiality_gate: Set to False to call the LLM on every tick
+            telemetry: Where LLM calls are recorded; defaults to the shared one
         """
         self.output_file = output_file
+        self.response_cache = (
+            (response_cache or get_default_response_cache()) if use_response_cache else None
+        )
+        self.materiality_gate = (
+            (materiality_gate or MaterialityGate(signal_field="technical_analysis"))
+            if use_materiality_gate else None
+        )
+        self.telemetry = telemetry or get_default_telemetry()
         self.investment_hours = investment_hours
 
         # Initialize OpenAI client
@@ -48,6 +132,8 @@ class ShortingAnalyzer:
                 )
 
         self.client = OpenAI(api_key=api_key, base_url=base_url)
+        self.api_key = api_key
+        self.base_url = base_url
         self.model = model
         self.joule_analyzer = Joule_Finance_MarketAnalyzer()
 
@@ -96,67 +182,122 @@ class ShortingAnalyzer:
         return round(total_profit, 2)
 
     def analyze_shorting_opportunities(
-        self, market_data: List[Dict[str, Any]]
+        self,
+        market_data: List[Dict[str, Any]],
+        on_action: Optional[ActionCallback] = None,
     ) -> Dict[str, Any]:
         """
         分析做空机会并生成交易建议
 
         Args:
             market_data: 市场数据列表
+            on_action: 每条建议生成完毕即回调；设置后以流式方式请求。
+                回调收到的是模型原始输出，返回值中的仓位已归一化
 
         Returns:
             包含交易建议的字典
         """
-        # 准备提示词
-        prompt = self._prepare_prompt(market_data)
+        return self._analyze(market_data, on_action)
 
-        try:
-            # 调用大模型生成交易建议
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "你是一个专业的做空交易分析专家。分析市场数据并提供做空建议，包括目标价格和仓位分配。",
-                    },
-                    {"role": "user", "content": prompt},
-                ],
-                response_format={"type": "json_object"},
-                max_tokens=2048,
-                temperature=0.2,
-            )
+    async def aanalyze_shorting_opportunities(
+        self,
+        market_data: List[Dict[str, Any]],
+        pool: Optional[AsyncLLMPool] = None,
+        on_action: Optional[ActionCallback] = None,
+    ) -> Dict[str, Any]:
+        """
+        analyze_shorting_opportunities 的异步版本，经共享的 AsyncLLMPool 发送请求，
+        可与同一轮中其他代理的请求并发执行
 
-            # 解析响应
-            content = response.choices[0].message.content
-            if not content:
-                logger.warning("从LLM收到空响应")
-                return {"actions": [], "timestamp": datetime.now().isoformat()}
+        Args:
+            market_data: 市场数据列表
+            pool: 发送请求使用的连接池，默认为共享连接池
+            on_action: 每条建议生成完毕即回调，同 analyze_shorting_opportunities
 
-            result = json.loads(content)
+        Returns:
+            包含交易建议的字典
+        """
+        return await self._aanalyze(market_data, pool, on_action)
 
-            # 确保包含时间戳
-            if "timestamp" not in result:
-                result["timestamp"] = datetime.now().isoformat()
+    def analyze_shorting_opportunities_sharded(
+        self,
+        market_data: List[Dict[str, Any]],
+        shard_size: int = DEFAULT_SHARD_SIZE,
+        max_concurrency: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        分片模式：每个分片的币种单独调用一次大模型，多线程并行分析，
+        再由 reduce_shard_results 按预期收益取前 MAX_SHORT_ACTIONS 个，
+        仓位重新归一化为100%
 
-            # 验证仓位百分比
-            if "actions" in result:
-                total_percentage = sum(
-                    action.get("position_percentage", 0) for action in result["actions"]
-                )
-                if total_percentage != 100 and result["actions"]:
-                    logger.warning(
-                        f"总仓位百分比为 {total_percentage}%，正在调整为100%"
-                    )
-                    # 归一化百分比
-                    for action in result["actions"]:
-                        if "position_percentage" in action and total_percentage > 0:
-                            action["position_percentage"] = round(
-                                action["position_percentage"] / total_percentage * 100,
-                                2,
-                            )
+        Args:
+            market_data: 市场数据列表
+            shard_size: 每次调用包含的币种数量
+            max_concurrency: 同时进行的分片数，默认全部并行
 
-            return result
+        Returns:
+            包含交易建议的字典
+        """
+        shards = shard_records(market_data, shard_size)
+        if len(shards) <= 1:
+            return self.analyze_shorting_opportunities(market_data)
+        with ThreadPoolExecutor(max_workers=max_concurrency or len(shards)) as executor:
+            results = list(executor.map(
+                lambda i: self._analyze(shards[i], gate_name=f"shorting/shard{i}"), range(len(shards))
+            ))
+        return reduce_shard_results(
+            shards, results, rank_key="expected_profit_percentage", max_actions=MAX_SHORT_ACTIONS
+        )
+
+    async def aanalyze_shorting_opportunities_sharded(
+        self,
+        market_data: List[Dict[str, Any]],
+        shard_size: int = DEFAULT_SHARD_SIZE,
+        pool: Optional[AsyncLLMPool] = None,
+    ) -> Dict[str, Any]:
+        """
+        analyze_shorting_opportunities_sharded 的异步版本，并发数由连接池限制
 
+        Args:
+            market_data: 市场数据列表
+            shard_size: 每次调用包含的币种数量
+            pool: 发送请求使用的连接池，默认为共享连接池
+
+        Returns:
+            包含交易建议的字典
+        """
+        shards = shard_records(market_data, shard_size)
+        if len(shards) <= 1:
+            return await self.aanalyze_shorting_opportunities(market_data, pool)
+        results = await asyncio.gather(*(
+            self._aanalyze(shard, pool, gate_name=f"shorting/shard{i}") for i, shard in enumerate(shards)
+        ))
+        return reduce_shard_results(
+            shards, list(results), rank_key="expected_profit_percentage", max_actions=MAX_SHORT_ACTIONS
+        )
+
+    def _analyze(
+        self,
+        market_data: List[Dict[str, Any]],
+        on_action: Optional[ActionCallback] = None,
+        gate_name: str = "shorting",
+    ) -> Dict[str, Any]:
+        """analyze_shorting_opportunities 的实现，分片模式下每个分片各调用一次"""
+        previous, cache_key = self._reuse_previous(market_data, gate_name)
+        if previous is not None:
+            emit_actions(previous, on_action)
+            return previous
+
+        try:
+            # 调用大模型生成交易建议
+            request = self._completion_request(market_data)
+            if on_action is None:
+                response = instrumented_create(self.client, "shorting", self.telemetry, **request)
+                content = response.choices[0].message.content
+            else:
+                chunks = instrumented_create(self.client, "shorting", self.telemetry, stream=True, **request)
+                content = collect_stream(chunks, on_action)
+            return self._handle_content(content, market_data, cache_key, gate_name)
         except Exception as e:
             logger.error(f"生成做空建议时出错: {str(e)}")
             return {
@@ -165,70 +306,143 @@ class ShortingAnalyzer:
                 "timestamp": datetime.now().isoformat(),
             }
 
-    def _prepare_prompt(self, market_data: List[Dict[str, Any]]) -> str:
+    async def _aanalyze(
+        self,
+        market_data: List[Dict[str, Any]],
+        pool: Optional[AsyncLLMPool] = None,
+        on_action: Optional[ActionCallback] = None,
+        gate_name: str = "shorting",
+    ) -> Dict[str, Any]:
+        """aanalyze_shorting_opportunities 的实现，分片模式下每个分片各调用一次"""
+        previous, cache_key = self._reuse_previous(market_data, gate_name)
+        if previous is not None:
+            emit_actions(previous, on_action)
+            return previous
+
+        try:
+            pool = pool or get_default_pool()
+            request = self._completion_request(market_data)
+            if on_action is None:
+                response = await pool.create(
+                    self.api_key, self.base_url, agent="shorting", telemetry=self.telemetry, **request
+                )
+                content = response.choices[0].message.content
+            else:
+                content = await pool.stream(
+                    self.api_key, self.base_url, on_action, agent="shorting", telemetry=self.telemetry, **request
+                )
+            return self._handle_content(content, market_data, cache_key, gate_name)
+        except Exception as e:
+            logger.error(f"生成做空建议时出错: {str(e)}")
+            return {
+                "actions": [],
+                "error": str(e),
+                "timestamp": datetime.now().isoformat(),
+            }
+
+    def _reuse_previous(
+        self, market_data: List[Dict[str, Any]], gate_name: str = "shorting"
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
         """
-        Prepare the prompt for analysis
+        查找仍适用于当前市场数据的上次建议
 
         Args:
-            market_data: List of market data
+            market_data: 市场数据列表
+            gate_name: 变化检测使用的名称，分片模式下每个分片各用一个
 
         Returns:
-            Prompt string
+            (上次的建议或 None, 响应缓存键或 None)
         """
-        market_data_str = json.dumps(market_data, indent=2)
-        current_time = datetime.now().isoformat()
-
-        prompt = f"""
-Analyze the following market data and select 1-3 most valuable cryptocurrencies for shorting:
+        # 与上次调用模型时相比没有实质变化时，沿用上次的建议
+        if self.materiality_gate is not None:
+            previous = self.materiality_gate.reuse(gate_name, market_data)
+            if previous is not None:
+                return previous, None
+
+        # 市场状态在缓存精度内未变化时复用上次的建议
+        cache_key = None
+        if self.response_cache is not None:
+            cache_key = self.response_cache.make_key(
+                "shorting", self.model, market_data, self.investment_hours
+            )
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                cached["timestamp"] = datetime.now().isoformat()
+                return cached, cache_key
+        return None, cache_key
+
+    def _completion_request(self, market_data: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """chat.completions.create 的调用参数"""
+        return dict(
+            model=self.model,
+            messages=SHORTING_PROMPT.bind(investment_hours=self.investment_hours).messages(
+                market_data=self._prepare_prompt(market_data)
+            ),
+            response_format={"type": "json_object"},
+            max_tokens=2048,
+            temperature=0.2,
+        )
 
-Market Data:
-{market_data_str}
+    def _handle_content(
+        self,
+        content: Optional[str],
+        market_data: List[Dict[str, Any]],
+        cache_key: Optional[str],
+        gate_name: str = "shorting",
+    ) -> Dict[str, Any]:
+        """解析并归一化模型响应，然后记录下来"""
+        # 解析响应
+        if not content:
+            logger.warning("从LLM收到空响应")
+            return {"actions": [], "timestamp": datetime.now().isoformat()}
 
-Based on this market data, select 1-3 cryptocurrencies with the highest shorting potential.
-Your response must be a valid JSON object with the following structure:
+        try:
+            result = json.loads(content)
+        except json.JSONDecodeError:
+            self.telemetry.increment("llm_json_parse_failures_total", agent="shorting", model=self.model)
+            raise
+
+        # 确保包含时间戳
+        if "timestamp" not in result:
+            result["timestamp"] = datetime.now().isoformat()
+
+        # 验证仓位百分比
+        if "actions" in result:
+            total_percentage = sum(
+                action.get("position_percentage", 0) for action in result["actions"]
+            )
+            if total_percentage != 100 and result["actions"]:
+                logger.warning(
+                    f"总仓位百分比为 {total_percentage}%，正在调整为100%"
+                )
+                self.telemetry.increment(
+                    "llm_normalizations_total", agent="shorting", model=self.model, field="position_percentage"
+                )
+                # 归一化百分比
+                for action in result["actions"]:
+                    if "position_percentage" in action and total_percentage > 0:
+                        action["position_percentage"] = round(
+                            action["position_percentage"] / total_percentage * 100,
+                            2,
+                        )
+
+        if cache_key is not None and result.get("actions"):
+            self.response_cache.put(cache_key, result)
+        if self.materiality_gate is not None and result.get("actions"):
+            self.materiality_gate.record(gate_name, market_data, result)
+        return result
 
-```json
-{{
-  "actions": [
-    {{
-      "symbol": "BTC",
-      "current_price": 50000,
-      "target_price": 45000,  // Target price after {self.investment_hours} hours
-      "position_percentage": 60,  // Position percentage (0-100)
-      "reason": "Technical indicators show downward trend, negative funding rate, bearish market sentiment",
-      "risk_level": "medium",  // low, medium, high
-      "funding_rate": 5.2,  // Annual funding rate
-      "borrow_rate": 3.1,  // Annual borrowing rate
-      "price_change_percentage": 10,  // Expected price drop percentage
-      "funding_profit": 0.5,  // Funding rate profit
-      "borrow_cost": 0.3,  // Borrowing cost
-      "expected_profit_percentage": 10.2  // Total expected profit percentage
-    }},
-    // Add up to 2 more cryptocurrencies
-  ],
-  "timestamp": "{current_time}"
-}}
-```
+    def _prepare_prompt(self, market_data: List[Dict[str, Any]]) -> str:
+        """
+        Prepare the dynamic part of the prompt
 
-Important requirements:
-1. Select only 1-3 cryptocurrencies with the highest shorting potential
-2. Analyze technical indicators, funding rates, and market trends for each
-3. Predict target price after {self.investment_hours} hours
-4. Allocate position percentages, must sum to 100%
-5. Provide detailed reasoning for shorting recommendations
-6. Assess risk level
-7. Calculate and include:
-   - Annual funding rate
-   - Annual borrowing rate
-   - Expected price drop percentage
-   - Funding rate profit
-   - Borrowing cost
-   - Total expected profit percentage
-8. Include current timestamp
+        Args:
+            market_data: List of market data
 
-Return only the JSON object without any additional text.
-"""
-        return prompt
+        Returns:
+            Market data table for SHORTING_PROMPT's suffix
+        """
+        return encode_table(market_data)
 
     def process_market_data(self, get_market_data: Callable[[], List[Dict[str, Any]]]):
         """
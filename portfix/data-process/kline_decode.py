@@ -0,0 +1,80 @@
+import json
+from typing import Union
+
+import numpy as np
+
+from kline_store import KLINE_DTYPE
+
+# Columns of a Binance /api/v3/klines row: open time, open, high, low, close,
+# volume, close time, quote volume, trades, taker buy base, taker buy quote, ignore
+BINANCE_KLINE_COLUMNS = 12
+
+# Bytes that only delimit values in a Binance kline payload
+_BINANCE_DELIMITERS = bytes.maketrans(b'[]"', b"   ")
+
+
+def decode_binance_klines(payload: Union[bytes, str]) -> np.ndarray:
+    """
+    Parse a Binance klines response body straight into KLINE_DTYPE rows.
+
+    The body is a JSON list of 12-element lists whose prices are quoted
+    decimal strings. Every element is numeric, so dropping brackets and
+    quotes leaves one comma separated run of numbers that NumPy parses in
+    a single C pass, without building Python lists, strings or floats.
+
+    Args:
+        payload: Raw response body
+
+    Returns:
+        KLINE_DTYPE rows in response order (ascending open time)
+
+    Raises:
+        ValueError: The body is an error object or not a klines list
+    """
+    if isinstance(payload, str):
+        payload = payload.encode()
+    body = payload.strip()
+    if not body.startswith(b"["):
+        raise ValueError(f"Unexpected Binance klines response: {body[:200]!r}")
+
+    values = body.translate(_BINANCE_DELIMITERS).strip()
+    if not values:
+        return np.empty(0, dtype=KLINE_DTYPE)
+    flat = np.fromstring(values, dtype=np.float64, sep=",")
+    if flat.size % BINANCE_KLINE_COLUMNS:
+        raise ValueError(f"Binance klines response has {flat.size} values, not rows of {BINANCE_KLINE_COLUMNS}")
+    rows = flat.reshape(-1, BINANCE_KLINE_COLUMNS)
+
+    klines = np.empty(len(rows), dtype=KLINE_DTYPE)
+    # Millisecond timestamps are far below 2**53, so the float round trip is exact
+    klines["ts"] = rows[:, 0]
+    klines["open"] = rows[:, 1]
+    klines["high"] = rows[:, 2]
+    klines["low"] = rows[:, 3]
+    klines["close"] = rows[:, 4]
+    klines["volume"] = rows[:, 5]
+    return klines
+
+
+def decode_merkle_klines(payload: Union[bytes, str, dict]) -> np.ndarray:
+    """
+    Parse a Merkle /v1/chart response into KLINE_DTYPE rows.
+
+    Args:
+        payload: Raw response body, or the already decoded JSON object
+
+    Returns:
+        KLINE_DTYPE rows sorted by ts; empty when the window has no candles
+    """
+    data = json.loads(payload) if isinstance(payload, (bytes, str)) else payload
+    items = data["items"]
+    count = len(items)
+    klines = np.empty(count, dtype=KLINE_DTYPE)
+    klines["ts"] = np.fromiter((item["ts"] for item in items), dtype=np.int64, count=count)
+    for field in ("open", "high", "low", "close", "volume"):
+        klines[field] = np.fromiter(
+            (item.get(field, np.nan) for item in items), dtype=np.float64, count=count
+        )
+    if count > 1 and np.any(klines["ts"][1:] < klines["ts"][:-1]):
+        klines.sort(order="ts")
+    return klines
@@ -0,0 +1,117 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Tuple
+
+import numpy as np
+
+from kline_store import KLINE_DTYPE
+
+logger = logging.getLogger(__name__)
+
+# Bars requested per /v1/chart call
+DEFAULT_PAGE_BARS = 500
+# Pages in flight at once; the transport's rate limit still applies on top
+DEFAULT_PAGE_CONCURRENCY = 4
+# Gap refill rounds before giving up on the remaining holes
+DEFAULT_REFILL_PASSES = 2
+
+
+def _first_bar(from_time: int, unit: int) -> int:
+    return -(-from_time // unit) * unit
+
+
+def plan_pages(from_time: int, to_time: int, unit: int, page_bars: int = DEFAULT_PAGE_BARS) -> List[Tuple[int, int]]:
+    """
+    Split [from_time, to_time] into unit-aligned pages of at most page_bars bars.
+
+    Returns:
+        Inclusive (from, to) millisecond bounds per page
+    """
+    start = _first_bar(from_time, unit)
+    pages = []
+    while start <= to_time:
+        end = min(start + page_bars * unit - 1, to_time)
+        pages.append((start, end))
+        start += page_bars * unit
+    return pages
+
+
+def find_gaps(ts: np.ndarray, from_time: int, to_time: int, unit: int) -> List[Tuple[int, int]]:
+    """
+    Missing bars of a unit grid, merged into contiguous ranges.
+
+    Args:
+        ts: Sorted open times that are present
+        from_time: Range start; the first expected bar is the first one opening at or after it
+        to_time: Last expected open time, inclusive
+
+    Returns:
+        Inclusive (from, to) bounds of each missing run
+    """
+    start = _first_bar(from_time, unit)
+    expected = np.arange(start, to_time + 1, unit, dtype=np.int64)
+    missing = expected[~np.isin(expected, ts)]
+    if len(missing) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(missing) != unit)
+    firsts = np.r_[missing[0], missing[breaks + 1]]
+    lasts = np.r_[missing[breaks], missing[-1]]
+    return [(int(a), int(b) + unit - 1) for a, b in zip(firsts, lasts)]
+
+
+def dedupe_klines(parts: List[np.ndarray]) -> np.ndarray:
+    """Concatenate kline arrays into rows sorted by ts, the first part winning on equal ts."""
+    if not parts:
+        return np.empty(0, dtype=KLINE_DTYPE)
+    combined = np.concatenate(parts)
+    _, first = np.unique(combined["ts"], return_index=True)
+    return combined[first]
+
+
+def fetch_range(
+    fetch_klines: Callable[[str, int, int, int], np.ndarray],
+    symbol: str,
+    from_time: int,
+    to_time: int,
+    unit: int,
+    page_bars: int = DEFAULT_PAGE_BARS,
+    max_concurrency: int = DEFAULT_PAGE_CONCURRENCY,
+    refill_passes: int = DEFAULT_REFILL_PASSES,
+) -> Tuple[np.ndarray, List[Tuple[int, int]]]:
+    """
+    Fetch every bar of a range page by page, then refetch the holes.
+
+    A failed page is treated like an empty one, so its bars come back as a
+    gap and are retried in the refill passes.
+
+    Args:
+        fetch_klines: Called as fetch_klines(symbol, from, to, unit) for one
+            page, e.g. MarketAnalyzer.fetch_klines
+
+    Returns:
+        (KLINE_DTYPE rows sorted by ts, gaps still missing after the refills)
+    """
+    def fetch_page(page: Tuple[int, int]) -> np.ndarray:
+        try:
+            return fetch_klines(symbol, page[0], page[1], unit)
+        except Exception as e:
+            logger.warning(f"{symbol} page {page[0]}-{page[1]} failed: {e}")
+            return np.empty(0, dtype=KLINE_DTYPE)
+
+    parts: List[np.ndarray] = []
+    pages = plan_pages(from_time, to_time, unit, page_bars)
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as executor:
+        for refill in range(refill_passes + 1):
+            parts.extend(executor.map(fetch_page, pages))
+            klines = dedupe_klines(parts)
+            parts = [klines]
+            gaps = find_gaps(klines["ts"], from_time, to_time, unit)
+            if not gaps or refill == refill_passes:
+                break
+            # Refetch whole pages that contain holes, so many small gaps cost one request per page
+            pages = [page for page in plan_pages(from_time, to_time, unit, page_bars)
+                     if any(gap[0] <= page[1] and page[0] <= gap[1] for gap in gaps)]
+            logger.info(f"{symbol}: {len(gaps)} gaps, refetching {len(pages)} pages (pass {refill + 1}/{refill_passes})")
+
+    klines = klines[(klines["ts"] >= from_time) & (klines["ts"] <= to_time)]
+    return klines, gaps
@@ -0,0 +1,254 @@
+import os
+import re
+import threading
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+# One row per candle, keyed by its open time in milliseconds
+KLINE_DTYPE = np.dtype(
+    [
+        ("ts", "<i8"),
+        ("open", "<f8"),
+        ("high", "<f8"),
+        ("low", "<f8"),
+        ("close", "<f8"),
+        ("volume", "<f8"),
+    ]
+)
+
+DEFAULT_STORE_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "output", "klines"
+)
+
+_TIMEFRAME_UNITS_MS = {
+    "s": 1000,
+    "m": 60 * 1000,
+    "h": 60 * 60 * 1000,
+    "d": 24 * 60 * 60 * 1000,
+    "w": 7 * 24 * 60 * 60 * 1000,
+}
+
+
+def timeframe_to_ms(timeframe) -> int:
+    """
+    Convert a timeframe to milliseconds.
+
+    Args:
+        timeframe: Either a bar size in milliseconds (Merkle ``unit``) or a
+            Binance style interval string such as "30m", "4h" or "1d"
+
+    Returns:
+        Bar size in milliseconds
+    """
+    if isinstance(timeframe, (int, np.integer)):
+        return int(timeframe)
+    match = re.fullmatch(r"(\d+)([smhdw])", str(timeframe))
+    if not match:
+        if str(timeframe).isdigit():
+            return int(timeframe)
+        raise ValueError(f"Unsupported timeframe: {timeframe}")
+    return int(match.group(1)) * _TIMEFRAME_UNITS_MS[match.group(2)]
+
+
+def frame_to_klines(df: pd.DataFrame, ts_column: str = "ts") -> np.ndarray:
+    """
+    Convert a kline DataFrame into a KLINE_DTYPE structured array.
+
+    Args:
+        df: DataFrame with open/high/low/close(/volume) columns
+        ts_column: Column holding the candle open time, either epoch
+            milliseconds or datetime64 values
+
+    Returns:
+        Structured array sorted by ts
+    """
+    klines = np.empty(len(df), dtype=KLINE_DTYPE)
+    ts = df[ts_column]
+    if pd.api.types.is_datetime64_any_dtype(ts):
+        klines["ts"] = ts.to_numpy(dtype="datetime64[ms]").astype(np.int64)
+    else:
+        klines["ts"] = ts.to_numpy(dtype=np.int64)
+    for field in ("open", "high", "low", "close", "volume"):
+        if field in df:
+            klines[field] = df[field].to_numpy(dtype=np.float64)
+        else:
+            klines[field] = np.nan
+    return np.sort(klines, order="ts")
+
+
+def klines_to_frame(klines: np.ndarray) -> pd.DataFrame:
+    """
+    Convert a KLINE_DTYPE structured array back into the DataFrame layout
+    the analyzers work with (``ts`` in milliseconds plus a ``timestamp``).
+    """
+    df = pd.DataFrame({field: klines[field] for field in KLINE_DTYPE.names})
+    df["timestamp"] = pd.to_datetime(df["ts"], unit="ms")
+    return df
+
+
+class KlineStore:
+    """
+    On-disk candle store with one file per venue, symbol and timeframe.
+
+    Each file is a ``.npy`` array of KLINE_DTYPE rows sorted by ``ts``, so it
+    can be memory-mapped and sliced by time without parsing. Fetchers use
+    ``last_ts`` to request only newer bars and ``merge`` to fold them in;
+    rows with an existing ``ts`` are replaced, which lets the still-forming
+    last candle be refreshed on every tick.
+
+    Usage:
+        store = KlineStore()
+        last_ts = store.last_ts("merkle", "BTC_USD", 1800000)
+        store.merge("merkle", "BTC_USD", 1800000, new_klines)
+        window = store.window("merkle", "BTC_USD", 1800000, start_ts=from_time)
+    """
+
+    def __init__(self, root: str = DEFAULT_STORE_DIR):
+        """
+        Initialize the store.
+
+        Args:
+            root: Directory holding the candle files
+        """
+        self.root = root
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        # path -> earliest start the venue was asked for; it may have no older bars
+        self._fetched_from: Dict[str, int] = {}
+
+    def path(self, venue: str, symbol: str, timeframe) -> str:
+        """Return the file path for a venue/symbol/timeframe series"""
+        return os.path.join(self.root, venue, symbol, f"{timeframe}.npy")
+
+    def _lock(self, path: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(path, threading.Lock())
+
+    def load(self, venue: str, symbol: str, timeframe, mmap: bool = True) -> np.ndarray:
+        """
+        Load a stored series.
+
+        Args:
+            venue: Data source, e.g. "merkle" or "binance"
+            symbol: Symbol as used by the venue
+            timeframe: Bar size (Merkle unit in ms or Binance interval)
+            mmap: Memory-map the file instead of reading it into memory
+
+        Returns:
+            Structured array of KLINE_DTYPE rows, empty if nothing is stored
+        """
+        path = self.path(venue, symbol, timeframe)
+        if not os.path.exists(path):
+            return np.empty(0, dtype=KLINE_DTYPE)
+        return np.load(path, mmap_mode="r" if mmap else None)
+
+    def first_ts(self, venue: str, symbol: str, timeframe) -> Optional[int]:
+        """Return the open time of the oldest stored candle, or None"""
+        klines = self.load(venue, symbol, timeframe)
+        if len(klines) == 0:
+            return None
+        return int(klines["ts"][0])
+
+    def mark_fetched_from(self, venue: str, symbol: str, timeframe, start_ts: int):
+        """
+        Record that everything from start_ts on was requested from the venue.
+
+        Bars between start_ts and the first stored candle then do not exist
+        (e.g. the pair was listed later) and need not be requested again.
+        """
+        path = self.path(venue, symbol, timeframe)
+        with self._locks_guard:
+            self._fetched_from[path] = min(start_ts, self._fetched_from.get(path, start_ts))
+
+    def fetched_from(self, venue: str, symbol: str, timeframe) -> Optional[int]:
+        """Earliest time the stored series is complete from, or None if nothing is stored"""
+        first = self.first_ts(venue, symbol, timeframe)
+        if first is None:
+            return None
+        with self._locks_guard:
+            marked = self._fetched_from.get(self.path(venue, symbol, timeframe))
+        return first if marked is None else min(first, marked)
+
+    def last_ts(self, venue: str, symbol: str, timeframe) -> Optional[int]:
+        """Return the open time of the newest stored candle, or None"""
+        klines = self.load(venue, symbol, timeframe)
+        if len(klines) == 0:
+            return None
+        return int(klines["ts"][-1])
+
+    def merge(self, venue: str, symbol: str, timeframe, klines: np.ndarray) -> np.ndarray:
+        """
+        Merge new candles into the stored series.
+
+        Args:
+            venue: Data source, e.g. "merkle" or "binance"
+            symbol: Symbol as used by the venue
+            timeframe: Bar size (Merkle unit in ms or Binance interval)
+            klines: KLINE_DTYPE rows; these win over stored rows with the same ts
+
+        Returns:
+            The merged series
+        """
+        path = self.path(venue, symbol, timeframe)
+        with self._lock(path):
+            existing = self.load(venue, symbol, timeframe, mmap=False)
+            if len(klines) == 0:
+                return existing
+            combined = np.concatenate([klines.astype(KLINE_DTYPE, copy=False), existing])
+            # np.unique keeps the first occurrence of each ts, i.e. the new row
+            _, first = np.unique(combined["ts"], return_index=True)
+            merged = combined[first]
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, merged)
+            os.replace(tmp_path, path)
+            return merged
+
+    def window(
+        self,
+        venue: str,
+        symbol: str,
+        timeframe,
+        start_ts: Optional[int] = None,
+        end_ts: Optional[int] = None,
+    ) -> np.ndarray:
+        """
+        Return the stored candles with start_ts <= ts <= end_ts.
+
+        Args:
+            venue: Data source, e.g. "merkle" or "binance"
+            symbol: Symbol as used by the venue
+            timeframe: Bar size (Merkle unit in ms or Binance interval)
+            start_ts: Inclusive lower bound in milliseconds
+            end_ts: Inclusive upper bound in milliseconds
+
+        Returns:
+            In-memory copy of the matching rows
+        """
+        klines = self.load(venue, symbol, timeframe)
+        ts = klines["ts"]
+        lo = 0 if start_ts is None else int(np.searchsorted(ts, start_ts, side="left"))
+        hi = len(klines) if end_ts is None else int(np.searchsorted(ts, end_ts, side="right"))
+        return np.array(klines[lo:hi])
+
+    def tail(self, venue: str, symbol: str, timeframe, count: int) -> np.ndarray:
+        """Return an in-memory copy of the newest ``count`` candles"""
+        klines = self.load(venue, symbol, timeframe)
+        return np.array(klines[max(0, len(klines) - count):])
+
+
+_default_store: Optional[KlineStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_default_store() -> KlineStore:
+    """Return the process-wide store rooted at DEFAULT_STORE_DIR"""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = KlineStore()
+        return _default_store
@@ -5,6 +5,12 @@ from datetime import datetime
 from typing import Dict, List, Any, Callable, Optional, Tuple
 import logging
 from openai import OpenAI
+from action_stream import ActionCallback, collect_stream, emit_actions
+from async_llm import AsyncLLMPool, get_default_pool
+from prompt_encoding import encode_table
+from prompt_templates import PromptTemplate
+from llm_cache import LLMResponseCache, get_default_response_cache
+from llm_telemetry import LLMTelemetry, get_default_telemetry, instrumented_create
 
 # Configure logging
 logging.basicConfig(
@@ -12,6 +18,67 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+LENDING_PROMPT = PromptTemplate(
+    prefix="""You are a professional lending and borrowing agent. Analyze the market data and interest rates to provide optimal lending and borrowing actions in JSON format.
+
+The user sends market data, interest rates and current lending/borrowing positions as tables: one row per entry, "|"-separated columns and empty cells for missing data.
+Risk Tolerance: {risk_tolerance}
+
+Based on this information, generate lending and borrowing actions.
+Your response must be a valid JSON object with the following structure:
+
+```json
+{{
+  "actions": [
+    {{
+      "symbol": "BTC",
+      "action_type": "lend",  // One of: lend, repay_lend, borrow, repay_borrow
+      "amount": 0.5,  // Amount in the asset's units
+      "rate": 5.2,  // Expected interest rate (APY)
+      "reason": "High lending rates available with low market volatility"
+    }},
+    // More actions for other symbols
+  ],
+  "market_analysis": "Brief market analysis explaining the overall strategy",
+  "risk_assessment": "Assessment of current lending/borrowing risks"
+}}
+```
+
+Important requirements:
+1. Consider interest rate arbitrage opportunities (borrowing at lower rates and lending at higher rates)
+2. Consider market volatility and trends when making lending/borrowing decisions
+3. For high-volatility assets, be more conservative with borrowing
+4. Balance the portfolio to avoid over-exposure to any single asset
+5. Total borrowing should not exceed {max_borrow_percentage}% of portfolio value
+6. Include a brief reason for each action
+7. Provide overall market analysis and risk assessment
+
+For lending decisions:
+- Look for assets with high lending rates and low volatility
+- Consider lending more stable assets in volatile markets
+- Be cautious with lending assets that show strong directional trends
+
+For borrowing decisions:
+- Borrow assets with low borrowing rates
+- Consider borrowing assets expected to decrease in value
+- Avoid borrowing volatile assets unless for specific arbitrage opportunities
+
+Return only the JSON object without any additional text.""",
+    suffix="""Analyze the following market data, interest rates, and current lending/borrowing positions:
+
+Market Data:
+{market_data}
+
+Interest Rates (Annual, %):
+{rates}
+
+Current Positions:
+{positions}
+
+Portfolio Value: ${portfolio_value}
+Current Time: {current_time}""",
+)
+
 
 class LendingAgent:
     """
@@ -73,6 +140,9 @@ class LendingAgent:
         risk_tolerance: str = "medium",  # low, medium, high
         max_borrow_percentage: float = 50.0,  # Maximum percentage of portfolio to borrow
         min_interest_differential: float = 0.5,  # Minimum interest rate differential to consider arbitrage
+        response_cache: Optional[LLMResponseCache] = None,
+        use_response_cache: bool = True,
+        telemetry: Optional[LLMTelemetry] = None,
     ):
         """
         Initialize the lending agent.
@@ -85,8 +155,15 @@ class LendingAgent:
             risk_tolerance: Risk tolerance level (low, medium, high)
             max_borrow_percentage: Maximum percentage of portfolio value to borrow
             min_interest_differential: Minimum interest rate differential to consider for arbitrage
+            response_cache: Cache for LLM responses; defaults to the shared one
+            use_response_cache: Set to False to call the LLM on every request
+            telemetry: Where LLM calls are recorded; defaults to the shared one
         """
         self.output_file = output_file
+        self.response_cache = (
+            (response_cache or get_default_response_cache()) if use_response_cache else None
+        )
+        self.telemetry = telemetry or get_default_telemetry()
         self.risk_tolerance = risk_tolerance
         self.max_borrow_percentage = max_borrow_percentage
         self.min_interest_differential = min_interest_differential
@@ -107,6 +184,8 @@ class LendingAgent:
                 )
 
         self.client = OpenAI(api_key=api_key, base_url=base_url)
+        self.api_key = api_key
+        self.base_url = base_url
         self.model = model
 
         # Create output directory if it doesn't exist
@@ -121,6 +200,7 @@ class LendingAgent:
         borrowing_rates: Dict[str, float],
         portfolio_value: float,
         current_positions: Optional[Dict[str, Dict[str, Any]]] = None,
+        on_action: Optional[ActionCallback] = None,
     ) -> Dict[str, Any]:
         """
         Generate lending and borrowing actions based on market data and interest rates.
@@ -131,6 +211,9 @@ class LendingAgent:
             borrowing_rates: Dictionary mapping symbols to their borrowing interest rates
             portfolio_value: Total portfolio value in USD
             current_positions: Current lending and borrowing positions
+            on_action: Called with each action as soon as it is complete; the
+                response is streamed when set. Streamed actions are as the
+                model wrote them, the returned dict is validated.
 
         Returns:
             Dict containing lending actions with timestamp
@@ -138,66 +221,83 @@ class LendingAgent:
         if current_positions is not None:
             self.active_positions = current_positions
 
-        # Prepare the prompt for the LLM
-        prompt = self._prepare_prompt(
+        cache_key, cached = self._cached_response(
             market_data, lending_rates, borrowing_rates, portfolio_value
         )
+        if cached is not None:
+            emit_actions(cached, on_action)
+            return cached
 
         try:
             # Call the LLM to generate lending actions
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a professional lending and borrowing agent. Analyze the market data and interest rates to provide optimal lending and borrowing actions in JSON format.",
-                    },
-                    {"role": "user", "content": prompt},
-                ],
-                response_format={"type": "json_object"},
-                max_tokens=2048,
-                temperature=0.2,
-            )
+            request = self._completion_request(market_data, lending_rates, borrowing_rates, portfolio_value)
+            if on_action is None:
+                response = instrumented_create(self.client, "lending", self.telemetry, **request)
+                content = response.choices[0].message.content
+            else:
+                chunks = instrumented_create(self.client, "lending", self.telemetry, stream=True, **request)
+                content = collect_stream(chunks, on_action)
+            return self._handle_content(content, portfolio_value, cache_key)
+        except Exception as e:
+            logger.error(f"Error generating lending actions: {str(e)}")
+            return {
+                "actions": [],
+                "error": str(e),
+                "timestamp": datetime.now().isoformat(),
+            }
 
-            # Extract and parse the response
-            content = response.choices[0].message.content
-            if not content:
-                logger.warning("Received empty content from LLM")
-                return {"actions": [], "timestamp": datetime.now().isoformat()}
+    async def agenerate_lending_actions(
+        self,
+        market_data: List[Dict[str, Any]],
+        lending_rates: Dict[str, float],
+        borrowing_rates: Dict[str, float],
+        portfolio_value: float,
+        current_positions: Optional[Dict[str, Dict[str, Any]]] = None,
+        pool: Optional[AsyncLLMPool] = None,
+        on_action: Optional[ActionCallback] = None,
+    ) -> Dict[str, Any]:
+        """
+        Async variant of generate_lending_actions.
 
-            result = json.loads(content)
+        The request goes through a shared AsyncLLMPool, so it can run
+        concurrently with the other agents of a tick.
 
-            # Ensure timestamp is included
-            if "timestamp" not in result:
-                result["timestamp"] = datetime.now().isoformat()
-
-            # Validate actions and add any post-processing logic
-            if "actions" in result:
-                for action in result["actions"]:
-                    # Ensure action has all required fields
-                    required_fields = ["symbol", "action_type", "amount", "reason"]
-                    for field in required_fields:
-                        if field not in action:
-                            logger.warning(f"Action missing required field: {field}")
-                            action[field] = (
-                                ""
-                                if field == "reason"
-                                else "unknown" if field == "symbol" else 0
-                            )
-
-                    # Validate action type
-                    valid_actions = ["lend", "repay_lend", "borrow", "repay_borrow"]
-                    if action["action_type"] not in valid_actions:
-                        logger.warning(
-                            f"Invalid action type: {action['action_type']}, defaulting to 'lend'"
-                        )
-                        action["action_type"] = "lend"
+        Args:
+            market_data: List of market data for different symbols
+            lending_rates: Dictionary mapping symbols to their lending interest rates
+            borrowing_rates: Dictionary mapping symbols to their borrowing interest rates
+            portfolio_value: Total portfolio value in USD
+            current_positions: Current lending and borrowing positions
+            pool: Pool to send the request through; defaults to the shared one
+            on_action: Called with each action as soon as it is complete, as
+                in generate_lending_actions
 
-            # Update active positions based on actions
-            self._update_positions(result.get("actions", []), portfolio_value)
+        Returns:
+            Dict containing lending actions with timestamp
+        """
+        if current_positions is not None:
+            self.active_positions = current_positions
 
-            return result
+        cache_key, cached = self._cached_response(
+            market_data, lending_rates, borrowing_rates, portfolio_value
+        )
+        if cached is not None:
+            emit_actions(cached, on_action)
+            return cached
 
+        try:
+            pool = pool or get_default_pool()
+            request = self._completion_request(market_data, lending_rates, borrowing_rates, portfolio_value)
+            if on_action is None:
+                response = await pool.create(
+                    self.api_key, self.base_url, agent="lending", telemetry=self.telemetry, **request
+                )
+                content = response.choices[0].message.content
+            else:
+                content = await pool.stream(
+                    self.api_key, self.base_url, on_action, agent="lending", telemetry=self.telemetry, **request
+                )
+            return self._handle_content(content, portfolio_value, cache_key)
         except Exception as e:
             logger.error(f"Error generating lending actions: {str(e)}")
             return {
@@ -206,6 +306,107 @@ class LendingAgent:
                 "timestamp": datetime.now().isoformat(),
             }
 
+    def _cached_response(
+        self,
+        market_data: List[Dict[str, Any]],
+        lending_rates: Dict[str, float],
+        borrowing_rates: Dict[str, float],
+        portfolio_value: float,
+    ) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """
+        Look up a previous response for the same inputs.
+
+        Returns:
+            (response cache key or None, cached result or None)
+        """
+        # Reuse the previous response if market state, rates and positions are unchanged at cache precision
+        if self.response_cache is None:
+            return None, None
+        cache_key = self.response_cache.make_key(
+            "lending", self.model, market_data, lending_rates, borrowing_rates, portfolio_value,
+            self.active_positions, self.risk_tolerance, self.max_borrow_percentage,
+        )
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            cached["timestamp"] = datetime.now().isoformat()
+            self._update_positions(cached.get("actions", []), portfolio_value)
+        return cache_key, cached
+
+    def _completion_request(
+        self,
+        market_data: List[Dict[str, Any]],
+        lending_rates: Dict[str, float],
+        borrowing_rates: Dict[str, float],
+        portfolio_value: float,
+    ) -> Dict[str, Any]:
+        """Arguments of the chat.completions.create call for these inputs."""
+        prompt = LENDING_PROMPT.bind(
+            risk_tolerance=self.risk_tolerance, max_borrow_percentage=self.max_borrow_percentage
+        )
+        return dict(
+            model=self.model,
+            messages=prompt.messages(
+                **self._prepare_prompt(market_data, lending_rates, borrowing_rates, portfolio_value)
+            ),
+            response_format={"type": "json_object"},
+            max_tokens=2048,
+            temperature=0.2,
+        )
+
+    def _handle_content(
+        self, content: Optional[str], portfolio_value: float, cache_key: Optional[str]
+    ) -> Dict[str, Any]:
+        """Parse and validate an LLM response, then apply it to the active positions."""
+        if not content:
+            logger.warning("Received empty content from LLM")
+            return {"actions": [], "timestamp": datetime.now().isoformat()}
+
+        try:
+            result = json.loads(content)
+        except json.JSONDecodeError:
+            self.telemetry.increment("llm_json_parse_failures_total", agent="lending", model=self.model)
+            raise
+
+        # Ensure timestamp is included
+        if "timestamp" not in result:
+            result["timestamp"] = datetime.now().isoformat()
+
+        # Validate actions and add any post-processing logic
+        if "actions" in result:
+            for action in result["actions"]:
+                # Ensure action has all required fields
+                required_fields = ["symbol", "action_type", "amount", "reason"]
+                for field in required_fields:
+                    if field not in action:
+                        logger.warning(f"Action missing required field: {field}")
+                        self.telemetry.increment(
+                            "llm_normalizations_total", agent="lending", model=self.model, field=field
+                        )
+                        action[field] = (
+                            ""
+                            if field == "reason"
+                            else "unknown" if field == "symbol" else 0
+                        )
+
+                # Validate action type
+                valid_actions = ["lend", "repay_lend", "borrow", "repay_borrow"]
+                if action["action_type"] not in valid_actions:
+                    logger.warning(
+                        f"Invalid action type: {action['action_type']}, defaulting to 'lend'"
+                    )
+                    self.telemetry.increment(
+                        "llm_normalizations_total", agent="lending", model=self.model, field="action_type"
+                    )
+                    action["action_type"] = "lend"
+
+        if cache_key is not None and result.get("actions"):
+            self.response_cache.put(cache_key, result)
+
+        # Update active positions based on actions
+        self._update_positions(result.get("actions", []), portfolio_value)
+
+        return result
+
     def _update_positions(self, actions: List[Dict[str, Any]], portfolio_value: float):
         """
         Update active positions based on new actions.
@@ -285,9 +486,12 @@ class LendingAgent:
         lending_rates: Dict[str, float],
         borrowing_rates: Dict[str, float],
         portfolio_value: float,
-    ) -> str:
+    ) -> Dict[str, str]:
         """
-        Prepare the prompt for the LLM.
+        Prepare the dynamic part of the prompt for the LLM.
+
+        The instructions are the fixed prefix of LENDING_PROMPT; only the
+        tables, the portfolio value and the time change between calls.
 
         Args:
             market_data: List of market data for different symbols
@@ -296,76 +500,28 @@ class LendingAgent:
             portfolio_value: Total portfolio value in USD
 
         Returns:
-            Prompt string
+            Fields of LENDING_PROMPT's suffix
         """
-        market_data_str = json.dumps(market_data, indent=2)
-        lending_rates_str = json.dumps(lending_rates, indent=2)
-        borrowing_rates_str = json.dumps(borrowing_rates, indent=2)
-        active_positions_str = json.dumps(self.active_positions, indent=2)
-        current_time = datetime.now().isoformat()
-
-        prompt = f"""
-Analyze the following market data, interest rates, and current lending/borrowing positions:
-
-Market Data:
-{market_data_str}
-
-Lending Interest Rates (Annual):
-{lending_rates_str}
-
-Borrowing Interest Rates (Annual):
-{borrowing_rates_str}
-
-Current Positions:
-{active_positions_str}
-
-Portfolio Value: ${portfolio_value}
-Risk Tolerance: {self.risk_tolerance}
-
-Based on this information, generate lending and borrowing actions. 
-Your response must be a valid JSON object with the following structure:
-
-```json
-{{
-  "actions": [
-    {{
-      "symbol": "BTC",
-      "action_type": "lend",  // One of: lend, repay_lend, borrow, repay_borrow
-      "amount": 0.5,  // Amount in the asset's units
-      "rate": 5.2,  // Expected interest rate (APY)
-      "reason": "High lending rates available with low market volatility"
-    }},
-    // More actions for other symbols
-  ],
-  "market_analysis": "Brief market analysis explaining the overall strategy",
-  "risk_assessment": "Assessment of current lending/borrowing risks",
-  "timestamp": "{current_time}"
-}}
-```
-
-Important requirements:
-1. Consider interest rate arbitrage opportunities (borrowing at lower rates and lending at higher rates)
-2. Consider market volatility and trends when making lending/borrowing decisions
-3. For high-volatility assets, be more conservative with borrowing
-4. Balance the portfolio to avoid over-exposure to any single asset
-5. Total borrowing should not exceed {self.max_borrow_percentage}% of portfolio value
-6. Include a brief reason for each action
-7. Provide overall market analysis and risk assessment
-8. Include the current timestamp in the response
-
-For lending decisions:
-- Look for assets with high lending rates and low volatility
-- Consider lending more stable assets in volatile markets
-- Be cautious with lending assets that show strong directional trends
-
-For borrowing decisions:
-- Borrow assets with low borrowing rates
-- Consider borrowing assets expected to decrease in value
-- Avoid borrowing volatile assets unless for specific arbitrage opportunities
-
-Return only the JSON object without any additional text.
-"""
-        return prompt
+        rates = encode_table(
+            {
+                "symbol": symbol,
+                "lending_rate": lending_rates.get(symbol),
+                "borrowing_rate": borrowing_rates.get(symbol),
+            }
+            for symbol in dict.fromkeys([*lending_rates, *borrowing_rates])
+        )
+        positions = encode_table(
+            {"side": side, "symbol": symbol, **position}
+            for side, positions in self.active_positions.items()
+            for symbol, position in positions.items()
+        )
+        return {
+            "market_data": encode_table(market_data),
+            "rates": rates,
+            "positions": positions,
+            "portfolio_value": portfolio_value,
+            "current_time": datetime.now().isoformat(timespec="seconds"),
+        }
 
     def process_market_data(
         self,
@@ -0,0 +1,229 @@
+import fnmatch
+import hashlib
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "output", "llm_cache.sqlite"
+)
+
+# Seconds a cached response stays valid
+DEFAULT_TTL = 300.0
+# Responses kept in memory; older ones are still found in the backing store
+DEFAULT_MAX_ENTRIES = 1024
+
+# Absolute rounding step per field (fnmatch patterns, first match wins).
+# Oscillators bounded to 0-100 move in whole points; fields not listed are
+# rounded to DEFAULT_SIGNIFICANT_DIGITS.
+DEFAULT_QUANTIZATION: Dict[str, float] = {
+    "rsi*": 1.0,
+    "k": 1.0,
+    "d": 1.0,
+    "j": 1.0,
+    "willr": 1.0,
+    "adx": 1.0,
+    "plus_di": 1.0,
+    "minus_di": 1.0,
+    "cci": 5.0,
+    "roc": 0.1,
+    "trix": 0.01,
+    "ltv": 0.01,
+    "*Apy": 0.1,
+    "*_rate": 0.1,
+}
+DEFAULT_SIGNIFICANT_DIGITS = 4
+
+# Fields that change on every call without changing the market state
+DEFAULT_IGNORED_FIELDS = ("timestamp",)
+
+
+class LLMResponseCache:
+    """
+    Cache of parsed LLM responses keyed on a quantized view of their inputs.
+
+    Inputs are canonicalized before hashing: numbers are rounded with
+    ``quantization`` (an absolute step per field pattern) or to
+    ``significant_digits``, ``ignored_fields`` are dropped and dict keys are
+    sorted. Two market snapshots that only differ below that precision hit
+    the same entry.
+
+    Entries live in an in-memory LRU of ``max_entries`` and, when ``path`` is
+    set, in a SQLite file, so a restarted agent starts warm. Both honour
+    ``ttl`` seconds. Responses are stored as JSON text and decoded on every
+    hit, so callers may mutate what they get back.
+
+    Usage:
+        cache = LLMResponseCache()
+        key = cache.make_key("trading", model, market_data)
+        result = cache.get(key)
+        if result is None:
+            result = call_llm(...)
+            cache.put(key, result)
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = DEFAULT_CACHE_PATH,
+        ttl: float = DEFAULT_TTL,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        quantization: Optional[Dict[str, float]] = None,
+        significant_digits: int = DEFAULT_SIGNIFICANT_DIGITS,
+        ignored_fields=DEFAULT_IGNORED_FIELDS,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.quantization = dict(DEFAULT_QUANTIZATION if quantization is None else quantization)
+        self.significant_digits = significant_digits
+        self.ignored_fields = frozenset(ignored_fields)
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._steps: Dict[str, Optional[float]] = {}
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, created REAL, value TEXT)"
+            )
+            self._db.commit()
+
+    def _step(self, field: str) -> Optional[float]:
+        try:
+            return self._steps[field]
+        except KeyError:
+            step = self._steps[field] = next(
+                (step for pattern, step in self.quantization.items() if fnmatch.fnmatchcase(field, pattern)),
+                None,
+            )
+            return step
+
+    def _round(self, value: float, field: str) -> Optional[float]:
+        if value == 0:
+            return 0.0
+        if not math.isfinite(value):
+            return None
+        step = self._step(field)
+        if step:
+            return round(value / step) * step
+        return round(value, self.significant_digits - 1 - math.floor(math.log10(abs(value))))
+
+    def quantize(self, value: Any, field: str = "") -> Any:
+        """Canonical, rounded copy of ``value`` (dicts, lists, numbers, strings)."""
+        kind = type(value)
+        # Checked by exact type first: this runs for every field of every snapshot
+        if kind is float or kind is int:
+            return self._round(float(value), field)
+        if kind is str or value is None or kind is bool:
+            return value
+        if isinstance(value, dict):
+            ignored = self.ignored_fields
+            return {
+                str(k): self.quantize(v, str(k))
+                for k, v in value.items()
+                if k not in ignored
+            }
+        if isinstance(value, (list, tuple)):
+            return [self.quantize(v, field) for v in value]
+        if isinstance(value, str):
+            return value
+        # numpy scalars and other number-likes
+        try:
+            return self._round(float(value), field)
+        except (TypeError, ValueError):
+            return str(value)
+
+    def make_key(self, namespace: str, *inputs: Any) -> str:
+        """
+        Hash the quantized inputs of one call.
+
+        Args:
+            namespace: Caller identity, e.g. "trading"; keeps agents apart
+            *inputs: Everything the response depends on (model, market data,
+                rates, settings, ...)
+
+        Returns:
+            Hex digest used as the cache key
+        """
+        canonical = json.dumps(
+            [namespace, self.quantize(list(inputs))],
+            sort_keys=True, separators=(",", ":"), ensure_ascii=False,
+        )
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a fresh copy of the cached response, or None."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry[0] < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return json.loads(entry[1])
+                del self._entries[key]
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT created, value FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and now - row[0] < self.ttl:
+                    self._remember(key, row[0], row[1])
+                    self.hits += 1
+                    return json.loads(row[1])
+            self.misses += 1
+            return None
+
+    def put(self, key: str, response: Dict[str, Any]):
+        """Store a parsed response under ``key``."""
+        value = json.dumps(response, ensure_ascii=False)
+        created = time.time()
+        with self._lock:
+            self._remember(key, created, value)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO responses (key, created, value) VALUES (?, ?, ?)",
+                        (key, created, value),
+                    )
+                    self._db.execute("DELETE FROM responses WHERE created < ?", (created - self.ttl,))
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"Failed to persist LLM response cache entry: {e}")
+
+    def _remember(self, key: str, created: float, value: str):
+        self._entries[key] = (created, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop every entry, in memory and on disk."""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+
+_cache_lock = threading.Lock()
+_default_cache: Optional[LLMResponseCache] = None
+
+
+def get_default_response_cache() -> LLMResponseCache:
+    """Process-wide response cache backed by DEFAULT_CACHE_PATH."""
+    global _default_cache
+    with _cache_lock:
+        if _default_cache is None:
+            _default_cache = LLMResponseCache()
+        return _default_cache
@@ -0,0 +1,388 @@
+import bisect
+import json
+import logging
+import math
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0, 64.0)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+COST_BUCKETS = (0.00001, 0.00003, 0.0001, 0.0003, 0.001, 0.003, 0.01)
+
+# USD per million (input, cache-hit input, output) tokens; models not listed get no cost
+MODEL_PRICES: Dict[str, Tuple[float, float, float]] = {
+    "deepseek-chat": (0.28, 0.028, 0.42),
+    "deepseek-reasoner": (0.28, 0.028, 0.42),
+}
+
+
+class _Metric(NamedTuple):
+    kind: str
+    help: str
+    buckets: Tuple[float, ...] = ()
+
+
+METRICS: Dict[str, _Metric] = {
+    "llm_requests_total": _Metric("counter", "Chat completion calls by outcome"),
+    "llm_retries_total": _Metric("counter", "Retries the OpenAI client made inside calls"),
+    "llm_json_parse_failures_total": _Metric("counter", "Responses whose content was not valid JSON"),
+    "llm_normalizations_total": _Metric("counter", "Fields the agents had to correct in a response"),
+    "llm_request_duration_seconds": _Metric("histogram", "Call latency until the full response", LATENCY_BUCKETS),
+    "llm_time_to_first_byte_seconds": _Metric(
+        "histogram", "Latency until the first streamed chunk", LATENCY_BUCKETS
+    ),
+    "llm_prompt_tokens": _Metric("histogram", "Prompt tokens per call", TOKEN_BUCKETS),
+    "llm_prompt_cache_hit_tokens": _Metric(
+        "histogram", "Prompt tokens per call served from the provider's prefix cache", TOKEN_BUCKETS
+    ),
+    "llm_completion_tokens": _Metric("histogram", "Completion tokens per call", TOKEN_BUCKETS),
+    "llm_request_cost_usd": _Metric("histogram", "Estimated cost per call from MODEL_PRICES", COST_BUCKETS),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class CallRecord(NamedTuple):
+    """What was recorded about one chat completion call."""
+
+    agent: str
+    model: str
+    latency: float
+    ttfb: Optional[float]
+    retries: int
+    prompt_tokens: int
+    # Part of prompt_tokens the provider served from its prefix cache
+    cache_hit_tokens: int
+    completion_tokens: int
+    cost: Optional[float]
+    error: Optional[str]
+
+
+class _Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        # Per bucket, not cumulative; the last one is +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        bounds = [_format_number(b) for b in self.buckets] + ["+Inf"]
+        total, out = 0, []
+        for bound, count in zip(bounds, self.counts):
+            total += count
+            out.append((bound, total))
+        return out
+
+
+def _format_number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class LLMTelemetry:
+    """
+    In-process counters and histograms of chat completion calls.
+
+    Every series is labelled with the agent and model that made the call,
+    so the exports show which agent and prompt dominate latency and spend.
+    Export with ``to_prometheus`` (text exposition format, e.g. for a
+    node_exporter textfile) or ``to_json``.
+
+    Usage:
+        telemetry = get_default_telemetry()
+        response = instrumented_create(client, "trading", telemetry, **request)
+        print(telemetry.to_prometheus())
+    """
+
+    def __init__(self):
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], _Histogram] = {}
+        self._last_calls: Dict[str, CallRecord] = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, value: float = 1, **labels: str):
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: str):
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(METRICS[name].buckets)
+            histogram.observe(value)
+
+    def record_call(
+        self,
+        agent: str,
+        model: str,
+        latency: float,
+        ttfb: Optional[float] = None,
+        retries: int = 0,
+        usage: Any = None,
+        error: Optional[BaseException] = None,
+    ):
+        """
+        Record one chat completion call.
+
+        Args:
+            agent: Agent that made the call, e.g. "trading"
+            model: Model the call was sent to
+            latency: Seconds until the full response (or the error)
+            ttfb: Seconds until the first streamed chunk, None if not streamed
+            retries: Retries the client made before the final attempt
+            usage: The response's usage object or dict, if any
+            error: The exception the call raised, if any
+        """
+        labels = {"agent": agent, "model": model}
+        self.increment("llm_requests_total", outcome="error" if error is not None else "ok", **labels)
+        if retries:
+            self.increment("llm_retries_total", retries, **labels)
+        self.observe("llm_request_duration_seconds", latency, **labels)
+        if ttfb is not None:
+            self.observe("llm_time_to_first_byte_seconds", ttfb, **labels)
+        prompt_tokens = cache_hit_tokens = completion_tokens = 0
+        cost = None
+        if usage is not None:
+            prompt_tokens = _usage_field(usage, "prompt_tokens")
+            cache_hit_tokens = cache_hit_prompt_tokens(usage)
+            completion_tokens = _usage_field(usage, "completion_tokens")
+            self.observe("llm_prompt_tokens", prompt_tokens, **labels)
+            self.observe("llm_prompt_cache_hit_tokens", cache_hit_tokens, **labels)
+            self.observe("llm_completion_tokens", completion_tokens, **labels)
+            prices = MODEL_PRICES.get(model)
+            if prices is not None:
+                cost = (
+                    (prompt_tokens - cache_hit_tokens) * prices[0]
+                    + cache_hit_tokens * prices[1]
+                    + completion_tokens * prices[2]
+                ) / 1e6
+                self.observe("llm_request_cost_usd", cost, **labels)
+        with self._lock:
+            self._last_calls[agent] = CallRecord(
+                agent, model, latency, ttfb, retries, prompt_tokens, cache_hit_tokens, completion_tokens, cost,
+                None if error is None else str(error) or type(error).__name__,
+            )
+
+    def last_call(self, agent: str) -> Optional[CallRecord]:
+        """The most recent call recorded for agent, if any."""
+        with self._lock:
+            return self._last_calls.get(agent)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._last_calls.clear()
+
+    def to_prometheus(self) -> str:
+        """All series in the Prometheus text exposition format."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                ((key, h.cumulative(), h.sum, h.count) for key, h in self._histograms.items()),
+                key=lambda item: item[0],
+            )
+        lines: List[str] = []
+        written = set()
+
+        def header(name: str):
+            if name not in written:
+                written.add(name)
+                lines.append(f"# HELP {name} {METRICS[name].help}")
+                lines.append(f"# TYPE {name} {METRICS[name].kind}")
+
+        for (name, labels), value in counters:
+            header(name)
+            lines.append(f"{name}{_label_text(labels)} {_format_number(value)}")
+        for (name, labels), buckets, total, count in histograms:
+            header(name)
+            for bound, cumulative in buckets:
+                lines.append(f"{name}_bucket{_label_text(labels, ('le', bound))} {cumulative}")
+            lines.append(f"{name}_sum{_label_text(labels)} {_format_number(total)}")
+            lines.append(f"{name}_count{_label_text(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self) -> Dict[str, List[Dict[str, Any]]]:
+        """All series as {metric: [{"labels": ..., ...}]}."""
+        out: Dict[str, List[Dict[str, Any]]] = {}
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                out.setdefault(name, []).append({"labels": dict(labels), "value": value})
+            for (name, labels), histogram in sorted(self._histograms.items(), key=lambda item: item[0]):
+                out.setdefault(name, []).append({
+                    "labels": dict(labels),
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    "buckets": dict(histogram.cumulative()),
+                })
+        return out
+
+    def to_json(self, indent: Optional[int] = None) -> str:
+        return json.dumps(self.to_dict(), indent=indent)
+
+
+def _usage_field(usage: Any, name: str) -> int:
+    value = usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None)
+    return int(value or 0)
+
+
+def cache_hit_prompt_tokens(usage: Any) -> int:
+    """Prompt tokens served from the provider's prefix cache, 0 if not reported."""
+    # DeepSeek reports them at the top level of usage
+    hit = _usage_field(usage, "prompt_cache_hit_tokens")
+    if hit:
+        return hit
+    # OpenAI-style providers under prompt_tokens_details
+    details = usage.get("prompt_tokens_details") if isinstance(usage, dict) else getattr(
+        usage, "prompt_tokens_details", None
+    )
+    return _usage_field(details, "cached_tokens") if details is not None else 0
+
+
+class _Call:
+    """Timing of one call in progress."""
+
+    def __init__(self, telemetry: LLMTelemetry, agent: str, model: str):
+        self.telemetry = telemetry
+        self.agent = agent
+        self.model = model
+        self.start = time.monotonic()
+        self.ttfb: Optional[float] = None
+        self.retries = 0
+        self.usage: Any = None
+
+    def chunk(self, chunk: Any):
+        if self.ttfb is None:
+            self.ttfb = time.monotonic() - self.start
+        self.usage = getattr(chunk, "usage", None) or self.usage
+
+    def finish(self, usage: Any = None, error: Optional[BaseException] = None):
+        self.telemetry.record_call(
+            self.agent, self.model, time.monotonic() - self.start, self.ttfb, self.retries,
+            usage if usage is not None else self.usage, error,
+        )
+
+
+def _stream_request(request: Dict[str, Any]) -> Dict[str, Any]:
+    # Streams only report usage in a final chunk when asked to
+    if request.get("stream") and "stream_options" not in request:
+        return {**request, "stream_options": {"include_usage": True}}
+    return request
+
+
+def _iter_chunks(chunks, call: _Call) -> Iterator[Any]:
+    try:
+        for chunk in chunks:
+            call.chunk(chunk)
+            yield chunk
+    except BaseException as e:
+        call.finish(error=e)
+        raise
+    call.finish()
+
+
+async def _aiter_chunks(chunks, call: _Call) -> AsyncIterator[Any]:
+    try:
+        async for chunk in chunks:
+            call.chunk(chunk)
+            yield chunk
+    except BaseException as e:
+        call.finish(error=e)
+        raise
+    call.finish()
+
+
+def instrumented_create(client, agent: str, telemetry: Optional[LLMTelemetry] = None, **request):
+    """
+    client.chat.completions.create, recorded in telemetry.
+
+    Retries are read from the raw response where the client exposes one;
+    a call that finally fails does not report them.
+    A streamed call is recorded once its chunks are exhausted, with the
+    first chunk's arrival as time to first byte.
+
+    Args:
+        client: OpenAI client
+        agent: Agent label of the call
+        telemetry: Where to record; defaults to the shared one
+        **request: Arguments of chat.completions.create
+
+    Returns:
+        The response, or for stream=True an iterator over its chunks
+    """
+    call = _Call(telemetry or get_default_telemetry(), agent, request.get("model", ""))
+    request = _stream_request(request)
+    completions = client.chat.completions
+    raw = getattr(completions, "with_raw_response", None)
+    try:
+        if raw is not None:
+            raw_response = raw.create(**request)
+            call.retries = raw_response.retries_taken
+            response = raw_response.parse()
+        else:
+            response = completions.create(**request)
+    except BaseException as e:
+        call.finish(error=e)
+        raise
+    if request.get("stream"):
+        return _iter_chunks(response, call)
+    call.finish(getattr(response, "usage", None))
+    return response
+
+
+async def ainstrumented_create(client, agent: str, telemetry: Optional[LLMTelemetry] = None, **request):
+    """Async variant of instrumented_create, for AsyncOpenAI clients."""
+    call = _Call(telemetry or get_default_telemetry(), agent, request.get("model", ""))
+    request = _stream_request(request)
+    completions = client.chat.completions
+    raw = getattr(completions, "with_raw_response", None)
+    try:
+        if raw is not None:
+            raw_response = await raw.create(**request)
+            call.retries = raw_response.retries_taken
+            response = raw_response.parse()
+        else:
+            response = await completions.create(**request)
+    except BaseException as e:
+        call.finish(error=e)
+        raise
+    if request.get("stream"):
+        return _aiter_chunks(response, call)
+    call.finish(getattr(response, "usage", None))
+    return response
+
+
+_telemetry_lock = threading.Lock()
+_default_telemetry: Optional[LLMTelemetry] = None
+
+
+def get_default_telemetry() -> LLMTelemetry:
+    """Process-wide telemetry shared by every agent."""
+    global _default_telemetry
+    with _telemetry_lock:
+        if _default_telemetry is None:
+            _default_telemetry = LLMTelemetry()
+        return _default_telemetry
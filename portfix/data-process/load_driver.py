@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Load test the agents against the offline chat completions mock.
+
+Runs N trading agent loops concurrently on one event loop, all sharing an
+AsyncLLMPool, for a fixed duration, then reports decisions per second and
+latency percentiles.
+
+    python load_driver.py --agents 16 --duration 30 --latency lognormal:1.5,0.5
+    python load_driver.py --agents 8 --error-rate 0.05 --deadline 3 --stream
+    python load_driver.py --base-url http://127.0.0.1:8808/v1   # external mock
+    python load_driver.py --metrics prometheus                  # dump LLM call telemetry
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from MarketAnalyzer import MarketAnalyzer
+from async_llm import AsyncLLMPool
+from benchmark import make_klines
+from fallback_policy import SOURCE_FALLBACK, rule_based_actions
+from generator import TradingAgent
+from llm_telemetry import get_default_telemetry
+from mock_llm_server import MockConfig, MockLLMServer
+
+logger = logging.getLogger(__name__)
+
+
+def synthetic_market_data(symbols: int, bars: int = 300, seed: int = 0) -> List[Dict[str, Any]]:
+    """get_market_indicators-shaped records computed from random-walk klines"""
+    analyzer = MarketAnalyzer()
+    return [
+        {"symbol": f"SYM{i}", **analyzer.analyze_kline_data(make_klines(bars, seed=seed + i))}
+        for i in range(symbols)
+    ]
+
+
+async def agent_loop(
+    agent: TradingAgent,
+    market_data: List[Dict[str, Any]],
+    pool: AsyncLLMPool,
+    stop_at: float,
+    deadline: Optional[float],
+    stream: bool,
+    latencies: List[float],
+    outcomes: Counter,
+):
+    on_action = (lambda action: None) if stream else None
+    while time.monotonic() < stop_at:
+        start = time.monotonic()
+        call = agent.agenerate_trading_actions(market_data, pool=pool, on_action=on_action)
+        try:
+            result = await (asyncio.wait_for(call, deadline) if deadline else call)
+        except asyncio.TimeoutError:
+            result = rule_based_actions(market_data)
+        latencies.append(time.monotonic() - start)
+        if result.get("source") == SOURCE_FALLBACK:
+            outcomes["fallback"] += 1
+        elif result.get("actions"):
+            outcomes[result.get("source", "llm")] += 1
+        else:
+            outcomes["error"] += 1
+
+
+async def run_load(args, base_url: str) -> Dict[str, Any]:
+    pool = AsyncLLMPool(max_concurrency=args.concurrency, max_retries=args.max_retries)
+    agents = [
+        TradingAgent(
+            output_file="output/load_driver.jsonl", api_key="mock", base_url=base_url,
+            use_response_cache=args.cache, use_materiality_gate=args.cache,
+        )
+        for _ in range(args.agents)
+    ]
+    market_data = [synthetic_market_data(args.symbols, seed=i * args.symbols) for i in range(args.agents)]
+
+    latencies: List[float] = []
+    outcomes: Counter = Counter()
+    started = time.monotonic()
+    await asyncio.gather(*(
+        agent_loop(agent, data, pool, started + args.duration, args.deadline, args.stream, latencies, outcomes)
+        for agent, data in zip(agents, market_data)
+    ))
+    elapsed = time.monotonic() - started
+    await pool.aclose()
+    return {"elapsed": elapsed, "latencies": np.array(latencies), "outcomes": outcomes}
+
+
+def report(args, stats: Dict[str, Any], server: Optional[MockLLMServer]):
+    latencies, outcomes, elapsed = stats["latencies"], stats["outcomes"], stats["elapsed"]
+    decisions = len(latencies)
+    print(f"{args.agents} agent loops x {args.symbols} symbols for {elapsed:.1f}s"
+          f" (pool concurrency {args.concurrency}{', streaming' if args.stream else ''})")
+    print(f"  decisions:  {decisions}  ({decisions / elapsed:.2f}/s)")
+    print(f"  outcomes:   {', '.join(f'{k} {v}' for k, v in sorted(outcomes.items()))}")
+    if decisions:
+        p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+        print(f"  latency s:  p50 {p50:.3f}  p90 {p90:.3f}  p99 {p99:.3f}  max {latencies.max():.3f}")
+    if server is not None:
+        print(f"  mock requests served: {server.requests}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--agents", type=int, default=8, help="concurrent agent loops")
+    parser.add_argument("--symbols", type=int, default=10, help="symbols in each agent's market data")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds to run")
+    parser.add_argument("--concurrency", type=int, default=8, help="AsyncLLMPool max concurrency")
+    parser.add_argument("--deadline", type=float, help="per-decision deadline; the rule-based policy answers late ones")
+    parser.add_argument("--stream", action="store_true", help="request streamed responses")
+    parser.add_argument("--cache", action="store_true", help="keep the response cache and materiality gate on")
+    parser.add_argument("--max-retries", type=int, default=2, help="client retries on 429/5xx")
+    parser.add_argument("--base-url", help="use a running mock instead of starting one")
+    parser.add_argument("--metrics", choices=["prometheus", "json"], help="print the LLM call telemetry after the run")
+    mock = parser.add_argument_group("in-process mock")
+    mock.add_argument("--latency", default="lognormal:1,0.5")
+    mock.add_argument("--error-rate", type=float, default=0.0)
+    mock.add_argument("--rate-limit-rate", type=float, default=0.0)
+    mock.add_argument("--invalid-json-rate", type=float, default=0.0)
+    mock.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        config = MockConfig(args.latency, args.error_rate, args.rate_limit_rate, args.invalid_json_rate,
+                            seed=args.seed)
+        server = MockLLMServer(config).start()
+        base_url = server.base_url
+    try:
+        stats = asyncio.run(run_load(args, base_url))
+    finally:
+        if server is not None:
+            server.stop()
+    report(args, stats, server)
+    if args.metrics == "prometheus":
+        print(get_default_telemetry().to_prometheus())
+    elif args.metrics == "json":
+        print(get_default_telemetry().to_json(indent=2))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.ERROR,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        handlers=[logging.StreamHandler(sys.stdout)],
+    )
+    main()
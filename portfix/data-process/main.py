@@ -20,8 +20,11 @@ logging.basicConfig(
 )
 logger = logging.getLogger("main")
 
+# LLM call metrics, rewritten after every tick (Prometheus textfile format)
+LLM_METRICS_FILE = "./data-process/output/llm_metrics.prom"
+
 # Import the TradingAgent and sample market data function
-from generator import TradingAgent, get_sample_market_data
+from generator import DEFAULT_TICK_DEADLINE, TradingAgent, get_sample_market_data
 
 
 def load_env_variables():
@@ -64,7 +67,19 @@ def get_extended_market_data():
     return market_data
 
 
-def start_trading_actions_generation(agent: TradingAgent, output_file: str):
+def write_llm_metrics(agent: TradingAgent, path: str = LLM_METRICS_FILE):
+    """Export the agent's LLM telemetry, replacing the file atomically"""
+    try:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(agent.telemetry.to_prometheus())
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logger.error(f"Failed to write LLM metrics: {str(e)}")
+
+
+def start_trading_actions_generation(agent: TradingAgent, output_file: str,
+                                     deadline: float = DEFAULT_TICK_DEADLINE):
     """Start the generation of trading actions with actual API calls"""
 
     market_data = get_market_indicators()
@@ -75,12 +90,26 @@ def start_trading_actions_generation(agent: TradingAgent, output_file: str):
     start_time = time.time()
 
     try:
-        actions_data = agent.generate_trading_actions(market_data)
+        # Bounded by the tick deadline: a slow or failing LLM is answered by the rule-based policy
+        actions_data = agent.generate_trading_actions_within(market_data, deadline)
         end_time = time.time()
-        logger.info(f"Trading actions generated in {end_time - start_time:.2f} seconds")
+        logger.info(
+            f"Trading actions generated in {end_time - start_time:.2f} seconds "
+            f"(source: {actions_data.get('source', 'unknown')})"
+        )
+        call = agent.telemetry.last_call("trading")
+        if actions_data.get("source") == "llm" and call is not None:
+            logger.info(
+                f"LLM call: {call.latency:.2f}s, {call.prompt_tokens} prompt "
+                f"({call.cache_hit_tokens} from cache) + {call.completion_tokens} completion tokens, "
+                f"{call.retries} retries"
+                + (f", ${call.cost:.5f}" if call.cost is not None else "")
+            )
     except Exception as e:
         logger.error(f"Failed to generate trading actions: {str(e)}")
         return False
+    finally:
+        write_llm_metrics(agent)
 
     # Verify the results
     if not actions_data:
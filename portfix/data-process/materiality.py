@@ -0,0 +1,173 @@
+import copy
+import fnmatch
+import logging
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class FieldThreshold(NamedTuple):
+    """When a change in one indicator field counts as material."""
+
+    # Minimum absolute move, e.g. 5 RSI points
+    absolute: Optional[float] = None
+    # Minimum move relative to the previous value, e.g. 0.005 for 0.5%
+    relative: Optional[float] = None
+    # A change of sign is material regardless of size
+    sign_flip: bool = False
+
+
+# fnmatch pattern -> threshold, first match wins; fields not listed are ignored
+DEFAULT_THRESHOLDS: Dict[str, FieldThreshold] = {
+    "rsi*": FieldThreshold(absolute=5.0),
+    "macd_hist": FieldThreshold(relative=0.5, sign_flip=True),
+    "current_price": FieldThreshold(relative=0.005),
+    "binance_price": FieldThreshold(relative=0.005),
+    "price": FieldThreshold(relative=0.005),
+    # Joule lending rates, in percent
+    "borrowApy": FieldThreshold(absolute=0.5),
+    "depositApy": FieldThreshold(absolute=0.5),
+}
+
+# Record field holding the analyze_trend summary; Joule records carry it as "technical_analysis"
+DEFAULT_SIGNAL_FIELD = "summary"
+
+# Even on a quiet market, ask the model again after this many seconds
+DEFAULT_MAX_AGE = 900.0
+
+# Numbers inside a signal, e.g. "ROC为正(1.23)", change every tick without the
+# signal itself changing
+_SIGNAL_VALUE = re.compile(r"[(（][^)）]*[)）]")
+
+
+def summary_signals(summary: str) -> frozenset:
+    """analyze_trend signals of a summary string, without their embedded values."""
+    return frozenset(
+        _SIGNAL_VALUE.sub("", signal).strip()
+        for signal in re.split(r"[。\n]", summary or "")
+        if signal.strip()
+    )
+
+
+class _Sent(NamedTuple):
+    snapshot: Dict[str, Dict[str, Any]]
+    result: Dict[str, Any]
+    at: float
+
+
+class MaterialityGate:
+    """
+    Decide whether a new market snapshot is worth another LLM call.
+
+    A snapshot is a list of per-symbol records like get_market_indicators
+    returns. Compared with the snapshot last sent to the model for the same
+    caller, it is material when:
+      - a symbol appeared or disappeared
+      - any analyze_trend signal in ``signal_field`` flipped
+      - a field crossed its ``thresholds`` entry (RSI points, MACD histogram
+        sign or size, price move, lending rate move)
+      - the last call is older than ``max_age`` seconds
+
+    Otherwise ``reuse`` hands back the previous result with a fresh
+    timestamp. Only use it for agents whose actions are target states
+    (allocations, positions), where repeating them is idempotent.
+
+    Usage:
+        previous = gate.reuse("trading", market_data)
+        if previous is None:
+            result = call_llm(market_data)
+            gate.record("trading", market_data, result)
+    """
+
+    def __init__(
+        self,
+        thresholds: Optional[Dict[str, FieldThreshold]] = None,
+        max_age: Optional[float] = DEFAULT_MAX_AGE,
+        symbol_key: str = "symbol",
+        signal_field: str = DEFAULT_SIGNAL_FIELD,
+    ):
+        self.thresholds = dict(DEFAULT_THRESHOLDS if thresholds is None else thresholds)
+        self.max_age = max_age
+        self.symbol_key = symbol_key
+        self.signal_field = signal_field
+        self.reused = 0
+        self.passed = 0
+        self._sent: Dict[str, _Sent] = {}
+        self._lock = threading.Lock()
+
+    def _threshold(self, field: str) -> Optional[FieldThreshold]:
+        for pattern, threshold in self.thresholds.items():
+            if fnmatch.fnmatchcase(field, pattern):
+                return threshold
+        return None
+
+    def _index(self, market_data: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        return {str(record.get(self.symbol_key)): record for record in market_data}
+
+    def changes(self, previous: Dict[str, Dict[str, Any]], current: Dict[str, Dict[str, Any]]) -> List[str]:
+        """Human-readable list of material differences between two indexed snapshots."""
+        reasons = []
+        if previous.keys() != current.keys():
+            reasons.append(f"symbols changed: {sorted(previous)} -> {sorted(current)}")
+            return reasons
+        for symbol, record in current.items():
+            before = previous[symbol]
+            if summary_signals(before.get(self.signal_field)) != summary_signals(record.get(self.signal_field)):
+                reasons.append(f"{symbol} trend signals changed")
+            for field, value in record.items():
+                threshold = self._threshold(field)
+                old = before.get(field)
+                if threshold is None or not isinstance(value, (int, float)) or not isinstance(old, (int, float)):
+                    continue
+                move = abs(value - old)
+                if threshold.sign_flip and (value > 0) != (old > 0):
+                    reasons.append(f"{symbol} {field} changed sign ({old} -> {value})")
+                elif threshold.absolute is not None and move >= threshold.absolute:
+                    reasons.append(f"{symbol} {field} moved {move:.4g} ({old} -> {value})")
+                elif threshold.relative is not None and old and move / abs(old) >= threshold.relative:
+                    reasons.append(f"{symbol} {field} moved {move / abs(old):.2%} ({old} -> {value})")
+        return reasons
+
+    def reuse(self, name: str, market_data: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Return the previous result if nothing material changed, else None.
+
+        Args:
+            name: Caller identity, e.g. "trading"
+            market_data: Snapshot about to be sent to the model
+
+        Returns:
+            Copy of the last recorded result with a fresh timestamp, or None
+        """
+        with self._lock:
+            sent = self._sent.get(name)
+        if sent is None:
+            reasons = ["no previous call"]
+        elif self.max_age is not None and time.monotonic() - sent.at >= self.max_age:
+            reasons = [f"last call older than {self.max_age:.0f}s"]
+        else:
+            reasons = self.changes(sent.snapshot, self._index(market_data))
+
+        with self._lock:
+            if reasons:
+                self.passed += 1
+                logger.info(f"{name}: material change, calling model: {'; '.join(reasons[:3])}")
+                return None
+            self.reused += 1
+        result = copy.deepcopy(sent.result)
+        result["timestamp"] = datetime.now().isoformat()
+        return result
+
+    def record(self, name: str, market_data: List[Dict[str, Any]], result: Dict[str, Any]):
+        """Remember the snapshot sent to the model and the result it produced."""
+        with self._lock:
+            self._sent[name] = _Sent(copy.deepcopy(self._index(market_data)), copy.deepcopy(result), time.monotonic())
+
+    def forget(self, name: str):
+        """Force the next call for ``name`` to reach the model."""
+        with self._lock:
+            self._sent.pop(name, None)
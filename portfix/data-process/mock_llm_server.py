@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Offline OpenAI-compatible chat completions server for load tests.
+
+Answers POST .../chat/completions (plain or stream=True) with JSON shaped
+like the agents expect, after a latency drawn from a distribution, and
+fails a configurable share of requests.
+
+    python mock_llm_server.py --port 8808 --latency lognormal:2,0.4 --error-rate 0.02
+    # then point an agent at it: base_url="http://127.0.0.1:8808/v1"
+"""
+import argparse
+import json
+import logging
+import math
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8808
+
+# Share of the latency spent before the first streamed chunk
+STREAM_FIRST_CHUNK_SHARE = 0.3
+STREAM_CHUNK_CHARS = 16
+# Prefix cache granularity in tokens, as DeepSeek's context caching
+CACHE_BLOCK_TOKENS = 64
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    Build a latency sampler from a spec string, in seconds.
+
+        "0.5"                 fixed
+        "uniform:0.5,3"       uniform between the bounds
+        "lognormal:2,0.4"     lognormal with median 2 and shape sigma 0.4
+        "exp:1.5"             exponential with mean 1.5
+    """
+    kind, _, args = spec.partition(":")
+    if not args:
+        value = float(kind)
+        return lambda rng: value
+    params = [float(p) for p in args.split(",")]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(params[0], params[1])
+    if kind == "lognormal":
+        mu = math.log(params[0])
+        return lambda rng: rng.lognormvariate(mu, params[1])
+    if kind == "exp":
+        return lambda rng: rng.expovariate(1 / params[0])
+    raise ValueError(f"Unknown latency distribution {spec!r}")
+
+
+class MockConfig(NamedTuple):
+    latency: str = "0.5"
+    # Share of requests answered 500 / 429 / with a body that is not JSON
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    invalid_json_rate: float = 0.0
+    # Fixed response content instead of the templated one
+    canned: Optional[str] = None
+    seed: Optional[int] = None
+
+
+_TABLE_HEADER = re.compile(r"^Market Data[^\n]*:\n([^\n]+)\n((?:[^\n]+\n?)*)", re.MULTILINE)
+
+
+def prompt_symbols(prompt: str) -> List[str]:
+    """Symbols of the Market Data table in an agent prompt."""
+    match = _TABLE_HEADER.search(prompt)
+    if not match:
+        return ["BTC"]
+    header = match.group(1).split("|")
+    column = header.index("symbol") if "symbol" in header else 0
+    return [line.split("|")[column] for line in match.group(2).splitlines() if "|" in line] or ["BTC"]
+
+
+def templated_content(messages: List[Dict[str, Any]], rng: random.Random) -> str:
+    """A plausible response for the agent that sent messages."""
+    prompt = "\n".join(str(m.get("content", "")) for m in messages)
+    symbols = prompt_symbols(prompt)
+    if "action_type" in prompt:
+        actions = [
+            {"symbol": symbol, "action_type": rng.choice(["lend", "borrow"]),
+             "amount": round(rng.uniform(0.1, 10), 2), "rate": round(rng.uniform(1, 9), 2),
+             "reason": "mock"}
+            for symbol in symbols
+        ]
+        return json.dumps({"actions": actions, "market_analysis": "mock", "risk_assessment": "mock"})
+
+    if "target_price" in prompt:
+        symbols = symbols[:3]
+    weights = [rng.random() + 0.1 for _ in symbols]
+    actions = []
+    for symbol, weight in zip(symbols, weights):
+        action = {
+            "symbol": symbol,
+            "leverage": rng.choice([-1, 1]) * rng.randint(3, 20),
+            "position_percentage": round(weight / sum(weights) * 100, 2),
+            "reason": "mock",
+        }
+        if "target_price" in prompt:
+            action.update(target_price=100.0, expected_profit_percentage=round(rng.uniform(0, 10), 2))
+        actions.append(action)
+    return json.dumps({"actions": actions})
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "MockLLMServer"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def _send_json(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            return self._send_json(400, {"error": {"message": "invalid JSON body"}})
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+        self.server.respond(self, request)
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    """
+    Threaded chat completions server; each request sleeps its sampled latency.
+
+    Usage:
+        with MockLLMServer(MockConfig(latency="lognormal:1,0.5")) as server:
+            agent = TradingAgent(api_key="mock", base_url=server.base_url)
+    """
+
+    daemon_threads = True
+
+    def __init__(self, config: MockConfig = MockConfig(), host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), _Handler)
+        self.config = config
+        self._rng = random.Random(config.seed)
+        self._rng_lock = threading.Lock()
+        self._sample_latency = parse_latency(config.latency)
+        self.requests = 0
+        # System messages seen so far, standing in for the provider's prefix cache
+        self._cached_prefixes = set()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "MockLLMServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="mock-llm", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def respond(self, handler: _Handler, request: Dict[str, Any]):
+        with self._rng_lock:
+            self.requests += 1
+            latency = self._sample_latency(self._rng)
+            draw = self._rng.random()
+            content_rng = random.Random(self._rng.random())
+        config = self.config
+
+        if draw < config.error_rate:
+            time.sleep(latency * 0.2)
+            return handler._send_json(500, {"error": {"message": "mock internal error"}})
+        draw -= config.error_rate
+        if draw < config.rate_limit_rate:
+            return handler._send_json(429, {"error": {"message": "mock rate limit"}}, {"Retry-After": "1"})
+        draw -= config.rate_limit_rate
+        if draw < config.invalid_json_rate:
+            content = "Sorry, I can't help with that."
+        else:
+            content = config.canned or templated_content(request.get("messages", []), content_rng)
+
+        messages = request.get("messages", [])
+        prompt_tokens = _estimate_tokens(json.dumps(messages, ensure_ascii=False))
+        cache_hit_tokens = self._cache_hit_tokens(messages)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": _estimate_tokens(content),
+            "total_tokens": prompt_tokens + _estimate_tokens(content),
+            "prompt_cache_hit_tokens": cache_hit_tokens,
+            "prompt_cache_miss_tokens": prompt_tokens - cache_hit_tokens,
+        }
+        base = {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "created": int(time.time()),
+            "model": request.get("model", "mock"),
+        }
+        if request.get("stream"):
+            return self._stream(handler, base, content, usage, latency)
+
+        time.sleep(latency)
+        handler._send_json(200, {
+            **base,
+            "object": "chat.completion",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                         "finish_reason": "stop"}],
+            "usage": usage,
+        })
+
+    def _cache_hit_tokens(self, messages: List[Dict[str, Any]]) -> int:
+        """Whole cache blocks of a system message sent before; later messages always miss."""
+        if not messages or messages[0].get("role") != "system":
+            return 0
+        prefix = json.dumps(messages[0], ensure_ascii=False)
+        with self._rng_lock:
+            seen = prefix in self._cached_prefixes
+            self._cached_prefixes.add(prefix)
+        return _estimate_tokens(prefix) // CACHE_BLOCK_TOKENS * CACHE_BLOCK_TOKENS if seen else 0
+
+    def _stream(self, handler: _Handler, base: Dict[str, Any], content: str, usage: Dict[str, int], latency: float):
+        pieces = [content[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(content), STREAM_CHUNK_CHARS)] or [""]
+        time.sleep(latency * STREAM_FIRST_CHUNK_SHARE)
+        gap = latency * (1 - STREAM_FIRST_CHUNK_SHARE) / len(pieces)
+
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Cache-Control", "no-cache")
+        handler.send_header("Connection", "close")
+        handler.end_headers()
+
+        def event(delta: Dict[str, Any], finish: Optional[str] = None, extra: Optional[Dict[str, Any]] = None):
+            chunk = {**base, "object": "chat.completion.chunk",
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": finish}], **(extra or {})}
+            handler.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            handler.wfile.flush()
+
+        event({"role": "assistant", "content": ""})
+        for piece in pieces:
+            event({"content": piece})
+            time.sleep(gap)
+        event({}, "stop", {"usage": usage})
+        handler.wfile.write(b"data: [DONE]\n\n")
+        handler.wfile.flush()
+        handler.close_connection = True
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency", default="0.5", help="fixed seconds, uniform:a,b, lognormal:median,sigma or exp:mean")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of requests answered 429")
+    parser.add_argument("--invalid-json-rate", type=float, default=0.0, help="share of answers that are not JSON")
+    parser.add_argument("--response-file", help="serve this file's content instead of templated JSON")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    canned = None
+    if args.response_file:
+        with open(args.response_file) as f:
+            canned = f.read()
+    config = MockConfig(args.latency, args.error_rate, args.rate_limit_rate, args.invalid_json_rate, canned, args.seed)
+    server = MockLLMServer(config, args.host, args.port)
+    logger.info(f"Mock chat completions at {server.base_url} (latency {args.latency})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        handlers=[logging.StreamHandler(sys.stdout)],
+    )
+    main()
@@ -0,0 +1,84 @@
+import json
+import math
+from typing import Any, Dict, Iterable, List, Optional
+
+# Digits kept for floats; enough for any price or indicator the agents see
+DEFAULT_SIGNIFICANT_DIGITS = 6
+
+# Column separator of encoded tables; stripped from string cells
+SEPARATOR = "|"
+
+EMPTY_TABLE = "(none)"
+
+
+def format_number(value: Any, significant_digits: int = DEFAULT_SIGNIFICANT_DIGITS) -> Optional[str]:
+    """Shortest text of a number at the given precision, None for NaN/inf."""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return str(value)
+    number = float(value)
+    if not math.isfinite(number):
+        return None
+    if number.is_integer() and abs(number) < 1e15:
+        return str(int(number))
+    return f"{number:.{significant_digits}g}"
+
+
+def format_cell(value: Any, significant_digits: int = DEFAULT_SIGNIFICANT_DIGITS) -> Optional[str]:
+    """
+    Text of one table cell, or None when the value carries no information.
+
+    None, NaN and empty strings are dropped; nested lists and dicts are
+    written as compact JSON.
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        text = " ".join(value.replace(SEPARATOR, "/").split())
+        return text or None
+    if isinstance(value, (dict, list, tuple)):
+        if not value:
+            return None
+        return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+    try:
+        return format_number(value, significant_digits)
+    except (TypeError, ValueError):
+        return format_cell(str(value), significant_digits)
+
+
+def encode_table(
+    records: Iterable[Dict[str, Any]],
+    columns: Optional[List[str]] = None,
+    significant_digits: int = DEFAULT_SIGNIFICANT_DIGITS,
+) -> str:
+    """
+    Encode records as a header line plus one separated line per record.
+
+    Field names are written once instead of once per record, numbers are
+    rounded to ``significant_digits`` and missing values become empty
+    cells; a column that is empty in every record is left out entirely.
+
+    Args:
+        records: Dicts such as get_market_indicators returns
+        columns: Column order; defaults to the fields in first-seen order
+        significant_digits: Precision of float cells
+
+    Returns:
+        The table text, or "(none)" if there are no records
+    """
+    rows = [
+        {field: format_cell(value, significant_digits) for field, value in record.items()}
+        for record in records
+    ]
+    if not rows:
+        return EMPTY_TABLE
+    if columns is None:
+        columns = list(dict.fromkeys(field for row in rows for field in row))
+    columns = [field for field in columns if any(row.get(field) is not None for row in rows)]
+    lines = [SEPARATOR.join(columns)]
+    lines.extend(
+        SEPARATOR.join(row.get(field) or "" for field in columns) for row in rows
+    )
+    return "\n".join(lines)
+
@@ -0,0 +1,43 @@
+from typing import Any, Dict, List, NamedTuple
+
+
+class PromptTemplate(NamedTuple):
+    """
+    A chat prompt split into a static prefix and a dynamic suffix.
+
+    Providers with prefix caching (DeepSeek context caching, OpenAI prompt
+    caching) serve the longest already seen prefix of a request from cache,
+    which cuts both time to first token and input cost. The prefix is the
+    system message, holding the role, the response schema and the rules. It
+    depends only on the agent's settings, so every call repeats it byte for
+    byte and only the user message with the live data changes. Anything
+    volatile (timestamps, prices, positions) belongs in the suffix.
+
+    Both parts are str.format templates (JSON braces doubled). ``bind`` fills
+    the prefix with the agent's settings, ``messages`` fills the suffix with
+    the call's data. The same settings always give the same prefix bytes.
+
+    Usage:
+        messages = TRADING_PROMPT.bind().messages(market_data=encode_table(market_data))
+    """
+
+    prefix: str
+    suffix: str
+
+    def bind(self, **settings: Any) -> "BoundPrompt":
+        """Fill the prefix with the agent's settings, e.g. its risk tolerance."""
+        return BoundPrompt(self.prefix.format(**settings), self.suffix)
+
+
+class BoundPrompt(NamedTuple):
+    """A PromptTemplate whose prefix is final."""
+
+    prefix: str
+    suffix: str
+
+    def messages(self, **data: Any) -> List[Dict[str, str]]:
+        """Chat messages for one call: the fixed prefix, then data in the suffix."""
+        return [
+            {"role": "system", "content": self.prefix},
+            {"role": "user", "content": self.suffix.format(**data)},
+        ]
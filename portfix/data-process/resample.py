@@ -0,0 +1,68 @@
+from typing import Optional
+
+import numpy as np
+
+from kline_store import KLINE_DTYPE, timeframe_to_ms
+
+
+def resample_klines(
+    klines: np.ndarray,
+    base_timeframe,
+    target_timeframe,
+    include_partial: bool = True,
+    now: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Aggregate base-resolution candles into a higher timeframe.
+
+    Buckets are aligned to multiples of the target bar size since the epoch
+    (UTC), which is how the venues align 1h/4h/1d candles. Each bucket takes
+    the first open, the highest high, the lowest low, the last close and the
+    summed volume of its base candles.
+
+    A leading bucket whose first base candle is not the bucket's first is
+    dropped, since its open would be wrong. The trailing bucket is partial
+    while it is still forming (its end is after the last base candle's close
+    or after ``now``); it is kept by default, like the forming candle a venue
+    returns, and dropped when include_partial is False.
+
+    Args:
+        klines: KLINE_DTYPE rows sorted by ts
+        base_timeframe: Bar size of ``klines`` (ms or interval string)
+        target_timeframe: Bar size to build (ms or interval string)
+        include_partial: Keep the trailing, still forming bucket
+        now: Current time in ms, used to decide whether the last bucket closed
+
+    Returns:
+        KLINE_DTYPE rows at the target timeframe
+    """
+    base_ms = timeframe_to_ms(base_timeframe)
+    target_ms = timeframe_to_ms(target_timeframe)
+    if target_ms % base_ms:
+        raise ValueError(f"{target_timeframe} is not a multiple of {base_timeframe}")
+    if len(klines) == 0:
+        return np.empty(0, dtype=KLINE_DTYPE)
+    if target_ms == base_ms:
+        return np.array(klines, dtype=KLINE_DTYPE)
+
+    ts = np.asarray(klines["ts"])
+    buckets = ts - ts % target_ms
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+
+    out = np.empty(len(starts), dtype=KLINE_DTYPE)
+    out["ts"] = buckets[starts]
+    out["open"] = klines["open"][starts]
+    out["close"] = klines["close"][np.r_[starts[1:] - 1, len(ts) - 1]]
+    out["high"] = np.maximum.reduceat(klines["high"], starts)
+    out["low"] = np.minimum.reduceat(klines["low"], starts)
+    out["volume"] = np.add.reduceat(klines["volume"], starts)
+
+    first = 1 if ts[0] != buckets[0] else 0
+    last = len(out)
+    if not include_partial:
+        data_end = int(ts[-1]) + base_ms
+        if now is not None:
+            data_end = min(data_end, now)
+        if int(out["ts"][-1]) + target_ms > data_end:
+            last -= 1
+    return out[first:last]
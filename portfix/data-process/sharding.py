@@ -0,0 +1,104 @@
+import logging
+import math
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Symbols per LLM call in sharded mode; small enough to keep prompts short
+# and responses fast, large enough that the model still compares assets
+DEFAULT_SHARD_SIZE = 10
+
+# "source" of a merged result whose shards came from different sources
+# (see fallback_policy.SOURCE_*), e.g. some answered by the model, some reused
+SOURCE_MIXED = "mixed"
+
+
+def shard_records(records: List[Dict[str, Any]], shard_size: int = DEFAULT_SHARD_SIZE) -> List[List[Dict[str, Any]]]:
+    """
+    Split per-symbol records into contiguous shards of near-equal size.
+
+    25 records with shard_size 10 give shards of 9, 8 and 8 rather than
+    10, 10 and 5, so no shard is much slower than the others.
+    """
+    if not records:
+        return []
+    count = math.ceil(len(records) / max(1, shard_size))
+    base, extra = divmod(len(records), count)
+    shards, start = [], 0
+    for i in range(count):
+        end = start + base + (1 if i < extra else 0)
+        shards.append(records[start:end])
+        start = end
+    return shards
+
+
+def round_to_total(weights: List[float], total: float = 100.0, digits: int = 2) -> List[float]:
+    """Round weights so they still add up to exactly total; the residue goes to the largest."""
+    rounded = [round(w, digits) for w in weights]
+    if rounded:
+        largest = max(range(len(rounded)), key=rounded.__getitem__)
+        rounded[largest] = round(rounded[largest] + total - sum(rounded), digits)
+    return rounded
+
+
+def reduce_shard_results(
+    shards: List[List[Dict[str, Any]]],
+    results: List[Dict[str, Any]],
+    rank_key: Optional[str] = None,
+    max_actions: Optional[int] = None,
+    percentage_key: str = "position_percentage",
+) -> Dict[str, Any]:
+    """
+    Merge per-shard results into one allocation summing to 100%.
+
+    Each shard's percentages add up to 100 within the shard. They are
+    scaled by the shard's share of the symbols, so a symbol's global weight
+    is what it would get if every shard were equally convinced. Shards that
+    failed or returned no actions give up their share to the others.
+
+    Args:
+        shards: Records sent in each shard
+        results: Agent result per shard, same order
+        rank_key: Action field to rank by when trimming, highest first
+        max_actions: Keep at most this many actions (e.g. 3 for shorting)
+        percentage_key: Field holding the allocation
+
+    Returns:
+        Result dict with the merged actions, a fresh timestamp, the shards'
+        common "source" (SOURCE_MIXED if they differ; omitted if no shard
+        result is tagged) and, if any shard failed, "failed_shards" with
+        their indices and errors
+    """
+    merged: List[Dict[str, Any]] = []
+    failed: Dict[int, str] = {}
+    for i, (shard, result) in enumerate(zip(shards, results)):
+        actions = result.get("actions") or []
+        if not actions:
+            failed[i] = result.get("error", "no actions")
+            continue
+        total = sum(float(action.get(percentage_key, 0) or 0) for action in actions)
+        for action in actions:
+            share = float(action.get(percentage_key, 0) or 0) / total if total > 0 else 1 / len(actions)
+            merged.append({**action, percentage_key: share * len(shard)})
+
+    if rank_key is not None:
+        merged.sort(key=lambda action: float(action.get(rank_key, 0) or 0), reverse=True)
+    if max_actions is not None:
+        merged = merged[:max_actions]
+
+    total = sum(action[percentage_key] for action in merged)
+    if total > 0:
+        for action, weight in zip(merged, round_to_total([a[percentage_key] / total * 100 for a in merged])):
+            action[percentage_key] = weight
+
+    reduced: Dict[str, Any] = {"actions": merged, "timestamp": datetime.now().isoformat()}
+    sources = {result["source"] for result in results if "source" in result}
+    if sources:
+        reduced["source"] = sources.pop() if len(sources) == 1 else SOURCE_MIXED
+    if failed:
+        logger.warning(f"{len(failed)}/{len(shards)} shards returned no actions: {failed}")
+        reduced["failed_shards"] = failed
+        if not merged:
+            reduced["error"] = "; ".join(f"shard {i}: {error}" for i, error in failed.items())
+    return reduced
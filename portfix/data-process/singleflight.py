@@ -0,0 +1,112 @@
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+# Seconds a fetched result is served to later callers without refetching
+DEFAULT_TTL = 15.0
+# do() drops expired results once every this many calls; window keys roll
+# over with every bar, so without it results would pile up forever
+PURGE_EVERY = 256
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key into one execution.
+
+    The first caller for a key runs the function; callers arriving while it
+    is in flight wait for it and receive the same result (or exception).
+    Successful results are then served from memory for ``ttl`` seconds.
+    Exceptions are never cached, so the next caller after a failure retries.
+    Expired results are dropped every ``purge_every`` calls.
+
+    Results are shared objects; callers that mutate them must copy first.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_TTL, purge_every: int = PURGE_EVERY):
+        self.ttl = ttl
+        self.purge_every = purge_every
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        # key -> (stored at, ttl it was stored with, result)
+        self._results: Dict[Hashable, Tuple[float, float, Any]] = {}
+        self._since_purge = 0
+
+    def do(self, key: Hashable, func: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """
+        Return func()'s result for ``key``, sharing in-flight and recent calls.
+
+        Args:
+            key: Identity of the request, e.g. (venue, symbol, timeframe, window)
+            func: Zero-argument callable doing the actual work
+            ttl: Override the instance TTL for this key; 0 disables caching
+
+        Returns:
+            The (possibly shared) result
+        """
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self._since_purge += 1
+            if self._since_purge >= self.purge_every:
+                self._purge_locked()
+            cached = self._results.get(key)
+            if cached is not None and time.monotonic() - cached[0] < ttl:
+                return cached[2]
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                if call.error is None and ttl > 0:
+                    self._results[key] = (time.monotonic(), ttl, call.result)
+            call.done.set()
+        return call.result
+
+    def forget(self, key: Hashable):
+        """Drop the cached result for ``key`` so the next call refetches."""
+        with self._lock:
+            self._results.pop(key, None)
+
+    def purge(self):
+        """Drop expired results."""
+        with self._lock:
+            self._purge_locked()
+
+    def _purge_locked(self):
+        now = time.monotonic()
+        for key in [k for k, (at, ttl, _) in self._results.items() if now - at >= ttl]:
+            del self._results[key]
+        self._since_purge = 0
+
+
+_flight_lock = threading.Lock()
+_default_flight: Optional[SingleFlight] = None
+
+
+def get_default_flight(ttl: float = DEFAULT_TTL) -> SingleFlight:
+    """Process-wide SingleFlight shared by all market data fetchers (TTL fixed on first call)."""
+    global _default_flight
+    with _flight_lock:
+        if _default_flight is None:
+            _default_flight = SingleFlight(ttl=ttl)
+        return _default_flight
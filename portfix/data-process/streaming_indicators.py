@@ -0,0 +1,611 @@
+import math
+from collections import deque
+from typing import Dict, Optional
+
+import pandas as pd
+
+from batch_indicators import EPSILON
+
+NAN = float("nan")
+
+
+def _is_zero(value: float) -> bool:
+    return -EPSILON < value < EPSILON
+
+
+class StreamingSMA:
+    """Simple moving average over a running sum, as TA-Lib SMA."""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.window = deque()
+        self.total = 0.0
+        self.value = NAN
+
+    def update(self, x: float) -> float:
+        self.window.append(x)
+        self.total += x
+        if len(self.window) > self.period:
+            self.total -= self.window.popleft()
+        if len(self.window) == self.period:
+            self.value = self.total / self.period
+        return self.value
+
+
+class StreamingEMA:
+    """Exponential moving average seeded with the SMA of the first ``period`` values, as TA-Lib EMA."""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.k = 2.0 / (period + 1)
+        self.count = 0
+        self.seed_total = 0.0
+        self.value = NAN
+
+    def seed_with(self, value: float):
+        """Start the recursion from an externally computed seed."""
+        self.count = self.period
+        self.value = value
+
+    def update(self, x: float) -> float:
+        if self.count < self.period:
+            self.count += 1
+            self.seed_total += x
+            if self.count == self.period:
+                self.value = self.seed_total / self.period
+            return self.value
+        self.value = (x - self.value) * self.k + self.value
+        return self.value
+
+
+class StreamingRSI:
+    """Wilder RSI, as TA-Lib RSI."""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.prev_close: Optional[float] = None
+        self.count = 0
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+        self.value = NAN
+
+    def update(self, close: float) -> float:
+        if self.prev_close is None:
+            self.prev_close = close
+            return self.value
+        diff = close - self.prev_close
+        self.prev_close = close
+        gain = diff if diff > 0 else 0.0
+        loss = -diff if diff < 0 else 0.0
+
+        if self.count < self.period:
+            self.count += 1
+            self.avg_gain += gain
+            self.avg_loss += loss
+            if self.count < self.period:
+                return self.value
+            self.avg_gain /= self.period
+            self.avg_loss /= self.period
+        else:
+            self.avg_gain = (self.avg_gain * (self.period - 1) + gain) / self.period
+            self.avg_loss = (self.avg_loss * (self.period - 1) + loss) / self.period
+
+        total = self.avg_gain + self.avg_loss
+        self.value = 100.0 * (self.avg_gain / total) if not _is_zero(total) else 0.0
+        return self.value
+
+
+class StreamingMACD:
+    """
+    MACD as TA-Lib computes it: the fast EMA is seeded on the same bar as the
+    slow EMA (from the last ``fast`` closes), and no output is produced until
+    the signal line is available.
+    """
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        self.fast = StreamingEMA(fast)
+        self.slow = StreamingEMA(slow)
+        self.signal = StreamingEMA(signal)
+        self.recent = deque(maxlen=fast)
+        self.value = (NAN, NAN, NAN)
+
+    def update(self, close: float):
+        slow = self.slow.update(close)
+        if math.isnan(slow):
+            self.recent.append(close)
+            return self.value
+        if math.isnan(self.fast.value):
+            self.recent.append(close)
+            self.fast.seed_with(sum(self.recent) / len(self.recent))
+            fast = self.fast.value
+        else:
+            fast = self.fast.update(close)
+        macd = fast - slow
+        signal = self.signal.update(macd)
+        if not math.isnan(signal):
+            self.value = (macd, signal, macd - signal)
+        return self.value
+
+
+class StreamingBBands:
+    """Bollinger bands over an SMA with population standard deviation, as TA-Lib BBANDS(matype=0)."""
+
+    def __init__(self, period: int = 20, nbdevup: float = 2.0, nbdevdn: float = 2.0):
+        self.period = period
+        self.nbdevup = nbdevup
+        self.nbdevdn = nbdevdn
+        self.window = deque()
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.value = (NAN, NAN, NAN)
+
+    def update(self, x: float):
+        self.window.append(x)
+        self.total += x
+        self.total_sq += x * x
+        if len(self.window) > self.period:
+            old = self.window.popleft()
+            self.total -= old
+            self.total_sq -= old * old
+        if len(self.window) == self.period:
+            mean = self.total / self.period
+            variance = self.total_sq / self.period - mean * mean
+            stddev = math.sqrt(variance) if variance > 0 else 0.0
+            self.value = (
+                mean + self.nbdevup * stddev,
+                mean,
+                mean - self.nbdevdn * stddev,
+            )
+        return self.value
+
+
+class StreamingStoch:
+    """Slow stochastic with SMA smoothing, as TA-Lib STOCH(matype=0)."""
+
+    def __init__(self, fastk_period: int = 9, slowk_period: int = 3, slowd_period: int = 3):
+        self.highs = deque(maxlen=fastk_period)
+        self.lows = deque(maxlen=fastk_period)
+        self.slowk = StreamingSMA(slowk_period)
+        self.slowd = StreamingSMA(slowd_period)
+        self.value = (NAN, NAN)
+
+    def update(self, high: float, low: float, close: float):
+        self.highs.append(high)
+        self.lows.append(low)
+        if len(self.highs) < self.highs.maxlen:
+            return self.value
+        lowest = min(self.lows)
+        diff = (max(self.highs) - lowest) / 100.0
+        fastk = (close - lowest) / diff if diff != 0 else 0.0
+        slowk = self.slowk.update(fastk)
+        if math.isnan(slowk):
+            return self.value
+        slowd = self.slowd.update(slowk)
+        if not math.isnan(slowd):
+            self.value = (slowk, slowd)
+        return self.value
+
+
+class StreamingATR:
+    """Wilder average true range, as TA-Lib ATR."""
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.prev_close: Optional[float] = None
+        self.count = 0
+        self.total = 0.0
+        self.value = NAN
+
+    def update(self, high: float, low: float, close: float) -> float:
+        if self.prev_close is None:
+            self.prev_close = close
+            return self.value
+        tr = _true_range(high, low, self.prev_close)
+        self.prev_close = close
+        if self.count < self.period:
+            self.count += 1
+            self.total += tr
+            if self.count == self.period:
+                self.value = self.total / self.period
+            return self.value
+        self.value = (self.value * (self.period - 1) + tr) / self.period
+        return self.value
+
+
+def _true_range(high: float, low: float, prev_close: float) -> float:
+    greatest = high - low
+    value = abs(prev_close - high)
+    if value > greatest:
+        greatest = value
+    value = abs(low - prev_close)
+    if value > greatest:
+        greatest = value
+    return greatest
+
+
+class StreamingDMI:
+    """
+    +DI, -DI and ADX from one set of Wilder-smoothed directional movement and
+    true range sums, as TA-Lib PLUS_DI / MINUS_DI / ADX.
+    """
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.prev: Optional[tuple] = None
+        self.bars = 0
+        self.plus_dm = 0.0
+        self.minus_dm = 0.0
+        self.tr = 0.0
+        self.dx_count = 0
+        self.dx_total = 0.0
+        self.adx = NAN
+        self.value = (NAN, NAN, NAN)
+
+    def update(self, high: float, low: float, close: float):
+        if self.prev is None:
+            self.prev = (high, low, close)
+            return self.value
+        prev_high, prev_low, prev_close = self.prev
+        self.prev = (high, low, close)
+        diff_p = high - prev_high
+        diff_m = prev_low - low
+        plus_dm = diff_p if diff_p > 0 and diff_p > diff_m else 0.0
+        minus_dm = diff_m if diff_m > 0 and diff_p < diff_m else 0.0
+        tr = _true_range(high, low, prev_close)
+
+        self.bars += 1
+        period = self.period
+        if self.bars < period:
+            # The first period-1 bars are summed without smoothing
+            self.plus_dm += plus_dm
+            self.minus_dm += minus_dm
+            self.tr += tr
+            return self.value
+
+        self.plus_dm = self.plus_dm - self.plus_dm / period + plus_dm
+        self.minus_dm = self.minus_dm - self.minus_dm / period + minus_dm
+        self.tr = self.tr - self.tr / period + tr
+
+        plus_di = minus_di = 0.0
+        dx = None
+        if not _is_zero(self.tr):
+            plus_di = 100.0 * (self.plus_dm / self.tr)
+            minus_di = 100.0 * (self.minus_dm / self.tr)
+            total = plus_di + minus_di
+            if not _is_zero(total):
+                dx = 100.0 * (abs(minus_di - plus_di) / total)
+
+        if self.dx_count < period:
+            self.dx_count += 1
+            if dx is not None:
+                self.dx_total += dx
+            if self.dx_count == period:
+                self.adx = self.dx_total / period
+        elif dx is not None:
+            self.adx = (self.adx * (period - 1) + dx) / period
+
+        self.value = (plus_di, minus_di, self.adx)
+        return self.value
+
+
+class StreamingSAR:
+    """Parabolic SAR, as TA-Lib SAR."""
+
+    def __init__(self, acceleration: float = 0.02, maximum: float = 0.2):
+        self.acceleration = acceleration
+        self.maximum = maximum
+        self.first: Optional[tuple] = None
+        self.started = False
+        self.is_long = True
+        self.af = acceleration
+        self.ep = NAN
+        self.sar = NAN
+        self.new_high = NAN
+        self.new_low = NAN
+        self.value = NAN
+
+    def update(self, high: float, low: float) -> float:
+        if self.first is None:
+            self.first = (high, low)
+            return self.value
+
+        if not self.started:
+            first_high, first_low = self.first
+            # Initial direction comes from the one-bar -DM of the first two bars
+            diff_p = high - first_high
+            diff_m = first_low - low
+            self.is_long = not (diff_m > 0 and diff_p < diff_m)
+            if self.is_long:
+                self.ep = high
+                self.sar = first_low
+            else:
+                self.ep = low
+                self.sar = first_high
+            self.new_low = low
+            self.new_high = high
+            self.started = True
+
+        prev_low, prev_high = self.new_low, self.new_high
+        self.new_low, self.new_high = low, high
+        new_low, new_high = low, high
+
+        if self.is_long:
+            if new_low <= self.sar:
+                self.is_long = False
+                sar = max(self.ep, prev_high, new_high)
+                self.value = sar
+                self.af = self.acceleration
+                self.ep = new_low
+                sar = sar + self.af * (self.ep - sar)
+                self.sar = max(sar, prev_high, new_high)
+            else:
+                self.value = self.sar
+                if new_high > self.ep:
+                    self.ep = new_high
+                    self.af = min(self.af + self.acceleration, self.maximum)
+                sar = self.sar + self.af * (self.ep - self.sar)
+                self.sar = min(sar, prev_low, new_low)
+        else:
+            if new_high >= self.sar:
+                self.is_long = True
+                sar = min(self.ep, prev_low, new_low)
+                self.value = sar
+                self.af = self.acceleration
+                self.ep = new_high
+                sar = sar + self.af * (self.ep - sar)
+                self.sar = min(sar, prev_low, new_low)
+            else:
+                self.value = self.sar
+                if new_low < self.ep:
+                    self.ep = new_low
+                    self.af = min(self.af + self.acceleration, self.maximum)
+                sar = self.sar + self.af * (self.ep - self.sar)
+                self.sar = max(sar, prev_high, new_high)
+        return self.value
+
+
+class StreamingChange:
+    """MOM (difference) or ROC (percentage) against the close ``period`` bars ago."""
+
+    def __init__(self, period: int = 10, percent: bool = False):
+        self.window = deque(maxlen=period + 1)
+        self.percent = percent
+        self.value = NAN
+
+    def update(self, x: float) -> float:
+        self.window.append(x)
+        if len(self.window) < self.window.maxlen:
+            return self.value
+        past = self.window[0]
+        if self.percent:
+            self.value = ((x / past) - 1.0) * 100.0 if past != 0 else 0.0
+        else:
+            self.value = x - past
+        return self.value
+
+
+class StreamingTEMA:
+    """Triple exponential moving average, as TA-Lib TEMA."""
+
+    def __init__(self, period: int = 20):
+        self.ema1 = StreamingEMA(period)
+        self.ema2 = StreamingEMA(period)
+        self.ema3 = StreamingEMA(period)
+        self.value = NAN
+
+    def update(self, x: float) -> float:
+        e1 = self.ema1.update(x)
+        if math.isnan(e1):
+            return self.value
+        e2 = self.ema2.update(e1)
+        if math.isnan(e2):
+            return self.value
+        e3 = self.ema3.update(e2)
+        if not math.isnan(e3):
+            self.value = 3.0 * e1 - 3.0 * e2 + e3
+        return self.value
+
+
+class StreamingTRIX:
+    """One-bar rate of change of a triple-smoothed EMA, as TA-Lib TRIX."""
+
+    def __init__(self, period: int = 30):
+        self.ema1 = StreamingEMA(period)
+        self.ema2 = StreamingEMA(period)
+        self.ema3 = StreamingEMA(period)
+        self.prev = NAN
+        self.value = NAN
+
+    def update(self, x: float) -> float:
+        e1 = self.ema1.update(x)
+        if math.isnan(e1):
+            return self.value
+        e2 = self.ema2.update(e1)
+        if math.isnan(e2):
+            return self.value
+        e3 = self.ema3.update(e2)
+        if math.isnan(e3):
+            return self.value
+        if not math.isnan(self.prev):
+            self.value = ((e3 / self.prev) - 1.0) * 100.0 if self.prev != 0 else 0.0
+        self.prev = e3
+        return self.value
+
+
+class StreamingCCI:
+    """Commodity channel index, as TA-Lib CCI."""
+
+    def __init__(self, period: int = 14):
+        self.window = deque(maxlen=period)
+        self.value = NAN
+
+    def update(self, high: float, low: float, close: float) -> float:
+        typical = (high + low + close) / 3.0
+        self.window.append(typical)
+        period = self.window.maxlen
+        if len(self.window) < period:
+            return self.value
+        average = sum(self.window) / period
+        deviation = sum(abs(tp - average) for tp in self.window)
+        spread = typical - average
+        if spread != 0.0 and deviation != 0.0:
+            self.value = spread / (0.015 * (deviation / period))
+        else:
+            self.value = 0.0
+        return self.value
+
+
+class StreamingWILLR:
+    """Williams %R, as TA-Lib WILLR."""
+
+    def __init__(self, period: int = 14):
+        self.highs = deque(maxlen=period)
+        self.lows = deque(maxlen=period)
+        self.value = NAN
+
+    def update(self, high: float, low: float, close: float) -> float:
+        self.highs.append(high)
+        self.lows.append(low)
+        if len(self.highs) < self.highs.maxlen:
+            return self.value
+        highest = max(self.highs)
+        diff = (highest - min(self.lows)) / -100.0
+        self.value = (highest - close) / diff if diff != 0 else 0.0
+        return self.value
+
+
+class StreamingIndicatorEngine:
+    """
+    Stateful indicator engine that updates every indicator of
+    ``MarketAnalyzer.calculate_technical_indicators`` in constant time per
+    closed candle.
+
+    The engine is seeded once from history and then fed each newly closed
+    candle. Every indicator follows TA-Lib's seeding and smoothing rules, so
+    after seeding with the same history the values match talib's last row.
+
+    Usage:
+        engine = StreamingIndicatorEngine().seed(history_df)
+        latest = engine.update(high, low, close, ts=candle_ts)
+    """
+
+    def __init__(self):
+        self.ma = {period: StreamingSMA(period) for period in (5, 10, 20, 60)}
+        self.ema = {period: StreamingEMA(period) for period in (12, 26)}
+        self.rsi = {period: StreamingRSI(period) for period in (6, 12, 24)}
+        self.bbands = StreamingBBands(20, 2, 2)
+        self.macd = StreamingMACD(12, 26, 9)
+        self.stoch = StreamingStoch(9, 3, 3)
+        self.sar = StreamingSAR(0.02, 0.2)
+        self.dmi = StreamingDMI(14)
+        self.roc = StreamingChange(10, percent=True)
+        self.tema = StreamingTEMA(20)
+        self.mom = StreamingChange(10)
+        self.atr = StreamingATR(14)
+        self.cci = StreamingCCI(14)
+        self.trix = StreamingTRIX(30)
+        self.willr = StreamingWILLR(14)
+        self.last_ts: Optional[int] = None
+        self.bars = 0
+        self._latest: Dict[str, float] = {}
+
+    def seed(self, df: pd.DataFrame, ts_column: str = "ts") -> "StreamingIndicatorEngine":
+        """
+        Feed a block of historical candles.
+
+        Args:
+            df: DataFrame with high/low/close columns, oldest first
+            ts_column: Column with candle open times; rows at or before the
+                last fed candle are skipped
+
+        Returns:
+            The engine itself
+        """
+        highs = df["high"].astype(float).tolist()
+        lows = df["low"].astype(float).tolist()
+        closes = df["close"].astype(float).tolist()
+        stamps = df[ts_column].tolist() if ts_column in df else [None] * len(closes)
+        for high, low, close, ts in zip(highs, lows, closes, stamps):
+            self.update(high, low, close, ts=ts)
+        return self
+
+    def update(self, high: float, low: float, close: float, ts: Optional[int] = None) -> Dict[str, float]:
+        """
+        Feed one closed candle.
+
+        Args:
+            high: Candle high
+            low: Candle low
+            close: Candle close
+            ts: Candle open time; candles at or before the last fed one are ignored
+
+        Returns:
+            Latest value of every indicator
+        """
+        if ts is not None:
+            if self.last_ts is not None and ts <= self.last_ts:
+                return self.latest()
+            self.last_ts = ts
+        self.bars += 1
+
+        for sma in self.ma.values():
+            sma.update(close)
+        for ema in self.ema.values():
+            ema.update(close)
+        for rsi in self.rsi.values():
+            rsi.update(close)
+        self.bbands.update(close)
+        self.macd.update(close)
+        self.stoch.update(high, low, close)
+        self.sar.update(high, low)
+        self.dmi.update(high, low, close)
+        self.roc.update(close)
+        self.tema.update(close)
+        self.mom.update(close)
+        self.atr.update(high, low, close)
+        self.cci.update(high, low, close)
+        self.trix.update(close)
+        self.willr.update(high, low, close)
+        self._latest = {}
+        return self.latest()
+
+    def latest(self) -> Dict[str, float]:
+        """Return the latest indicator values keyed like calculate_technical_indicators."""
+        if self._latest:
+            return self._latest
+        upper, middle, lower = self.bbands.value
+        macd, macd_signal, macd_hist = self.macd.value
+        k, d = self.stoch.value
+        plus_di, minus_di, adx = self.dmi.value
+        self._latest = {
+            "ma5": self.ma[5].value,
+            "ma10": self.ma[10].value,
+            "ma20": self.ma[20].value,
+            "ma60": self.ma[60].value,
+            "ema12": self.ema[12].value,
+            "ema26": self.ema[26].value,
+            "rsi6": self.rsi[6].value,
+            "rsi12": self.rsi[12].value,
+            "rsi24": self.rsi[24].value,
+            "bb_upper": upper,
+            "bb_middle": middle,
+            "bb_lower": lower,
+            "macd": macd,
+            "macd_signal": macd_signal,
+            "macd_hist": macd_hist,
+            "k": k,
+            "d": d,
+            "j": 3 * k - 2 * d,
+            "atr": self.atr.value,
+            "cci": self.cci.value,
+            "adx": adx,
+            "trix": self.trix.value,
+            "willr": self.willr.value,
+            "sar": self.sar.value,
+            "plus_di": plus_di,
+            "minus_di": minus_di,
+            "roc": self.roc.value,
+            "tema": self.tema.value,
+            "mom": self.mom.value,
+        }
+        return self._latest
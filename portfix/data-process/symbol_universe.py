@@ -0,0 +1,230 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# Offline stand-in for the venue's pair list, same shape as the API's {"items": [...]}
+DEFAULT_PAIRS_FIXTURE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "fixtures", "merkle_pairs.json"
+)
+
+# Seconds between pair list refreshes
+DEFAULT_REFRESH_INTERVAL = 3600.0
+
+# Seconds one analysis tick may take across the whole universe
+DEFAULT_TICK_BUDGET = 30.0
+
+PRIORITIES = ("liquidity", "volatility")
+
+
+def load_pairs_fixture(path: str = DEFAULT_PAIRS_FIXTURE) -> List[Dict[str, Any]]:
+    """Read a pair list saved in the API's {"items": [...]} layout."""
+    with open(path) as f:
+        return json.load(f)["items"]
+
+
+class TickResult(NamedTuple):
+    """Outcome of one budgeted pass over the universe."""
+
+    # Analysis results by symbol, in priority order
+    results: Dict[str, Any]
+    # Symbols not analyzed because the budget ran out
+    skipped: List[str]
+    # Symbols whose analysis raised
+    failed: Dict[str, str]
+    elapsed: float
+
+
+class SymbolUniverse:
+    """
+    Tradable symbols of a venue, refreshed from its pair list.
+
+    The pair list comes from ``source``, a callable returning pair records
+    such as {"pairType": "BTC_USD", "tradable": true, "volume24h": ...}; by
+    default the bundled fixture. It is reloaded once ``refresh_interval``
+    seconds have passed; if a refresh fails the previous list is kept.
+
+    ``run_tick`` analyzes the universe in priority order under a time
+    budget: by 24h volume ("liquidity") or by the realized volatility last
+    reported through ``observe`` ("volatility"). Symbols that do not fit in
+    the budget are reported as skipped.
+
+    Usage:
+        universe = SymbolUniverse()
+        tick = universe.run_tick(analyze_symbol, budget=20, priority="volatility")
+    """
+
+    def __init__(
+        self,
+        source: Optional[Callable[[], List[Dict[str, Any]]]] = None,
+        refresh_interval: float = DEFAULT_REFRESH_INTERVAL,
+        symbol_key: str = "pairType",
+    ):
+        self.source = source or load_pairs_fixture
+        self.refresh_interval = refresh_interval
+        self.symbol_key = symbol_key
+        self._pairs: Dict[str, Dict[str, Any]] = {}
+        self._volatility: Dict[str, float] = {}
+        self._refreshed_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Reload the pair list if it is older than refresh_interval.
+
+        Args:
+            force: Reload regardless of age
+
+        Returns:
+            True if the list was reloaded
+        """
+        now = time.monotonic()
+        with self._lock:
+            stale = self._refreshed_at is None or now - self._refreshed_at >= self.refresh_interval
+            if not (force or stale):
+                return False
+            # Claim the refresh so concurrent callers keep using the current list
+            self._refreshed_at = now
+        try:
+            records = self.source()
+        except Exception as e:
+            logger.error(f"Failed to refresh pair list, keeping {len(self._pairs)} pairs: {e}")
+            return False
+
+        pairs = {
+            record[self.symbol_key]: record
+            for record in records
+            if record.get(self.symbol_key) and record.get("tradable", True)
+        }
+        with self._lock:
+            added = pairs.keys() - self._pairs.keys()
+            removed = self._pairs.keys() - pairs.keys()
+            self._pairs = pairs
+            for symbol in removed:
+                self._volatility.pop(symbol, None)
+        if added or removed:
+            logger.info(f"Pair list refreshed: {len(pairs)} tradable, +{len(added)} -{len(removed)}")
+        return True
+
+    def symbols(self, category: Optional[str] = None) -> List[str]:
+        """Tradable symbols, refreshing the pair list first if due."""
+        self.refresh()
+        with self._lock:
+            return [
+                symbol for symbol, record in self._pairs.items()
+                if category is None or record.get("category") == category
+            ]
+
+    def observe(self, symbol: str, volatility: float):
+        """Record a symbol's latest realized volatility for volatility priority."""
+        with self._lock:
+            self._volatility[symbol] = volatility
+
+    def prioritized(self, priority: str = "liquidity", category: Optional[str] = None) -> List[str]:
+        """
+        Symbols ordered most important first.
+
+        Symbols without a volatility reading yet sort ahead of the rest under
+        "volatility", so every symbol gets measured at least once.
+
+        Args:
+            priority: "liquidity" (24h volume) or "volatility"
+            category: Restrict to one pair category, e.g. "crypto"
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority {priority!r}, expected one of {PRIORITIES}")
+        symbols = self.symbols(category)
+        with self._lock:
+            if priority == "liquidity":
+                key = lambda s: -float(self._pairs[s].get("volume24h") or 0)
+            else:
+                key = lambda s: -self._volatility.get(s, float("inf"))
+            return sorted(symbols, key=key)
+
+    def run_tick(
+        self,
+        analyze: Callable[[str], Any],
+        budget: float = DEFAULT_TICK_BUDGET,
+        priority: str = "liquidity",
+        max_concurrency: int = 8,
+        symbols: Optional[List[str]] = None,
+    ) -> TickResult:
+        """
+        Analyze symbols in priority order until the time budget is spent.
+
+        Work is started in priority order on ``max_concurrency`` threads; no
+        new symbol starts after the deadline and results finishing after it
+        are dropped, so the tick returns within the budget plus scheduling
+        slack.
+
+        Args:
+            analyze: Called with each symbol, returns its analysis
+            budget: Seconds available for the whole tick
+            priority: Ordering used when not every symbol fits
+            max_concurrency: Symbols analyzed at the same time
+            symbols: Analyze these (already ordered) instead of the universe
+
+        Returns:
+            TickResult with per-symbol results, skipped and failed symbols
+        """
+        start = time.monotonic()
+        deadline = start + budget
+        ordered = symbols if symbols is not None else self.prioritized(priority)
+
+        finished: Dict[str, Any] = {}
+        failed: Dict[str, str] = {}
+        executor = ThreadPoolExecutor(max_workers=max(1, max_concurrency))
+        pending = {}
+        queue = iter(ordered)
+        try:
+            for symbol in queue:
+                if len(pending) >= max_concurrency:
+                    done, _ = wait(pending, timeout=max(0.0, deadline - time.monotonic()),
+                                   return_when=FIRST_COMPLETED)
+                    self._collect(done, pending, finished, failed)
+                if time.monotonic() >= deadline:
+                    break
+                pending[executor.submit(analyze, symbol)] = symbol
+            if pending:
+                done, _ = wait(pending, timeout=max(0.0, deadline - time.monotonic()))
+                self._collect(done, pending, finished, failed)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        results = {symbol: finished[symbol] for symbol in ordered if symbol in finished}
+        skipped = [symbol for symbol in ordered if symbol not in results and symbol not in failed]
+        elapsed = time.monotonic() - start
+        if skipped:
+            logger.warning(
+                f"Tick budget {budget:.1f}s exhausted: analyzed {len(results)}/{len(ordered)}, "
+                f"skipped {len(skipped)} lowest-{priority} symbols"
+            )
+        return TickResult(results, skipped, failed, elapsed)
+
+    @staticmethod
+    def _collect(done, pending, finished, failed):
+        for future in done:
+            symbol = pending.pop(future)
+            try:
+                finished[symbol] = future.result()
+            except Exception as e:
+                logger.error(f"Error analyzing {symbol}: {e}")
+                failed[symbol] = str(e)
+
+
+_universe_lock = threading.Lock()
+_default_universe: Optional[SymbolUniverse] = None
+
+
+def get_default_universe() -> SymbolUniverse:
+    """Process-wide universe, so the pair list refresh and observed volatility persist across ticks."""
+    global _default_universe
+    with _universe_lock:
+        if _default_universe is None:
+            _default_universe = SymbolUniverse()
+        return _default_universe
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Check that the hand-written indicator engines still match TA-Lib.
+
+The streaming engine (streaming_indicators) and the batch engine
+(batch_indicators) reimplement TA-Lib's recurrences; this compares both
+with talib on random-walk klines, bar by bar, including symbols that are
+shorter, start later or miss bars and so get NaN-padded when stacked.
+Runs offline.
+
+    python test_indicator_parity.py
+    python -m pytest test_indicator_parity.py
+"""
+import logging
+import sys
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+import talib
+
+from batch_indicators import INDICATOR_FIELDS, compute_batch_indicators, compute_indicator_matrix
+from benchmark import make_klines
+from streaming_indicators import StreamingIndicatorEngine
+
+logger = logging.getLogger("test_indicator_parity")
+
+# The engines follow TA-Lib's arithmetic, so the tolerance only absorbs
+# floating point reassociation, not a different formula or seeding
+RTOL = 1e-9
+ATOL = 1e-9
+
+
+def talib_indicators(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """Every INDICATOR_FIELDS series computed directly with talib."""
+    high = df["high"].to_numpy(dtype=float)
+    low = df["low"].to_numpy(dtype=float)
+    close = df["close"].to_numpy(dtype=float)
+    upper, middle, lower = talib.BBANDS(close, timeperiod=20, nbdevup=2, nbdevdn=2, matype=0)
+    macd, macd_signal, macd_hist = talib.MACD(close, fastperiod=12, slowperiod=26, signalperiod=9)
+    k, d = talib.STOCH(high, low, close, fastk_period=9, slowk_period=3, slowk_matype=0,
+                       slowd_period=3, slowd_matype=0)
+    return {
+        **{f"ma{p}": talib.SMA(close, timeperiod=p) for p in (5, 10, 20, 60)},
+        **{f"ema{p}": talib.EMA(close, timeperiod=p) for p in (12, 26)},
+        **{f"rsi{p}": talib.RSI(close, timeperiod=p) for p in (6, 12, 24)},
+        "bb_upper": upper,
+        "bb_middle": middle,
+        "bb_lower": lower,
+        "macd": macd,
+        "macd_signal": macd_signal,
+        "macd_hist": macd_hist,
+        "k": k,
+        "d": d,
+        "j": 3 * k - 2 * d,
+        "atr": talib.ATR(high, low, close, timeperiod=14),
+        "cci": talib.CCI(high, low, close, timeperiod=14),
+        "plus_di": talib.PLUS_DI(high, low, close, timeperiod=14),
+        "minus_di": talib.MINUS_DI(high, low, close, timeperiod=14),
+        "adx": talib.ADX(high, low, close, timeperiod=14),
+        "trix": talib.TRIX(close, timeperiod=30),
+        "willr": talib.WILLR(high, low, close, timeperiod=14),
+        "sar": talib.SAR(high, low, acceleration=0.02, maximum=0.2),
+        "roc": talib.ROC(close, timeperiod=10),
+        "mom": talib.MOM(close, timeperiod=10),
+        "tema": talib.TEMA(close, timeperiod=20),
+    }
+
+
+def mismatches(expected: Dict[str, np.ndarray], actual: Dict[str, np.ndarray],
+               nan_must_match: bool) -> Dict[str, str]:
+    """Fields whose values differ beyond tolerance, with the first differing bar."""
+    bad = {}
+    for field in INDICATOR_FIELDS:
+        want = np.asarray(expected[field], dtype=float)
+        got = np.asarray(actual[field], dtype=float)
+        # Bars where talib has output; the streaming engine may report a
+        # value a little earlier while warming up, the batch engine may not
+        compare = ~np.isnan(want)
+        close = np.isclose(got, want, rtol=RTOL, atol=ATOL, equal_nan=True)
+        wrong = compare & ~close
+        if nan_must_match:
+            wrong |= np.isnan(want) != np.isnan(got)
+        if wrong.any():
+            bar = int(np.flatnonzero(wrong)[0])
+            bad[field] = f"bar {bar}: talib {want[bar]!r}, engine {got[bar]!r}"
+    return bad
+
+
+def test_streaming_matches_talib():
+    """Feeding candles one by one gives talib's value on every bar."""
+    for seed in range(3):
+        df = make_klines(400, seed=seed)
+        engine = StreamingIndicatorEngine().seed(df.iloc[:100])
+        rows = [engine.latest()]
+        for row in df.iloc[100:].itertuples():
+            rows.append(engine.update(row.high, row.low, row.close, ts=row.ts))
+        streamed = {field: np.array([row[field] for row in rows]) for field in INDICATOR_FIELDS}
+        expected = {field: values[99:] for field, values in talib_indicators(df).items()}
+        bad = mismatches(expected, streamed, nan_must_match=False)
+        assert not bad, f"streaming engine drifted from talib (seed {seed}): {bad}"
+
+
+def test_batch_matches_talib():
+    """One vectorized pass over aligned symbols gives talib's series for each."""
+    frames = {f"S{seed}": make_klines(400, seed=seed) for seed in range(4)}
+    batch = compute_batch_indicators(frames)
+    for row, (symbol, df) in enumerate(frames.items()):
+        own = {field: batch.values[field][row] for field in INDICATOR_FIELDS}
+        bad = mismatches(talib_indicators(df), own, nan_must_match=True)
+        assert not bad, f"batch engine drifted from talib for {symbol}: {bad}"
+
+
+def test_batch_misaligned_symbols_match_talib():
+    """Shorter, later-listed and gappy symbols match talib on their own bars."""
+    full = make_klines(500, seed=10)
+    frames = {
+        "FULL": full,
+        "LATE": make_klines(500, seed=11).iloc[150:],
+        "DELISTED": make_klines(500, seed=12).iloc[:420],
+        "GAPPY": make_klines(500, seed=13).drop(index=list(range(200, 205)) + [300, 301, 377]),
+        "SHORT": make_klines(500, seed=14).iloc[-40:],
+    }
+    batch = compute_batch_indicators(frames)
+    for row, (symbol, df) in enumerate(frames.items()):
+        columns = np.searchsorted(batch.ts, df["ts"].to_numpy(dtype=np.int64))
+        own = {field: batch.values[field][row, columns] for field in INDICATOR_FIELDS}
+        bad = mismatches(talib_indicators(df), own, nan_must_match=True)
+        assert not bad, f"batch engine drifted from talib for {symbol}: {bad}"
+        padding = np.setdiff1d(np.arange(len(batch.ts)), columns)
+        assert all(np.isnan(batch.values[field][row, padding]).all() for field in INDICATOR_FIELDS), (
+            f"{symbol} has values on bars it does not have"
+        )
+
+    last = compute_batch_indicators(frames, last_only=True)
+    for row, (symbol, df) in enumerate(frames.items()):
+        expected = {field: values[-1:] for field, values in talib_indicators(df).items()}
+        actual = {field: last.values[field][row:row + 1] for field in INDICATOR_FIELDS}
+        bad = mismatches(expected, actual, nan_must_match=True)
+        assert not bad, f"last_only is not {symbol}'s last bar: {bad}"
+
+
+def test_batch_field_subset_matches_full():
+    """Restricting fields computes the same values as the full set."""
+    df = make_klines(300, seed=20)
+    high, low, close = (df[c].to_numpy(dtype=float)[None] for c in ("high", "low", "close"))
+    full = compute_indicator_matrix(high, low, close)
+    for fields in (["adx"], ["macd_hist", "k"], ["trix", "tema", "atr", "plus_di"]):
+        subset = compute_indicator_matrix(high, low, close, fields=fields)
+        assert subset.dtype.names == tuple(fields)
+        for field in fields:
+            assert np.array_equal(subset[field], full[field], equal_nan=True), f"{field} differs in {fields}"
+
+
+def main():
+    """Run every check and report the failures"""
+    failed = 0
+    for name, check in sorted(globals().items()):
+        if not name.startswith("test_") or not callable(check):
+            continue
+        try:
+            check()
+            logger.info(f"✅ {name}")
+        except AssertionError as e:
+            failed += 1
+            logger.error(f"❌ {name}: {e}")
+    if failed:
+        logger.error("❌ Test failed!")
+        return 1
+    logger.info("✅ All tests passed!")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        handlers=[logging.StreamHandler(sys.stdout)],
+    )
+    sys.exit(main())
@@ -0,0 +1,95 @@
+from typing import List, Mapping, NamedTuple
+
+import numpy as np
+
+# Columns of the signal matrix, one per rule in MarketAnalyzer.analyze_trend.
+# +1 is the bullish reading of the rule, -1 the bearish one, 0 neither.
+SIGNAL_FIELDS = [
+    "ma_alignment",  # ma5 > ma10 > ma20 / ma5 < ma10 < ma20
+    "ema_cross",     # ema12 above / below ema26
+    "rsi",           # rsi6 < 20 and rsi12 < 30 oversold / rsi6 > 80 and rsi12 > 70 overbought
+    "sar",           # close above / below sar
+    "dmi",           # plus_di above / below minus_di
+    "roc",           # roc positive / not positive
+    "mom",           # mom positive / not positive
+]
+
+# Indicators the rules read
+SIGNAL_INPUTS = [
+    "ma5", "ma10", "ma20", "ema12", "ema26", "rsi6", "rsi12",
+    "sar", "plus_di", "minus_di", "roc", "mom", "k", "d", "macd_hist", "adx",
+]
+
+
+class TrendSignals(NamedTuple):
+    """analyze_trend's rules evaluated on every bar."""
+
+    fields: List[str]
+    # int8, shape (..., T, len(fields))
+    signals: np.ndarray
+    # int8 in [0, 5], shape (..., T)
+    trend_strength: np.ndarray
+
+
+def _sign(bullish: np.ndarray, bearish: np.ndarray) -> np.ndarray:
+    return bullish.astype(np.int8) - bearish.astype(np.int8)
+
+
+def _either(above: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    # Two-sided rules read as bearish whenever they are not bullish, except
+    # during warm-up, where the inputs are NaN and the rule says nothing
+    return _sign(above, valid & ~above)
+
+
+def compute_trend_signals(indicators: Mapping[str, np.ndarray], close: np.ndarray) -> TrendSignals:
+    """
+    Evaluate analyze_trend's rules over a whole history at once.
+
+    The rules and thresholds are those of MarketAnalyzer.analyze_trend, which
+    only looks at the last bar. Two-sided rules (EMA, SAR, DMI, ROC, MOM) give
+    0 rather than -1 on bars where an input is still NaN. trend_strength is
+    the same 0-5 score analyze_trend computes: one point each for bullish MA
+    alignment, rsi6 > 50, k > d, macd_hist > 0 and adx > 25.
+
+    Args:
+        indicators: Indicator arrays by name, e.g. IndicatorGraph.evaluate's
+            output (T,) or compute_indicator_matrix's records (S, T)
+        close: Close prices with the same shape as the indicator arrays
+
+    Returns:
+        TrendSignals with the signal matrix and per-bar trend_strength
+    """
+    get = {name: np.asarray(indicators[name], dtype=np.float64) for name in SIGNAL_INPUTS}
+    close = np.asarray(close, dtype=np.float64)
+
+    ma5, ma10, ma20 = get["ma5"], get["ma10"], get["ma20"]
+    ma_bull = (ma5 > ma10) & (ma10 > ma20)
+    ma_bear = (ma5 < ma10) & (ma10 < ma20)
+
+    rsi6, rsi12 = get["rsi6"], get["rsi12"]
+    overbought = (rsi6 > 80) & (rsi12 > 70)
+    oversold = (rsi6 < 20) & (rsi12 < 30)
+
+    ema_valid = ~(np.isnan(get["ema12"]) | np.isnan(get["ema26"]))
+    sar_valid = ~(np.isnan(close) | np.isnan(get["sar"]))
+    dmi_valid = ~(np.isnan(get["plus_di"]) | np.isnan(get["minus_di"]))
+
+    signals = np.stack([
+        _sign(ma_bull, ma_bear),
+        _either(get["ema12"] > get["ema26"], ema_valid),
+        _sign(oversold, overbought),
+        _either(close > get["sar"], sar_valid),
+        _either(get["plus_di"] > get["minus_di"], dmi_valid),
+        _either(get["roc"] > 0, ~np.isnan(get["roc"])),
+        _either(get["mom"] > 0, ~np.isnan(get["mom"])),
+    ], axis=-1)
+
+    trend_strength = (
+        ma_bull.astype(np.int8)
+        + (rsi6 > 50)
+        + (get["k"] > get["d"])
+        + (get["macd_hist"] > 0)
+        + (get["adx"] > 25)
+    ).astype(np.int8)
+
+    return TrendSignals(list(SIGNAL_FIELDS), signals, trend_strength)